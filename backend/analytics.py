@@ -0,0 +1,377 @@
+"""
+Idősoros kapacitás analitika - v8.4.24
+======================================
+
+A lab_request_test_fact tábla kérésenként és vizsgálattípusonként egy
+tömör sort tárol (létrehozás, megérkezés, labor kész, lezárás időpontja,
+átfutási idő órában). Az analitika végpont csak ebből olvas, így a
+lekérdezés ideje a választott időablaktól függ, nem a teljes előzménytől.
+
+Frissítés inkrementálisan (refresh_facts): a config_version
+'analytics_facts' sorában tárolt időbélyeg (watermark) óta módosult kérések
+(lab_request.updated_at) és eredmények (test_result.updated_at) sorait
+töröljük és újraszámoljuk. Az átfedés (REFRESH_OVERLAP) a még commitolatlan,
+de már időbélyeget kapott módosításokat is elkapja. Törölt kérések
+soraiért a delete_request / reset-data felel.
+
+A szervezeti egység nincs a ténytáblában: a vizsgálattípus -> egység
+hozzárendelést lekérdezéskor alkalmazzuk, átsorolás után sem kell újraépíteni.
+
+Teljes újraépítés: scripts/refresh_analytics_facts.py --full
+"""
+
+import datetime
+import math
+
+STATE_KEY = 'analytics_facts'
+REFRESH_OVERLAP = datetime.timedelta(minutes=5)
+CHUNK_SIZE = 500
+NO_TEST_TYPE = 0  # Vizsgálat nélküli kérés sora (a kérésszámokhoz)
+BUCKETS = ('day', 'week', 'month')
+MAX_BUCKETS = 1000  # Egy lekérdezés legfeljebb ennyi időszakot ad vissza
+# Megérkezett, még le nem zárt kérések (a 'submitted' legacy = arrived_at_provider)
+BACKLOG_STATUSES = ('arrived_at_provider', 'submitted', 'in_progress', 'validation_pending')
+
+_models = {}
+
+
+def init(db, request_model, link_model, result_model, fact_model, state_model):
+    """Modellek átadása (app.py, a modellek után, egyszer)"""
+    _models.update({
+        'db': db, 'request': request_model, 'link': link_model, 'result': result_model,
+        'fact': fact_model, 'state': state_model
+    })
+
+
+# ============================================
+# FRISSÍTÉS
+# ============================================
+
+def _hours(start, end):
+    if start is None or end is None or end < start:
+        return None
+    return round((end - start).total_seconds() / 3600, 2)
+
+
+def _build_rows(connection, request_ids):
+    """Tény sorok a megadott kérésekhez (kérés x kért vizsgálattípus + eredmény)"""
+    db = _models['db']
+    request_table = _models['request'].__table__
+    link_table = _models['link'].__table__
+    result_table = _models['result'].__table__
+
+    query = db.select(
+        request_table.c.id, request_table.c.company_id, request_table.c.status,
+        request_table.c.created_at, request_table.c.arrived_at, request_table.c.updated_at,
+        link_table.c.test_type_id, result_table.c.completed_at, result_table.c.validated_at
+    ).select_from(
+        request_table
+        .outerjoin(link_table, link_table.c.lab_request_id == request_table.c.id)
+        .outerjoin(result_table, db.and_(
+            result_table.c.lab_request_id == request_table.c.id,
+            result_table.c.test_type_id == link_table.c.test_type_id
+        ))
+    ).where(request_table.c.id.in_(request_ids))
+
+    by_request = {}
+    for row in connection.execute(query):
+        by_request.setdefault(row.id, []).append(row)
+
+    rows = []
+    for request_id, tests in by_request.items():
+        request_row = tests[0]
+        is_completed = request_row.status == 'completed'
+        facts = []
+        for test in tests:
+            # Lezárt = validált; validálás előtti (legacy) lezárt kérésnél a labor kész időpont
+            finished_at = test.validated_at or (test.completed_at if is_completed else None)
+            facts.append({
+                'lab_request_id': request_id,
+                'test_type_id': test.test_type_id or NO_TEST_TYPE,
+                'company_id': request_row.company_id,
+                'request_status': request_row.status,
+                'created_at': request_row.created_at,
+                'arrived_at': request_row.arrived_at,
+                'completed_at': test.completed_at,
+                'finished_at': finished_at,
+                'turnaround_hours': _hours(request_row.arrived_at, finished_at),
+            })
+
+        request_completed_at = None
+        if is_completed:
+            finished = [fact['finished_at'] for fact in facts if fact['finished_at']]
+            request_completed_at = max(finished) if finished else request_row.updated_at
+        for fact in facts:
+            fact['request_completed_at'] = request_completed_at
+        rows.extend(facts)
+    return rows
+
+
+def _refresh_ids(connection, request_ids):
+    fact_table = _models['fact'].__table__
+    connection.execute(fact_table.delete().where(fact_table.c.lab_request_id.in_(request_ids)))
+    rows = _build_rows(connection, request_ids)
+    if rows:
+        connection.execute(fact_table.insert(), rows)
+    return len(rows)
+
+
+def _changed_request_ids(connection, since):
+    db = _models['db']
+    request_table = _models['request'].__table__
+    result_table = _models['result'].__table__
+    query = db.union(
+        db.select(request_table.c.id).where(request_table.c.updated_at >= since),
+        db.select(result_table.c.lab_request_id).where(result_table.c.updated_at >= since)
+    )
+    return sorted(row[0] for row in connection.execute(query))
+
+
+def refresh_facts(full=False):
+    """
+    Tény tábla frissítése (a hívó commitol)
+
+    Args:
+        full (bool): minden kérés újraszámolása (első feltöltés / ellenőrzés után)
+
+    Returns:
+        dict: {'requests': feldolgozott kérések, 'rows': írt sorok, 'full': bool}
+    """
+    db = _models['db']
+    state_model = _models['state']
+    request_table = _models['request'].__table__
+    fact_table = _models['fact'].__table__
+    connection = db.session.connection()
+    now = datetime.datetime.utcnow()
+
+    # Sorzár: párhuzamos frissítések sorban futnak (PostgreSQL; SQLite-on az írás amúgy is kizárólagos)
+    state = db.session.query(state_model).filter_by(config_key=STATE_KEY).with_for_update().first()
+    if state is None:
+        state = state_model(config_key=STATE_KEY, version=0)
+        db.session.add(state)
+        full = True
+
+    processed = written = 0
+    if full:
+        connection.execute(fact_table.delete())
+        last_id = 0
+        while True:
+            ids = [row[0] for row in connection.execute(
+                db.select(request_table.c.id).where(request_table.c.id > last_id)
+                .order_by(request_table.c.id).limit(CHUNK_SIZE)
+            )]
+            if not ids:
+                break
+            last_id = ids[-1]
+            processed += len(ids)
+            written += _refresh_ids(connection, ids)
+    else:
+        ids = _changed_request_ids(connection, state.updated_at - REFRESH_OVERLAP)
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            processed += len(chunk)
+            written += _refresh_ids(connection, chunk)
+
+    state.version = (state.version or 0) + 1
+    state.updated_at = now
+    return {'requests': processed, 'rows': written, 'full': full}
+
+
+def last_refreshed_at():
+    state = _models['db'].session.get(_models['state'], STATE_KEY)
+    return state.updated_at if state else None
+
+
+# ============================================
+# LEKÉRDEZÉSEK
+# ============================================
+
+def bucket_start(day, bucket):
+    """Az időszak első napja, amelybe a nap esik"""
+    if bucket == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_starts(first_day, last_day, bucket):
+    """Az időszakok kezdőnapjai first_day-től last_day-ig (mindkettő benne)"""
+    day = bucket_start(first_day, bucket)
+    starts = []
+    while day <= last_day:
+        starts.append(day)
+        if bucket == 'day':
+            day += datetime.timedelta(days=1)
+        elif bucket == 'week':
+            day += datetime.timedelta(days=7)
+        else:
+            day = (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return starts
+
+
+def bucket_expression(column, bucket, dialect):
+    """Időbélyeg -> a nap / hét (hétfő) / hónap első napja"""
+    func = _models['db'].func
+    if dialect == 'postgresql':
+        return func.date_trunc(bucket, column)
+    if bucket == 'day':
+        return func.date(column)
+    if bucket == 'week':
+        # strftime('%w'): vasárnap = 0 -> hétfőig visszalépés
+        return func.date(column, func.printf('-%d days', (func.strftime('%w', column) + 6) % 7))
+    return func.strftime('%Y-%m-01', column)
+
+
+def _bucket_key(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def _filtered(query, company_id, test_type_ids):
+    fact_model = _models['fact']
+    if company_id is not None:
+        query = query.filter(fact_model.company_id == company_id)
+    if test_type_ids is not None:
+        query = query.filter(fact_model.test_type_id.in_(test_type_ids))
+    return query
+
+
+def series(column_name, date_from, date_to, bucket, company_id=None, test_type_ids=None):
+    """
+    Időszakonkénti vizsgálatszám egy időbélyeg oszlop szerint
+
+    Returns:
+        list: (időszak 'YYYY-MM-DD', test_type_id, darab) sorok
+    """
+    db = _models['db']
+    fact_model = _models['fact']
+    column = getattr(fact_model, column_name)
+    bucket_column = bucket_expression(column, bucket, db.engine.dialect.name)
+    query = db.session.query(bucket_column, fact_model.test_type_id, db.func.count())\
+        .filter(column >= date_from, column < date_to, fact_model.test_type_id != NO_TEST_TYPE)
+    query = _filtered(query, company_id, test_type_ids)
+    rows = query.group_by(bucket_column, fact_model.test_type_id).all()
+    return [(_bucket_key(row[0]), row[1], row[2]) for row in rows]
+
+
+def distinct_requests(column_name, date_from, date_to, bucket, company_id=None, test_type_ids=None):
+    """Időszakonként a különböző kérések száma: {időszak: darab}"""
+    db = _models['db']
+    fact_model = _models['fact']
+    column = getattr(fact_model, column_name)
+    bucket_column = bucket_expression(column, bucket, db.engine.dialect.name)
+    query = db.session.query(bucket_column, db.func.count(db.distinct(fact_model.lab_request_id)))\
+        .filter(column >= date_from, column < date_to)
+    query = _filtered(query, company_id, test_type_ids)
+    return {_bucket_key(row[0]): row[1] for row in query.group_by(bucket_column).all()}
+
+
+def percentile(values, fraction):
+    """Lineáris interpolációs percentilis (= PostgreSQL percentile_cont) rendezett listán"""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return values[lower]
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+EMPTY_TURNAROUND = {'count': 0, 'median_hours': None, 'p90_hours': None}
+
+
+def _summary(count, median, p90):
+    return {
+        'count': count,
+        'median_hours': round(median, 2) if median is not None else None,
+        'p90_hours': round(p90, 2) if p90 is not None else None,
+    }
+
+
+def turnaround(date_from, date_to, department_of, company_id=None, test_type_ids=None):
+    """
+    Átfutási idő (megérkezés -> lezárás) medián és p90, az időablakban lezárt vizsgálatokra
+
+    Args:
+        department_of (dict): test_type_id -> department_id
+
+    Returns:
+        (dict, dict): {test_type_id: összesítés}, {department_id: összesítés}
+    """
+    db = _models['db']
+    fact_model = _models['fact']
+    hours = fact_model.turnaround_hours
+    conditions = [
+        fact_model.finished_at >= date_from,
+        fact_model.finished_at < date_to,
+        hours.isnot(None),
+    ]
+
+    if db.engine.dialect.name == 'postgresql':
+        # Az adatbázis számolja: csak csoportonként egy sor jön vissza
+        test_type_table = fact_model.metadata.tables['test_type']
+        median = db.func.percentile_cont(0.5).within_group(hours)
+        p90 = db.func.percentile_cont(0.9).within_group(hours)
+        query = _filtered(db.session.query(fact_model.test_type_id, db.func.count(), median, p90)
+                          .filter(*conditions), company_id, test_type_ids)
+        by_test_type = {
+            row[0]: _summary(row[1], row[2], row[3])
+            for row in query.group_by(fact_model.test_type_id).all()
+        }
+        query = _filtered(
+            db.session.query(test_type_table.c.department_id, db.func.count(), median, p90)
+            .join(test_type_table, test_type_table.c.id == fact_model.test_type_id)
+            .filter(*conditions), company_id, test_type_ids
+        )
+        by_department = {
+            row[0]: _summary(row[1], row[2], row[3])
+            for row in query.group_by(test_type_table.c.department_id).all()
+        }
+        return by_test_type, by_department
+
+    # SQLite: nincs percentile függvény - csak a két szükséges oszlop az időablakból
+    query = _filtered(db.session.query(fact_model.test_type_id, hours).filter(*conditions),
+                      company_id, test_type_ids)
+    test_type_values, department_values = {}, {}
+    for test_type_id, value in query.yield_per(5000):
+        test_type_values.setdefault(test_type_id, []).append(value)
+        department_values.setdefault(department_of.get(test_type_id), []).append(value)
+
+    def summarize(groups):
+        result = {}
+        for key, values in groups.items():
+            values.sort()
+            result[key] = _summary(len(values), percentile(values, 0.5), percentile(values, 0.9))
+        return result
+
+    return summarize(test_type_values), summarize(department_values)
+
+
+def backlog(company_id=None, test_type_ids=None):
+    """
+    Jelenlegi hátralék vizsgálattípusonként (megérkezett, még nem lezárt vizsgálatok)
+
+    Returns:
+        dict: {test_type_id: {'in_lab': labor még nem végzett, 'awaiting_validation': validálásra vár}}
+    """
+    db = _models['db']
+    fact_model = _models['fact']
+    awaiting = db.case((fact_model.completed_at.isnot(None), 1), else_=0)
+    query = db.session.query(fact_model.test_type_id, db.func.count(), db.func.sum(awaiting)).filter(
+        fact_model.request_status.in_(BACKLOG_STATUSES),
+        fact_model.finished_at.is_(None),
+        fact_model.test_type_id != NO_TEST_TYPE
+    )
+    query = _filtered(query, company_id, test_type_ids)
+    result = {}
+    for test_type_id, count, awaiting_count in query.group_by(fact_model.test_type_id).all():
+        awaiting_count = int(awaiting_count or 0)
+        result[test_type_id] = {'in_lab': count - awaiting_count, 'awaiting_validation': awaiting_count}
+    return result
@@ -1,7 +1,8 @@
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import text
+from sqlalchemy.orm import aliased
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import jwt
@@ -9,16 +10,17 @@ import datetime
 from functools import wraps
 import json
 import os
+import threading
+import time
 from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image  # v7.0.31: Image QR kódhoz
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import qrcode  # v7.0.31: QR kód generálás
+import pdf_rendering  # v8.4.16: PDF layout (v8.4.20: QR cache beállítás)
+from pdf_cache import PdfCache, cache_key as pdf_cache_key  # v8.4.17
+import pdf_batch  # v8.4.18
+import pdf_service  # v8.4.19: Renderelés processz poolban
+import streaming_export  # v8.4.21: CSV / XLSX stream
+import stats_rollup  # v8.4.23: Dashboard statisztika rollup
+import analytics  # v8.4.24: Idősoros kapacitás analitika
+import status_history  # v8.4.25: Státusz esemény napló
 
 # v8.0: Notification Service
 from notification_service import NotificationService
@@ -53,7 +55,34 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['LOGO_FOLDER'] = 'uploads/logos'
 app.config['ATTACHMENT_FOLDER'] = 'uploads/attachments'
 app.config['RESULT_ATTACHMENT_FOLDER'] = 'uploads/results'  # v7.0: Vizsgálati eredmény fájlok
+# v8.4.17: Generált PDF-ek cache-e (0 = kikapcsolva)
+app.config['PDF_CACHE_FOLDER'] = os.environ.get('PDF_CACHE_FOLDER', 'uploads/pdf_cache')
+app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+# PDF-be írt melléklet linkek érvényességi időszaka (felhasználói token helyett melléklet link token)
+app.config['PDF_ATTACHMENT_LINK_DAYS'] = int(os.environ.get('PDF_ATTACHMENT_LINK_DAYS', 30))
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # v7.0: 50MB max (vizsgálati eredmények miatt)
+# v8.4.4: Munkalista - ennyi napnál régebben lezárt (completed) kérések alapból nem jelennek meg (0 = mind)
+app.config['WORKLIST_COMPLETED_WINDOW_DAYS'] = int(os.environ.get('WORKLIST_COMPLETED_WINDOW_DAYS', 30))
+app.config['BULK_REQUEST_MAX_ROWS'] = int(os.environ.get('BULK_REQUEST_MAX_ROWS', 1000))  # v8.4.15
+app.config['PDF_BATCH_MAX_REQUESTS'] = int(os.environ.get('PDF_BATCH_MAX_REQUESTS', 500))  # v8.4.18
+# v8.4.20: QR kép cache (lemez + memória LRU elemszám)
+app.config['QR_CACHE_FOLDER'] = os.environ.get('QR_CACHE_FOLDER', 'uploads/qr_cache')
+app.config['QR_CACHE_MAX_ITEMS'] = int(os.environ.get('QR_CACHE_MAX_ITEMS', 1024))
+app.config['EXPORT_YIELD_PER'] = int(os.environ.get('EXPORT_YIELD_PER', 1000))  # v8.4.21: Streamelt export köteg mérete
+# v8.4.24: Analitika ténytábla - a háttér feldolgozó ennyi másodpercenként frissíti
+app.config['ANALYTICS_REFRESH_SECONDS'] = int(os.environ.get('ANALYTICS_REFRESH_SECONDS', 60))
+# v8.4.19: PDF render processz pool (0 processz = renderelés a web szálban), sor méret, időkorlát
+app.config['PDF_RENDER_WORKERS'] = int(os.environ.get('PDF_RENDER_WORKERS', 2))
+app.config['PDF_RENDER_MAX_PENDING'] = int(os.environ.get('PDF_RENDER_MAX_PENDING', 8))
+app.config['PDF_RENDER_TIMEOUT_SECONDS'] = int(os.environ.get('PDF_RENDER_TIMEOUT_SECONDS', 30))
+# v8.4.10: Egyidejű SSE streamek processzenként - a gunicorn szálak (GUNICORN_THREADS) töredéke,
+# a többi kliens 503-at kap és pollingra vált
+app.config['SSE_MAX_STREAMS'] = int(os.environ.get('SSE_MAX_STREAMS', int(os.environ.get('GUNICORN_THREADS', 32)) // 4))
+# v8.4.12: Értesítések megőrzési ideje napokban (0 = örökre), archiválás törlés előtt
+# Alapból nincs törlés - az üzemeltető kapcsolja be (pl. 90 / 365 nap), meglévő előzmény nem vész el
+app.config['NOTIFICATION_RETENTION_READ_DAYS'] = int(os.environ.get('NOTIFICATION_RETENTION_READ_DAYS', 0))
+app.config['NOTIFICATION_RETENTION_UNREAD_DAYS'] = int(os.environ.get('NOTIFICATION_RETENTION_UNREAD_DAYS', 0))
+app.config['NOTIFICATION_ARCHIVE_ENABLED'] = os.environ.get('NOTIFICATION_ARCHIVE_ENABLED', 'false').lower() == 'true'
 
 # Create upload folders
 os.makedirs(app.config['LOGO_FOLDER'], exist_ok=True)
@@ -67,6 +96,8 @@ CORS(app,
      resources={r"/api/*": {"origins": [FRONTEND_URL, 'http://localhost:3000', 'https://labsquare.netlify.app']}},
      supports_credentials=True,
      allow_headers=['Content-Type', 'Authorization'],
+     expose_headers=['X-Total-Count', 'X-Next-Cursor',  # v8.4.2: Lapozás header-ök
+                     'X-Batch-Count', 'X-Batch-Skipped', 'Content-Disposition'],  # v8.4.18: Kötegelt PDF
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
 )
 
@@ -173,6 +204,18 @@ class LabRequest(db.Model):
     """
     Laborkérés model - v6.7 kibővített mezők
     """
+    # v8.4.5: Indexek a gyakori szűrésekhez (meglévő adatbázisban a migrations.py INDEX_MIGRATIONS hozza létre)
+    __table_args__ = (
+        db.Index('ix_lab_request_status', 'status'),
+        db.Index('ix_lab_request_company_status', 'company_id', 'status'),
+        db.Index('ix_lab_request_user_created', 'user_id', 'created_at'),
+        db.Index('ix_lab_request_created_id', 'created_at', 'id'),  # Keyset lapozás
+        db.Index('ix_lab_request_updated_at', 'updated_at'),  # v8.4.24: Analitika inkrementális frissítés
+        # LIKE 'PREFIX%' keresés - v8.4.13 óta csak a napi sorszám első inicializálásakor (PostgreSQL: nem C collation esetén kell)
+        db.Index('ix_lab_request_number_pattern', 'request_number',
+                 postgresql_ops={'request_number': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False)
@@ -199,6 +242,8 @@ class LabRequest(db.Model):
     sampling_address = db.Column(db.String(500))  # Legacy alias
     
     # Vizsgálatok
+    # v8.4.3: A lab_request_test_type kapcsolótábla az elsődleges forrás,
+    # ez a JSON lista csak visszafelé kompatibilitás miatt marad (set_request_test_types() szinkronban tartja)
     test_types = db.Column(db.Text, nullable=False)  # JSON lista
     total_price = db.Column(db.Float, default=0)
     
@@ -216,6 +261,7 @@ class LabRequest(db.Model):
     status = db.Column(db.String(50), default='draft')
     approved_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     approved_at = db.Column(db.DateTime)
+    arrived_at = db.Column(db.DateTime)  # v8.4.24: Első arrived_at_provider átmenet (átfutási idő kezdete)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
@@ -226,6 +272,74 @@ class LabRequest(db.Model):
     approver = db.relationship('User', foreign_keys=[approved_by])
     category = db.relationship('RequestCategory', backref='lab_requests')
     company = db.relationship('Company', backref='lab_requests')
+    # v8.4.3: Kért vizsgálatok a kapcsolótáblán keresztül (kérési sorrendben)
+    test_type_links = db.relationship(
+        'LabRequestTestType', order_by='LabRequestTestType.position',
+        cascade='all, delete-orphan', backref='lab_request'
+    )
+    requested_test_types = db.relationship(
+        'TestType', secondary='lab_request_test_type',
+        order_by='LabRequestTestType.position', viewonly=True
+    )
+
+# v8.4.23: Dashboard statisztika rollup - kulcsonként kérésszám és összérték (stats_rollup tartja karban)
+class LabRequestStats(db.Model):
+    __tablename__ = 'lab_request_stats'
+    __table_args__ = (
+        db.Index('ix_lab_request_stats_user', 'user_id'),
+    )
+    
+    company_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    category_id = db.Column(db.Integer, primary_key=True)  # 0 = nincs kategória
+    request_count = db.Column(db.Integer, nullable=False, default=0)
+    total_revenue = db.Column(db.Float, nullable=False, default=0)
+
+stats_rollup.init(db, LabRequest, LabRequestStats)
+
+# v8.4.25: Státuszváltozás esemény napló - csak hozzáfűzés (status_history.transition() írja)
+class LabRequestStatusEvent(db.Model):
+    __tablename__ = 'lab_request_status_event'
+    __table_args__ = (
+        db.Index('ix_lab_request_status_event_request', 'lab_request_id', 'changed_at'),  # Kérés előzményei
+        db.Index('ix_lab_request_status_event_status', 'to_status', 'changed_at'),  # "X-be lépett az időablakban"
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    lab_request_id = db.Column(db.Integer, db.ForeignKey('lab_request.id', ondelete='CASCADE'), nullable=False)
+    from_status = db.Column(db.String(50))  # NULL = létrehozás
+    to_status = db.Column(db.String(50), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    changed_by_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # NULL = rendszer
+    source = db.Column(db.String(50))  # Művelet: 'create', 'update_request', 'logistics', 'qr_scan', ...
+    
+    lab_request = db.relationship('LabRequest')
+    changed_by = db.relationship('User')
+
+status_history.init(db, LabRequest, LabRequestStatusEvent)
+
+# v8.4.14: Napi kérésszám számláló cég rövid kódonként - generate_request_number() atomikusan növeli
+class RequestNumberSequence(db.Model):
+    __tablename__ = 'request_number_sequence'
+    
+    short_code = db.Column(db.String(10), primary_key=True)
+    seq_date = db.Column(db.Date, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+# v8.4.3: Kérés <-> vizsgálattípus kapcsolótábla (a JSON test_types mező helyett)
+class LabRequestTestType(db.Model):
+    """
+    Egy laborkéréshez tartozó vizsgálattípus
+    Index a test_type_id-n: "kérések, amelyekben X szervezeti egység vizsgálata van" egy indexelt join
+    """
+    __tablename__ = 'lab_request_test_type'
+    
+    lab_request_id = db.Column(db.Integer, db.ForeignKey('lab_request.id', ondelete='CASCADE'), primary_key=True)
+    test_type_id = db.Column(db.Integer, db.ForeignKey('test_type.id'), primary_key=True, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Sorrend a kérésen belül
+    
+    test_type = db.relationship('TestType')
 
 # v7.0: Vizsgálati eredmények tábla
 class TestResult(db.Model):
@@ -233,6 +347,12 @@ class TestResult(db.Model):
     Vizsgálati eredmények tárolása
     Minden LabRequest + TestType párhoz tartozik egy eredmény rekord
     """
+    # v8.4.5: Kérésenként egy eredmény vizsgálattípusonként (a lab_request_id keresést is lefedi)
+    __table_args__ = (
+        db.Index('uq_test_result_request_test_type', 'lab_request_id', 'test_type_id', unique=True),
+        db.Index('ix_test_result_updated_at', 'updated_at'),  # v8.4.24: Analitika inkrementális frissítés
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     lab_request_id = db.Column(db.Integer, db.ForeignKey('lab_request.id'), nullable=False)
     test_type_id = db.Column(db.Integer, db.ForeignKey('test_type.id'), nullable=False)
@@ -320,6 +440,12 @@ class Notification(db.Model):
     Tényleges értesítések (új event-alapú struktúra)
     """
     __tablename__ = 'notifications'
+    # v8.4.5: Olvasatlan értesítések / lista felhasználónként, kérés törlésénél request_id
+    __table_args__ = (
+        db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notifications_request_id', 'request_id'),
+        db.Index('ix_notifications_created_at', 'created_at'),  # v8.4.12: megőrzési törlés
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -358,6 +484,99 @@ class SMTPSettings(db.Model):
     is_active = db.Column(db.Integer, default=0)
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
+# v8.4.11: Olvasatlan értesítések számlálója felhasználónként (COUNT(*) helyett O(1) olvasás)
+# A NotificationService tartja karban a notifications módosításaival egy tranzakcióban;
+# eltérés esetén: python scripts/rebuild_unread_counters.py
+class NotificationUnreadCounter(db.Model):
+    __tablename__ = 'notification_unread_counter'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+# v8.4.12: Megőrzési idő után törölt értesítések (NOTIFICATION_ARCHIVE_ENABLED=true esetén)
+class NotificationArchive(db.Model):
+    """
+    A notifications sorok másolata törléskor - nincs FK, a felhasználó / kérés
+    törlése után is megmarad
+    """
+    __tablename__ = 'notifications_archive'
+    __table_args__ = (
+        db.Index('ix_notifications_archive_user_created', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Eredeti notifications.id
+    user_id = db.Column(db.Integer, nullable=False)
+    event_type_id = db.Column(db.Integer, nullable=False)
+    event_data = db.Column(db.Text)
+    message = db.Column(db.Text, nullable=False)
+    link_url = db.Column(db.String(200))
+    request_id = db.Column(db.Integer)
+    is_read = db.Column(db.Integer, default=0)
+    read_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# v8.4.6: Értesítési outbox - a notify() ide ír a státuszváltozással egy tranzakcióban,
+# a kiküldést (szabályok, in-app sorok, email) a háttér feldolgozó végzi
+class NotificationOutbox(db.Model):
+    """
+    Kiküldésre váró értesítési események
+    Státuszok: pending → processing → done / failed (max. próbálkozás után)
+    """
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_key = db.Column(db.String(100), nullable=False)
+    request_id = db.Column(db.Integer, nullable=True)  # Nincs FK: a kérés törlése után is feldolgozható
+    event_data = db.Column(db.Text)  # JSON
+    specific_users = db.Column(db.Text)  # JSON lista vagy NULL
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    in_app_delivered_at = db.Column(db.DateTime)  # Újrapróbáláskor az in-app értesítés nem megy ki újra
+    emailed_user_ids = db.Column(db.Text)  # JSON lista: újrapróbáláskor kihagyandó email címzettek
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+# v8.4.8: Konfiguráció verziószámok - a processzenkénti cache-ek ezt figyelik
+class ConfigVersion(db.Model):
+    """
+    Verzió soronként (pl. 'notification_config'); admin módosításkor növeljük
+    """
+    __tablename__ = 'config_version'
+    
+    config_key = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# v8.4.24: Analitika ténytábla - kérésenként és vizsgálattípusonként egy sor (analytics.refresh_facts tölti)
+class LabRequestTestFact(db.Model):
+    __tablename__ = 'lab_request_test_fact'
+    __table_args__ = (
+        db.Index('ix_lab_request_test_fact_created', 'created_at'),
+        db.Index('ix_lab_request_test_fact_finished', 'finished_at'),
+        db.Index('ix_lab_request_test_fact_request_completed', 'request_completed_at'),
+        db.Index('ix_lab_request_test_fact_status', 'request_status', 'test_type_id'),  # Hátralék
+    )
+    
+    lab_request_id = db.Column(db.Integer, db.ForeignKey('lab_request.id', ondelete='CASCADE'), primary_key=True)
+    test_type_id = db.Column(db.Integer, primary_key=True)  # 0 = vizsgálat nélküli kérés
+    company_id = db.Column(db.Integer, nullable=False)
+    request_status = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime)  # Kérés létrehozása
+    arrived_at = db.Column(db.DateTime)  # Minta megérkezése a szolgáltatóhoz
+    completed_at = db.Column(db.DateTime)  # Labor kész (TestResult.completed_at)
+    finished_at = db.Column(db.DateTime)  # Lezárva (TestResult.validated_at)
+    request_completed_at = db.Column(db.DateTime)  # A teljes kérés lezárása
+    turnaround_hours = db.Column(db.Float)  # arrived_at -> finished_at
+
+analytics.init(db, LabRequest, LabRequestTestType, TestResult, LabRequestTestFact, ConfigVersion)
+
 # ============================================
 # END OF v8.0 NOTIFICATION MODELS
 # ============================================
@@ -368,7 +587,15 @@ def generate_request_number(company_short_name):
     Generál egyedi kérés azonosítót
     Formátum: {CÉG_RÖVID}-{YYYYMMDD}-{SORSZÁM}
     Példa: MOL-20241124-001
+    
+    v8.4.14: A sorszámot a request_number_sequence számláló adja (atomikus növelés a
+    hívó tranzakciójában) - párhuzamos létrehozásnál sem ad két kérés ugyanazt a számot.
     """
+    return generate_request_numbers(company_short_name, 1)[0]
+
+
+def generate_request_numbers(company_short_name, count):
+    """v8.4.15: count darab egymást követő kérésszám egyetlen számláló növeléssel (bulk létrehozás)"""
     today = datetime.datetime.now()
     date_str = today.strftime('%Y%m%d')
     
@@ -378,28 +605,176 @@ def generate_request_number(company_short_name):
     short = short.encode('ASCII', 'ignore').decode('ASCII')
     short = ''.join(c for c in short if c.isalnum())[:5].upper() or 'LAB'
     
-    # Mai napon belüli sorszám keresése
     prefix = f"{short}-{date_str}-"
+    last_num = next_request_sequence(short, today.date(), prefix, count)
     
-    # Utolsó mai kérés keresése ezzel a prefix-szel
+    return [f"{prefix}{num:03d}" for num in range(last_num - count + 1, last_num + 1)]
+
+
+def next_request_sequence(short, day, prefix, count=1):
+    """
+    v8.4.14: Napi sorszám foglalás - a számláló sor zárolva marad a hívó commit-jáig
+    
+    count sorszámot foglal le egyszerre, és az utolsót adja vissza.
+    
+    PostgreSQL / SQLite 3.35+: UPDATE ... RETURNING, új napon INSERT ... ON CONFLICT
+    DO UPDATE ... RETURNING. Régebbi SQLite: UPDATE, majd SELECT ugyanabban a
+    tranzakcióban (az UPDATE után az adatbázis írási zárja nálunk van).
+    """
+    table = RequestNumberSequence.__table__
+    key = (table.c.short_code == short) & (table.c.seq_date == day)
+    increment = db.update(table).where(key).values(last_value=table.c.last_value + count)
+    returning = db.engine.dialect.update_returning
+    
+    if returning:
+        value = db.session.execute(increment.returning(table.c.last_value)).scalar()
+    elif db.session.execute(increment).rowcount:
+        value = db.session.execute(db.select(table.c.last_value).where(key)).scalar()
+    else:
+        value = None
+    if value is not None:
+        return value
+    
+    # Első kérés ezen a napon ezzel a kóddal: a meglévő (számláló előtti) kérések után folytatjuk
     last_request = LabRequest.query.filter(
-        LabRequest.request_number.like(f"{prefix}%")
+        LabRequest.request_number.like(f"{escape_like(prefix)}%", escape='\\')
     ).order_by(LabRequest.request_number.desc()).first()
-    
+    start = 0
     if last_request and last_request.request_number:
         try:
-            last_num = int(last_request.request_number.split('-')[-1])
-            next_num = last_num + 1
+            start = int(last_request.request_number.split('-')[-1])
         except (ValueError, IndexError):
-            next_num = 1
-    else:
-        next_num = 1
+            pass
     
-    return f"{prefix}{next_num:03d}"
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    upsert = insert(table).values(short_code=short, seq_date=day, last_value=start + count)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[table.c.short_code, table.c.seq_date],
+        set_={'last_value': table.c.last_value + count}
+    )
+    if returning:
+        return db.session.execute(upsert.returning(table.c.last_value)).scalar()
+    db.session.execute(upsert)
+    return db.session.execute(db.select(table.c.last_value).where(key)).scalar()
 
 # --- Notification Helper ---
 # v8.0: create_notification ELTÁVOLÍTVA - NotificationService használata
 # --- Auth Decorators ---
+# v8.4.13: Bejelentkezett felhasználó (principal) cache
+# A token_required nem tölti be minden kérésnél a User sort: a JWT aláírt claim-jeiből
+# vagy a worker-enkénti TTL cache-ből dolgozik. Felhasználó módosításkor/törléskor az
+# 'auth_users' verzió nő (config_version tábla) - ekkor a régebbi tokenek claim-jei és
+# minden worker cache-e érvénytelen (a verziót worker-enként AUTH_VERSION_CHECK_SECONDS-onként nézzük).
+AUTH_USER_CACHE_TTL_SECONDS = int(os.environ.get('AUTH_USER_CACHE_TTL_SECONDS', 60))
+AUTH_VERSION_CHECK_SECONDS = 5
+AUTH_VERSION_KEY = 'auth_users'
+TOKEN_LIFETIME_HOURS = 24
+
+_auth_cache_lock = threading.Lock()
+_auth_cache = {'version': None, 'checked_at': 0.0, 'users': {}}  # users: user_id -> (principal, expires_at)
+
+
+class AuthenticatedUser:
+    """
+    A token_required által átadott felhasználó - csak a jogosultságkezeléshez kellő mezők
+    (a teljes User sor: User.query.get(current_user.id))
+    """
+    __slots__ = ('id', 'role', 'company_id', 'department_id', 'name')
+    
+    def __init__(self, id, role, company_id, department_id, name):
+        self.id = id
+        self.role = role
+        self.company_id = company_id
+        self.department_id = department_id
+        self.name = name
+    
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.role, user.company_id, user.department_id, user.name)
+
+
+def _current_auth_version():
+    """'auth_users' verzió - legfeljebb AUTH_VERSION_CHECK_SECONDS-onként lekérdezve"""
+    now = time.monotonic()
+    with _auth_cache_lock:
+        if _auth_cache['version'] is not None and now - _auth_cache['checked_at'] < AUTH_VERSION_CHECK_SECONDS:
+            return _auth_cache['version']
+    
+    row = db.session.get(ConfigVersion, AUTH_VERSION_KEY)
+    version = row.version if row else 0
+    
+    with _auth_cache_lock:
+        if _auth_cache['version'] != version:
+            _auth_cache['users'].clear()
+        _auth_cache.update({'version': version, 'checked_at': now})
+    return version
+
+
+def invalidate_auth_cache():
+    """
+    Felhasználó módosítás/törlés után - a hívó tranzakciójában (commit a hívónál)
+    
+    A saját worker cache-e azonnal, a többieké a következő verzió ellenőrzéskor ürül.
+    """
+    row = db.session.get(ConfigVersion, AUTH_VERSION_KEY)
+    if row:
+        row.version += 1
+        row.updated_at = datetime.datetime.utcnow()
+    else:
+        db.session.add(ConfigVersion(config_key=AUTH_VERSION_KEY, version=1))
+    
+    with _auth_cache_lock:
+        _auth_cache.update({'version': None, 'checked_at': 0.0, 'users': {}})
+
+
+def load_authenticated_user(data):
+    """
+    Principal a dekódolt JWT-ből: aláírt claim-ek → worker cache → adatbázis
+    
+    Returns:
+        AuthenticatedUser vagy None, ha a felhasználó már nem létezik
+    """
+    user_id = data['user_id']
+    version = _current_auth_version()
+    
+    # Aláírt claim-ek, ha a token kiadása óta nem változott felhasználó
+    if data.get('auth_version') == version and 'role' in data:
+        return AuthenticatedUser(user_id, data['role'], data.get('company_id'),
+                                 data.get('department_id'), data.get('name'))
+    
+    now = time.monotonic()
+    with _auth_cache_lock:
+        cached = _auth_cache['users'].get(user_id)
+        if cached and cached[1] > now:
+            return cached[0]
+    
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+    
+    principal = AuthenticatedUser.from_user(user)
+    with _auth_cache_lock:
+        if _auth_cache['version'] == version:
+            _auth_cache['users'][user_id] = (principal, now + AUTH_USER_CACHE_TTL_SECONDS)
+    return principal
+
+
+def generate_token(user):
+    """JWT a felhasználó principal claim-jeivel (v8.4.13)"""
+    return jwt.encode({
+        'user_id': user.id,
+        'role': user.role,
+        'company_id': user.company_id,
+        'department_id': user.department_id,
+        'name': user.name,
+        'auth_version': _current_auth_version(),
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=TOKEN_LIFETIME_HOURS)
+    }, app.config['SECRET_KEY'], algorithm="HS256")
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -419,7 +794,7 @@ def token_required(f):
                 token = token[7:]
             
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
+            current_user = load_authenticated_user(data)  # v8.4.13: cache / JWT claim-ek
             
             if not current_user:
                 return jsonify({'message': 'User nem található!'}), 401
@@ -451,10 +826,7 @@ def login():
     user = User.query.filter_by(email=data.get('email')).first()
     if not user or not check_password_hash(user.password, data.get('password')):
         return jsonify({'message': 'Hibás email vagy jelszó!'}), 401
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-    }, app.config['SECRET_KEY'], algorithm="HS256")
+    token = generate_token(user)
     return jsonify({
         'token': token,
         'user': {
@@ -473,17 +845,18 @@ def login():
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
 def get_current_user(current_user):
+    user = User.query.get_or_404(current_user.id)  # v8.4.13: teljes profil (email, telefon, cég, egység)
     return jsonify({
-        'id': current_user.id,
-        'email': current_user.email,
-        'name': current_user.name,
-        'role': current_user.role,
-        'company_id': current_user.company_id,
-        'company_name': current_user.company.name if current_user.company else None,  # v7.0.17
-        'company_logo': current_user.company.logo_filename if current_user.company else None,  # v7.0.17
-        'department_id': current_user.department_id,  # v7.0.1: Add department_id
-        'department_name': current_user.department.name if current_user.department else None,  # v7.0.1: Add department_name
-        'phone': current_user.phone
+        'id': user.id,
+        'email': user.email,
+        'name': user.name,
+        'role': user.role,
+        'company_id': user.company_id,
+        'company_name': user.company.name if user.company else None,  # v7.0.17
+        'company_logo': user.company.logo_filename if user.company else None,  # v7.0.17
+        'department_id': user.department_id,  # v7.0.1: Add department_id
+        'department_name': user.department.name if user.department else None,  # v7.0.1: Add department_name
+        'phone': user.phone
     })
 
 # --- Request Categories Routes (NEW) ---
@@ -573,7 +946,7 @@ def admin_reseed(current_user):
 @app.route('/api/notifications/unread-count', methods=['GET'])
 @token_required
 def get_unread_count(current_user):
-    count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
+    count = NotificationService.get_unread_count(current_user.id)  # v8.4.11: számláló tábla
     return jsonify({'count': count})
 
 # --- Companies Routes ---
@@ -722,6 +1095,7 @@ def update_department(current_user, dept_id):
 def delete_department(current_user, dept_id):
     dept = Department.query.get_or_404(dept_id)
     db.session.delete(dept)
+    invalidate_auth_cache()  # v8.4.13: felhasználók department_id-ja
     db.session.commit()
     return jsonify({'message': 'Szervezeti egység törölve!'})
 
@@ -854,6 +1228,10 @@ def update_test_type(current_user, test_type_id):
 @role_required('super_admin')
 def delete_test_type(current_user, test_type_id):
     test_type = TestType.query.get_or_404(test_type_id)
+    # v8.4.3: A kapcsolótábla FK-ja nem kaszkádol - hivatkozott típus nem törölhető (PostgreSQL: IntegrityError)
+    count = LabRequestTestType.query.filter_by(test_type_id=test_type_id).count()
+    if count:
+        return jsonify({'message': f'A vizsgálattípus {count} kérésben használatban van! Törlés helyett inaktiváld.'}), 409
     db.session.delete(test_type)
     db.session.commit()
     return jsonify({'message': 'Vizsgálattípus törölve!'})
@@ -876,8 +1254,9 @@ def export_test_types(current_user):
                 'name': tt.name,
                 'description': tt.description,
                 'standard': tt.standard,
-                'price': float(tt.price) if tt.price else None,
-                'cost_price': float(tt.cost_price) if tt.cost_price else None,
+                # v8.4.22: 0 ár is exportálódjon (különben a visszaimport üres árat látna)
+                'price': float(tt.price) if tt.price is not None else None,
+                'cost_price': float(tt.cost_price) if tt.cost_price is not None else None,
                 'turnaround_days': tt.turnaround_days,
                 'turnaround_time': tt.turnaround_time,
                 'measurement_time': tt.measurement_time,
@@ -942,11 +1321,213 @@ def export_test_types(current_user):
         traceback.print_exc()
         return jsonify({'error': f'Export hiba: {str(e)}'}), 500
 
+# v8.4.22: Vizsgálattípus import - validálás, memóriabeli diff, kötegelt upsert
+TEST_TYPE_IMPORT_FIELDS = [
+    'name', 'description', 'standard', 'price', 'cost_price', 'turnaround_days', 'turnaround_time',
+    'measurement_time', 'sample_prep_time', 'sample_prep_required', 'sample_prep_description',
+    'evaluation_time', 'sample_quantity', 'hazard_level', 'device', 'department_id', 'category_id', 'is_active'
+]
+TEST_TYPE_IMPORT_BATCH_SIZE = 500
+TRUE_VALUES = ('1', 'true', 'igen', 'yes', 'i', 'y')
+FALSE_VALUES = ('0', 'false', 'nem', 'no', 'n')
+
+
+def read_test_type_import_file(file):
+    """
+    Feltöltött JSON / CSV / Excel fájl -> dict lista (pandas nélkül)
+    
+    Raises:
+        ValueError: nem támogatott formátum
+    """
+    filename = file.filename.lower()
+    if filename.endswith('.json'):
+        data = json.load(file)
+        return data['test_types'] if isinstance(data, dict) and 'test_types' in data else data
+    
+    if filename.endswith('.csv'):
+        import csv
+        from io import StringIO
+        content = file.read().decode('utf-8-sig')
+        return list(csv.DictReader(StringIO(content)))
+    
+    if filename.endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        # Az export 'Test Types' munkalapot ír - más fájlnál az első lap
+        sheet = workbook['Test Types'] if 'Test Types' in workbook.sheetnames else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else '' for h in next(rows, [])]
+        return [dict(zip(header, row)) for row in rows if any(v is not None for v in row)]
+    
+    raise ValueError('Nem támogatott fájl formátum. Használj JSON, CSV vagy Excel (.xlsx) fájlt.')
+
+
+def coerce_test_type_value(column, value):
+    """
+    Import érték a TestType oszlop típusára (CSV-ből minden szöveg, üres cella = None)
+    
+    Raises:
+        ValueError: nem értelmezhető szám / logikai érték
+    """
+    if value is None or (isinstance(value, float) and value != value):  # None / NaN
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+    
+    python_type = TestType.__table__.columns[column].type.python_type
+    if python_type is bool:
+        if isinstance(value, bool):
+            return value
+        text_value = str(value).strip().lower()
+        if text_value in TRUE_VALUES:
+            return True
+        if text_value in FALSE_VALUES:
+            return False
+        raise ValueError(f"{column}: érvénytelen logikai érték: {value}")
+    if python_type in (int, float):
+        try:
+            number = float(str(value).replace(',', '.')) if isinstance(value, str) else float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{column}: érvénytelen szám: {value}")
+        if python_type is float:
+            return number
+        if number != int(number):
+            raise ValueError(f"{column}: egész szám kell: {value}")
+        return int(number)
+    return str(value)
+
+
+def plan_test_type_import(items):
+    """
+    Import diff: az összes meglévő vizsgálattípus egy lekérdezéssel memóriába, majd soronkénti összevetés
+    
+    Egyeztetés: id (ha létezik), különben név. Frissítésnél csak a fájlban
+    szereplő oszlopok változnak. Részleg / kategória név alapján is megadható
+    (department_name, category_name), ha nincs id.
+    
+    Returns:
+        dict: creates, updates (id -> változott mezők), changes (riport), unchanged, errors
+    """
+    columns = [getattr(TestType, field) for field in TEST_TYPE_IMPORT_FIELDS]
+    existing_by_id = {}
+    existing_by_name = {}
+    for row in db.session.query(TestType.id, *columns):
+        record = dict(zip(['id'] + TEST_TYPE_IMPORT_FIELDS, row))
+        existing_by_id[record['id']] = record
+        existing_by_name[record['name']] = record
+    departments = {name: dept_id for dept_id, name in db.session.query(Department.id, Department.name)}
+    categories = {name: cat_id for cat_id, name in db.session.query(RequestCategory.id, RequestCategory.name)}
+    
+    plan = {'creates': [], 'updates': {}, 'changes': [], 'unchanged': 0, 'errors': []}
+    seen_names = set()
+    
+    for index, item in enumerate(items, 1):
+        label = f"{index}. sor ({item.get('name') or 'név nélkül'})" if isinstance(item, dict) else f"{index}. sor"
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('objektum kell')
+            values = {}
+            for field in TEST_TYPE_IMPORT_FIELDS:
+                if field in item:
+                    values[field] = coerce_test_type_value(field, item[field])
+            for field, name_key, lookup in (('department_id', 'department_name', departments),
+                                            ('category_id', 'category_name', categories)):
+                if values.get(field) is None and item.get(name_key):
+                    if item[name_key] not in lookup:
+                        raise ValueError(f"ismeretlen {name_key}: {item[name_key]}")
+                    values[field] = lookup[item[name_key]]
+            
+            if not values.get('name'):
+                raise ValueError('a név (name) kötelező')
+            if values['name'] in seen_names:
+                raise ValueError('a név többször szerepel a fájlban')
+            seen_names.add(values['name'])
+            if 'price' in values and values['price'] is None:
+                raise ValueError('az ár (price) nem lehet üres')
+            if values.get('department_id') is not None and values['department_id'] not in departments.values():
+                raise ValueError(f"ismeretlen department_id: {values['department_id']}")
+            if values.get('category_id') is not None and values['category_id'] not in categories.values():
+                raise ValueError(f"ismeretlen category_id: {values['category_id']}")
+            
+            item_id = coerce_test_type_value('id', item.get('id')) if 'id' in item else None
+            existing = existing_by_id.get(item_id) or existing_by_name.get(values['name'])
+            if existing and existing['name'] != values['name']:
+                # Átnevezés id alapján - az új név nem ütközhet másik vizsgálattípussal
+                other = existing_by_name.get(values['name'])
+                if other and other['id'] != existing['id']:
+                    raise ValueError(f"a(z) '{values['name']}' név már a #{other['id']} vizsgálattípusé")
+            
+            if not existing:
+                if values.get('price') is None:
+                    raise ValueError('új vizsgálattípushoz az ár (price) kötelező')
+                plan['creates'].append(values)
+                plan['changes'].append({'action': 'create', 'id': None, 'name': values['name']})
+                continue
+            
+            changed = {
+                field: {'old': existing[field], 'new': value}
+                for field, value in values.items() if existing[field] != value
+            }
+            if not changed:
+                plan['unchanged'] += 1
+                continue
+            plan['updates'][existing['id']] = {field: change['new'] for field, change in changed.items()}
+            plan['changes'].append({'action': 'update', 'id': existing['id'], 'name': values['name'], 'fields': changed})
+        except (TypeError, ValueError) as e:
+            plan['errors'].append(f"Hiba ({label}): {str(e)}")
+    
+    return plan
+
+
+def apply_test_type_import(plan):
+    """
+    Diff alkalmazása kötegekben: új sorok INSERT ... ON CONFLICT (name) DO UPDATE-tel,
+    módosítások (átnevezés is) id szerinti executemany UPDATE-tel - a hívó commitol
+    """
+    from sqlalchemy import update
+    now = datetime.datetime.utcnow()
+    table = TestType.__table__
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    # Új sorok - azonos oszlopkészletenként (JSON-ban soronként eltérhet); párhuzamos importnál
+    # a közben létrejött azonos nevű sort frissítjük
+    creates_by_columns = {}
+    for values in plan['creates']:
+        creates_by_columns.setdefault(tuple(sorted(values)), []).append(values)
+    for column_names, rows in creates_by_columns.items():
+        for start in range(0, len(rows), TEST_TYPE_IMPORT_BATCH_SIZE):
+            batch = [{**row, 'created_at': now, 'updated_at': now} for row in rows[start:start + TEST_TYPE_IMPORT_BATCH_SIZE]]
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['name'],
+                set_={**{name: statement.excluded[name] for name in column_names if name != 'name'}, 'updated_at': now}
+            )
+            db.session.execute(statement, batch)
+    
+    updates_by_columns = {}
+    for test_type_id, values in plan['updates'].items():
+        updates_by_columns.setdefault(tuple(sorted(values)), []).append({'id': test_type_id, **values, 'updated_at': now})
+    for rows in updates_by_columns.values():
+        for start in range(0, len(rows), TEST_TYPE_IMPORT_BATCH_SIZE):
+            db.session.execute(update(TestType), rows[start:start + TEST_TYPE_IMPORT_BATCH_SIZE])
+
+
 @app.route('/api/import/test-types', methods=['POST'])
 @token_required
 @role_required('super_admin')
 def import_test_types(current_user):
-    """Import test types from JSON or CSV"""
+    """
+    Import test types from JSON, CSV or Excel
+    
+    v8.4.22: validálás -> diff -> kötegelt upsert (néhány lekérdezés soronkénti 2 helyett).
+    ?dry_run=true: csak a diff riport, adatbázis írás nélkül.
+    Hibás sorok kimaradnak (errors), a többi importálódik.
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'Nincs fájl feltöltve'}), 400
     
@@ -955,86 +1536,31 @@ def import_test_types(current_user):
     if file.filename == '':
         return jsonify({'error': 'Üres fájlnév'}), 400
     
+    dry_run = request.args.get('dry_run', request.form.get('dry_run', 'false')).lower() in ('true', '1')
+    
     try:
-        # Determine file type
-        if file.filename.endswith('.json'):
-            data = json.load(file)
-            if 'test_types' in data:
-                test_types_data = data['test_types']
-            else:
-                test_types_data = data
-        
-        elif file.filename.endswith('.csv'):
-            import pandas as pd
-            df = pd.read_csv(file)
-            test_types_data = df.to_dict('records')
-        
-        elif file.filename.endswith('.xlsx') or file.filename.endswith('.xls'):
-            import pandas as pd
-            df = pd.read_excel(file, sheet_name='Test Types')
-            test_types_data = df.to_dict('records')
-        
-        else:
-            return jsonify({'error': 'Nem támogatott fájl formátum. Használj JSON, CSV vagy Excel fájlt.'}), 400
-        
-        # Import/update test types
-        created = 0
-        updated = 0
-        errors = []
-        
-        for item in test_types_data:
-            try:
-                # Check if exists (by id or name)
-                existing = None
-                if 'id' in item and item['id']:
-                    existing = TestType.query.get(item['id'])
-                
-                if not existing and 'name' in item:
-                    existing = TestType.query.filter_by(name=item['name']).first()
-                
-                if existing:
-                    # Update
-                    for key, value in item.items():
-                        if key not in ['id', 'department_name', 'category_name'] and hasattr(existing, key):
-                            # Handle NaN/None values
-                            if pd.isna(value) if 'pandas' in str(type(value)) else value is None:
-                                value = None
-                            setattr(existing, key, value)
-                    updated += 1
-                else:
-                    # Create new
-                    new_test_type = TestType(
-                        name=item.get('name'),
-                        description=item.get('description'),
-                        standard=item.get('standard'),
-                        price=item.get('price'),
-                        cost_price=item.get('cost_price'),
-                        turnaround_days=item.get('turnaround_days'),
-                        turnaround_time=item.get('turnaround_time'),
-                        measurement_time=item.get('measurement_time'),
-                        sample_prep_time=item.get('sample_prep_time'),
-                        sample_prep_required=item.get('sample_prep_required', False),
-                        sample_prep_description=item.get('sample_prep_description'),
-                        evaluation_time=item.get('evaluation_time'),
-                        sample_quantity=item.get('sample_quantity'),
-                        hazard_level=item.get('hazard_level'),
-                        device=item.get('device'),
-                        department_id=item.get('department_id'),
-                        category_id=item.get('category_id')
-                    )
-                    db.session.add(new_test_type)
-                    created += 1
-            
-            except Exception as e:
-                errors.append(f"Hiba ({item.get('name', 'unknown')}): {str(e)}")
-        
-        db.session.commit()
+        try:
+            test_types_data = read_test_type_import_file(file)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not isinstance(test_types_data, list):
+            return jsonify({'error': 'A fájlnak vizsgálattípusok listáját kell tartalmaznia'}), 400
+        
+        plan = plan_test_type_import(test_types_data)
+        if not dry_run:
+            apply_test_type_import(plan)
+            db.session.commit()
+            print(f"📥 Vizsgálattípus import: {len(plan['creates'])} új, {len(plan['updates'])} módosított, "
+                  f"{plan['unchanged']} változatlan, {len(plan['errors'])} hiba")
         
         return jsonify({
-            'message': 'Import sikeres!',
-            'created': created,
-            'updated': updated,
-            'errors': errors
+            'message': 'Import előnézet (nem mentve)' if dry_run else 'Import sikeres!',
+            'dry_run': dry_run,
+            'created': len(plan['creates']),
+            'updated': len(plan['updates']),
+            'unchanged': plan['unchanged'],
+            'errors': plan['errors'],
+            'changes': plan['changes']
         })
     
     except Exception as e:
@@ -1042,50 +1568,172 @@ def import_test_types(current_user):
         return jsonify({'error': f'Import hiba: {str(e)}'}), 500
 
 # --- Lab Requests Routes ---
-def get_test_type_details(test_type_ids):
-    """Return detailed test type info for a request"""
-    try:
-        ids = json.loads(test_type_ids)
-        test_types = TestType.query.filter(TestType.id.in_(ids)).all()
-        return [{
-            'id': tt.id,
-            'name': tt.name,
-            'description': tt.description,
-            'standard': tt.standard,
-            'price': tt.price,
-            'cost_price': tt.cost_price,
-            'turnaround_days': tt.turnaround_days,
-            'turnaround_time': tt.turnaround_time,
-            'measurement_time': tt.measurement_time,
-            'sample_prep_time': tt.sample_prep_time,
-            'sample_prep_required': tt.sample_prep_required,
-            'sample_prep_description': tt.sample_prep_description,
-            'evaluation_time': tt.evaluation_time,
-            'sample_quantity': tt.sample_quantity,
-            'hazard_level': tt.hazard_level,
-            'device': tt.device,
-            'department_name': tt.department.name if tt.department else None,
-            'category_name': tt.category.name if tt.category else None
-        } for tt in test_types]
-    except:
-        return []
+def serialize_test_type_detail(tt, department_name=None, category_name=None):
+    """Egy vizsgálattípus részletes adatai kérés válaszokhoz"""
+    return {
+        'id': tt.id,
+        'name': tt.name,
+        'description': tt.description,
+        'standard': tt.standard,
+        'price': tt.price,
+        'cost_price': tt.cost_price,
+        'turnaround_days': tt.turnaround_days,
+        'turnaround_time': tt.turnaround_time,
+        'measurement_time': tt.measurement_time,
+        'sample_prep_time': tt.sample_prep_time,
+        'sample_prep_required': tt.sample_prep_required,
+        'sample_prep_description': tt.sample_prep_description,
+        'evaluation_time': tt.evaluation_time,
+        'sample_quantity': tt.sample_quantity,
+        'hazard_level': tt.hazard_level,
+        'device': tt.device,
+        'department_name': department_name,
+        'category_name': category_name
+    }
 
-@app.route('/api/requests', methods=['GET'])
-@token_required
-def get_requests(current_user):
-    if current_user.role == 'super_admin':
-        requests = LabRequest.query.all()
-    elif current_user.role == 'labor_staff':
-        # v7.0.27: Labor staff in_progress, validation_pending, completed ÉS arrived_at_provider (logisztikai)
-        requests = LabRequest.query.filter(
-            LabRequest.status.in_(['arrived_at_provider', 'in_progress', 'validation_pending', 'completed'])
-        ).all()
-    elif current_user.role == 'company_admin':
-        requests = LabRequest.query.filter_by(company_id=current_user.company_id).all()
-    else:
-        requests = LabRequest.query.filter_by(user_id=current_user.id).all()
+def get_request_test_type_details(req):
+    """Return detailed test type info for a request (v8.4.3: kapcsolótáblából)"""
+    return [
+        serialize_test_type_detail(
+            tt,
+            tt.department.name if tt.department else None,
+            tt.category.name if tt.category else None
+        )
+        for tt in req.requested_test_types
+    ]
+
+# v8.4.3: Kért vizsgálatok beállítása - kapcsolótábla + legacy JSON mező együtt
+def set_request_test_types(req, test_type_ids):
+    """
+    Kérés vizsgálatainak beállítása
     
-    return jsonify([{
+    A sorrendet megtartja, a duplikált ID-kat kiszűri. A legacy JSON test_types
+    mezőt is frissíti, hogy a régi kódutak és exportok ugyanazt lássák.
+    
+    Returns:
+        list: a beállított (deduplikált) vizsgálattípus ID-k
+    """
+    ids = []
+    for tt_id in test_type_ids:
+        tt_id = int(tt_id)
+        if tt_id not in ids:
+            ids.append(tt_id)
+    
+    req.test_types = json.dumps(ids)
+    # Meglévő sorok újrahasznosítása, a kimaradók a delete-orphan cascade miatt törlődnek
+    existing = {link.test_type_id: link for link in req.test_type_links}
+    links = []
+    for position, tt_id in enumerate(ids):
+        link = existing.get(tt_id) or LabRequestTestType(test_type_id=tt_id)
+        link.position = position
+        links.append(link)
+    req.test_type_links = links
+    return ids
+
+# v8.4.1: Batch-betöltött lista szerializáció
+# A lista endpointok kérésenként futtatták a get_test_type_details() lekérdezést és
+# lazy-load-olták a user/company/approver/category kapcsolatokat (N+1 probléma).
+# Itt minden hivatkozott rekordot fix számú lekérdezéssel töltünk be, és
+# memóriabeli map-ekből építjük a választ - a lekérdezések száma nem függ a lista méretétől.
+def build_request_list_maps(requests):
+    """
+    Kérés lista hivatkozásainak batch betöltése
+
+    Lekérdezések: lab_request_test_type + test_type (egy join), department +
+    request_category (egy-egy IN lekérdezés), user, company - összesen legfeljebb 5,
+    a kérések számától függetlenül.
+
+    Returns:
+        dict: test_types / request_test_types / users / companies / categories map-ek
+    """
+    request_ids = set()
+    user_ids = set()
+    company_ids = set()
+    category_ids = set()
+    for req in requests:
+        request_ids.add(req.id)
+        user_ids.add(req.user_id)
+        if req.approved_by:
+            user_ids.add(req.approved_by)
+        if req.company_id:
+            company_ids.add(req.company_id)
+        if req.category_id:
+            category_ids.add(req.category_id)
+
+    # v8.4.3: Kérés -> vizsgálatok a kapcsolótáblából, egyetlen join lekérdezéssel
+    test_types = {}
+    request_test_types = {}
+    if request_ids:
+        rows = db.session.query(LabRequestTestType.lab_request_id, TestType)\
+            .join(TestType, TestType.id == LabRequestTestType.test_type_id)\
+            .filter(LabRequestTestType.lab_request_id.in_(request_ids))\
+            .order_by(LabRequestTestType.lab_request_id, LabRequestTestType.position)
+        for request_id, tt in rows:
+            test_types[tt.id] = tt
+            request_test_types.setdefault(request_id, []).append(tt.id)
+    test_types = list(test_types.values())
+    department_ids = {tt.department_id for tt in test_types if tt.department_id}
+    category_ids.update(tt.category_id for tt in test_types if tt.category_id)
+
+    departments = {}
+    if department_ids:
+        departments = {
+            dept_id: name for dept_id, name in
+            db.session.query(Department.id, Department.name).filter(Department.id.in_(department_ids))
+        }
+
+    categories = {}
+    if category_ids:
+        categories = {
+            cat.id: {'id': cat.id, 'name': cat.name, 'color': cat.color}
+            for cat in db.session.query(RequestCategory.id, RequestCategory.name, RequestCategory.color)
+                .filter(RequestCategory.id.in_(category_ids))
+        }
+
+    users = {}
+    if user_ids:
+        users = {
+            user_id: name for user_id, name in
+            db.session.query(User.id, User.name).filter(User.id.in_(user_ids))
+        }
+
+    companies = {}
+    if company_ids:
+        companies = {
+            company_id: name for company_id, name in
+            db.session.query(Company.id, Company.name).filter(Company.id.in_(company_ids))
+        }
+
+    # Ugyanaz a szerkezet, mint get_request_test_type_details() kimenete
+    test_type_details = {}
+    for tt in test_types:
+        category = categories.get(tt.category_id)
+        test_type_details[tt.id] = serialize_test_type_detail(
+            tt,
+            departments.get(tt.department_id),
+            category['name'] if category else None
+        )
+
+    return {
+        'test_types': test_type_details,
+        'request_test_types': request_test_types,
+        'users': users,
+        'companies': companies,
+        'categories': categories
+    }
+
+def request_test_types_from_maps(req, maps):
+    """Egy kérés vizsgálatai a batch map-ből (a kérésen belüli sorrendben)"""
+    return [
+        maps['test_types'][tt_id]
+        for tt_id in maps['request_test_types'].get(req.id, [])
+    ]
+
+def serialize_request_list(requests):
+    """GET /api/requests lista elemei - konstans számú lekérdezéssel"""
+    maps = build_request_list_maps(requests)
+
+    return [{
         'id': req.id,
         # v6.7 azonosítók
         'request_number': req.request_number,
@@ -1102,7 +1750,7 @@ def get_requests(current_user):
         'contact_person': req.contact_person,
         'contact_phone': req.contact_phone,
         # Vizsgálatok
-        'test_types': get_test_type_details(req.test_types),
+        'test_types': request_test_types_from_maps(req, maps),
         'total_price': req.total_price,
         # Prioritás
         'urgency': req.urgency,
@@ -1111,17 +1759,184 @@ def get_requests(current_user):
         'special_instructions': req.special_instructions,
         'attachment_filename': req.attachment_filename,
         'status': req.status,
-        'category': {
-            'id': req.category.id,
-            'name': req.category.name,
-            'color': req.category.color
-        } if req.category else None,
+        'category': maps['categories'].get(req.category_id),
         'created_at': req.created_at.isoformat(),
-        'user_name': req.user.name,
-        'company_name': req.company.name if req.company else None,
-        'approved_by': req.approver.name if req.approver else None,
+        'user_name': maps['users'].get(req.user_id),
+        'company_name': maps['companies'].get(req.company_id),
+        'approved_by': maps['users'].get(req.approved_by) if req.approved_by else None,
         'approved_at': req.approved_at.isoformat() if req.approved_at else None
-    } for req in requests])
+    } for req in requests]
+
+# v8.4.2: Keyset lapozás és szerveroldali szűrés a lista endpointokhoz
+# Lapozás (created_at, id) szerint: ?limit=50&cursor=<X-Next-Cursor érték>
+# limit nélkül a teljes (szűrt) lista jön vissza, ahogy eddig.
+REQUEST_LIST_MAX_LIMIT = 200
+
+def _parse_list_date(value, end_of_day=False):
+    """Szűrő dátum (YYYY-MM-DD vagy ISO datetime) -> datetime"""
+    parsed = datetime.datetime.fromisoformat(value)
+    if end_of_day and len(value) <= 10:
+        parsed = parsed + datetime.timedelta(days=1)
+    return parsed
+
+def escape_like(value):
+    """LIKE minta speciális karakterei (\\, %, _) szó szerint - escape='\\' mellett"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def apply_request_list_filters(query, args):
+    """
+    Szerveroldali szűrők LabRequest lekérdezésre
+
+    Query paraméterek:
+        status: egy vagy több státusz vesszővel elválasztva ('all' = nincs szűrés)
+        urgency: normal / urgent / critical
+        company_id, category_id: azonosító
+        created_from, created_to: létrehozás dátum intervallum (created_to napja is benne van)
+        request_number: kérés azonosító prefix (pl. MOL-20241124)
+        search: szabad szöveges keresés (azonosítók, minta leírás, cég és kérő neve)
+
+    Raises:
+        ValueError: hibás szám vagy dátum paraméter esetén
+    """
+    statuses = [s for s in args.get('status', '').split(',') if s and s != 'all']
+    if statuses:
+        query = query.filter(LabRequest.status.in_(statuses))
+
+    if args.get('urgency'):
+        query = query.filter(LabRequest.urgency == args['urgency'])
+
+    if args.get('company_id'):
+        query = query.filter(LabRequest.company_id == int(args['company_id']))
+
+    if args.get('category_id'):
+        query = query.filter(LabRequest.category_id == int(args['category_id']))
+
+    if args.get('created_from'):
+        query = query.filter(LabRequest.created_at >= _parse_list_date(args['created_from']))
+
+    if args.get('created_to'):
+        query = query.filter(LabRequest.created_at < _parse_list_date(args['created_to'], end_of_day=True))
+
+    if args.get('request_number'):
+        prefix = escape_like(args['request_number'])
+        query = query.filter(LabRequest.request_number.like(f"{prefix}%", escape='\\'))
+
+    if args.get('search'):
+        # Cég és kérő neve is (aliased join: nem ütközik a hívó saját Company / User joinjaival;
+        # mindkettő many-to-one, sor nem duplikálódik). A % és _ a keresett szövegben szó szerint értendő.
+        search_company = aliased(Company)
+        search_requester = aliased(User)
+        term = f"%{escape_like(args['search'].lower())}%"
+        query = query.outerjoin(search_company, search_company.id == LabRequest.company_id)\
+            .outerjoin(search_requester, search_requester.id == LabRequest.user_id)\
+            .filter(db.or_(
+                db.func.lower(LabRequest.request_number).like(term, escape='\\'),
+                db.func.lower(LabRequest.internal_id).like(term, escape='\\'),
+                db.func.lower(LabRequest.sample_id).like(term, escape='\\'),
+                db.func.lower(LabRequest.sample_description).like(term, escape='\\'),
+                search_company.name.ilike(term, escape='\\'),
+                search_requester.name.ilike(term, escape='\\')
+            ))
+
+    return query
+
+def encode_list_cursor(req):
+    """Lapozási cursor: (created_at, id) base64-ben"""
+    import base64
+    raw = f"{req.created_at.isoformat()}|{req.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_list_cursor(cursor):
+    """Cursor -> (created_at, id); hibás cursor esetén ValueError"""
+    import base64
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, req_id = raw.split('|')
+        return datetime.datetime.fromisoformat(created_at), int(req_id)
+    except Exception:
+        raise ValueError('Érvénytelen cursor')
+
+def paginate_request_query(query, args):
+    """
+    Rendezés és keyset lapozás (created_at, id) szerint
+
+    Query paraméterek: limit, cursor, order (desc = legújabb elöl, asc)
+
+    Returns:
+        tuple: (kérések listája, válasz header-ök dict)
+
+    Raises:
+        ValueError: hibás limit / cursor / order esetén
+    """
+    order = args.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError('Érvénytelen rendezés (asc vagy desc)')
+
+    headers = {'X-Total-Count': str(query.order_by(None).count())}
+
+    if order == 'desc':
+        query = query.order_by(LabRequest.created_at.desc(), LabRequest.id.desc())
+    else:
+        query = query.order_by(LabRequest.created_at.asc(), LabRequest.id.asc())
+
+    if args.get('cursor'):
+        cursor_created_at, cursor_id = decode_list_cursor(args['cursor'])
+        if order == 'desc':
+            query = query.filter(db.or_(
+                LabRequest.created_at < cursor_created_at,
+                db.and_(LabRequest.created_at == cursor_created_at, LabRequest.id < cursor_id)
+            ))
+        else:
+            query = query.filter(db.or_(
+                LabRequest.created_at > cursor_created_at,
+                db.and_(LabRequest.created_at == cursor_created_at, LabRequest.id > cursor_id)
+            ))
+
+    if not args.get('limit'):
+        return query.all(), headers
+
+    limit = int(args['limit'])
+    if limit < 1:
+        raise ValueError('A limit legalább 1 kell legyen')
+    limit = min(limit, REQUEST_LIST_MAX_LIMIT)
+
+    # Egy plusz sor: ebből tudjuk, hogy van-e következő oldal
+    requests = query.limit(limit + 1).all()
+    if len(requests) > limit:
+        requests = requests[:limit]
+        headers['X-Next-Cursor'] = encode_list_cursor(requests[-1])
+
+    return requests, headers
+
+def visible_requests_query(current_user):
+    """A felhasználó által látható kérések (szerepkör szerinti szűrés)"""
+    if current_user.role == 'super_admin':
+        return LabRequest.query
+    if current_user.role == 'labor_staff':
+        # v7.0.27: Labor staff in_progress, validation_pending, completed ÉS arrived_at_provider (logisztikai)
+        return LabRequest.query.filter(
+            LabRequest.status.in_(['arrived_at_provider', 'in_progress', 'validation_pending', 'completed'])
+        )
+    if current_user.role == 'company_admin':
+        return LabRequest.query.filter_by(company_id=current_user.company_id)
+    return LabRequest.query.filter_by(user_id=current_user.id)
+
+@app.route('/api/requests', methods=['GET'])
+@token_required
+def get_requests(current_user):
+    query = visible_requests_query(current_user)
+    
+    # v8.4.2: Szerveroldali szűrés + keyset lapozás
+    try:
+        query = apply_request_list_filters(query, request.args)
+        requests, headers = paginate_request_query(query, request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    # v8.4.1: Batch szerializáció (fix lekérdezésszám)
+    response = jsonify(serialize_request_list(requests))
+    response.headers.update(headers)
+    return response
 
 @app.route('/api/requests/<int:request_id>', methods=['GET'])
 @token_required
@@ -1152,7 +1967,7 @@ def get_request_detail(current_user, request_id):
         'contact_phone': req.contact_phone,
         'sampling_address': req.sampling_address,  # Legacy
         # Vizsgálatok
-        'test_types': get_test_type_details(req.test_types),
+        'test_types': get_request_test_type_details(req),
         'total_price': req.total_price,
         # Prioritás
         'urgency': req.urgency,
@@ -1188,6 +2003,9 @@ def create_request(current_user):
     if test_type_ids:
         test_types = TestType.query.filter(TestType.id.in_(test_type_ids)).all()
         total_price = sum(tt.price for tt in test_types)
+        # v8.4.3: Csak létező vizsgálattípusok kerülhetnek a kapcsolótáblába (FK)
+        existing_ids = {tt.id for tt in test_types}
+        test_type_ids = [int(tt_id) for tt_id in test_type_ids if int(tt_id) in existing_ids]
     
     # v6.7: Parse datetime with time
     sampling_datetime = None
@@ -1237,8 +2055,7 @@ def create_request(current_user):
         contact_person=data.get('contact_person'),
         contact_phone=data.get('contact_phone'),
         sampling_address=data.get('shipping_address'),  # Legacy alias
-        # Vizsgálatok
-        test_types=json.dumps(test_type_ids),
+        # Vizsgálatok (v8.4.3: set_request_test_types() tölti ki)
         total_price=total_price,
         # Prioritás
         urgency=data.get('urgency', 'normal'),
@@ -1258,10 +2075,12 @@ def create_request(current_user):
             file.save(filepath)
             new_request.attachment_filename = filename
     
+    test_type_ids = set_request_test_types(new_request, test_type_ids)
     db.session.add(new_request)
+    status_history.record_created(new_request, current_user)  # v8.4.25
     
-    # Single commit for request
-    db.session.commit()
+    # v8.4.6: Flush az ID miatt - kérés, eredmény sorok és outbox egy commit-ban
+    db.session.flush()
     
     # v8.0: Notification Service - új kérés létrehozva (draft státuszba)
     event_data = {
@@ -1282,6 +2101,8 @@ def create_request(current_user):
             status='pending'
         )
         db.session.add(result)
+    
+    # Single commit for request
     db.session.commit()
     
     return jsonify({
@@ -1290,6 +2111,228 @@ def create_request(current_user):
         'request_number': new_request.request_number
     }), 201
 
+# v8.4.15: Tömeges kérés létrehozás (mintavételi kampányok)
+BULK_REQUEST_FIELDS = [
+    'internal_id', 'sample_id', 'sample_description', 'sampling_datetime', 'sampling_location',
+    'logistics_type', 'shipping_address', 'contact_person', 'contact_phone',
+    'urgency', 'deadline', 'special_instructions', 'test_types', 'status'
+]
+BULK_REQUEST_CHOICES = {
+    'status': ('draft', 'pending_approval'),
+    'urgency': ('normal', 'urgent', 'critical'),
+    'logistics_type': ('sender', 'provider'),
+}
+
+
+def read_bulk_request_payload():
+    """
+    Tömeges kérés bemenet beolvasása
+    
+    JSON: {"defaults": {...}, "requests": [{...}, ...]} vagy csak a lista.
+    CSV: multipart 'file' mező (fejléc = mezőnevek, ',' vagy ';' elválasztó),
+    a többi form mező a közös (default) értékeket adja.
+    
+    Returns:
+        (defaults dict, sorok listája) - hibánál ValueError
+    """
+    if request.is_json:
+        payload = request.get_json()
+        if isinstance(payload, list):
+            return {}, payload
+        if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+            raise ValueError('A JSON-nak "requests" listát kell tartalmaznia')
+        return payload.get('defaults') or {}, payload['requests']
+    
+    file = request.files.get('file')
+    if not file or not file.filename:
+        raise ValueError('Nincs fájl feltöltve (CSV) és a kérés nem JSON')
+    
+    import csv
+    import io
+    content = file.read().decode('utf-8-sig')
+    try:
+        dialect = csv.Sniffer().sniff(content[:4096], delimiters=',;')
+    except csv.Error:
+        dialect = csv.excel
+    rows = [
+        {key.strip(): value.strip() for key, value in row.items() if key and value is not None and value.strip() != ''}
+        for row in csv.DictReader(io.StringIO(content), dialect=dialect)
+    ]
+    return request.form.to_dict(), rows
+
+
+def parse_bulk_test_type_ids(value):
+    """Vizsgálattípus ID-k: lista, JSON lista vagy '1|2|3' / '1;2;3' szöveg"""
+    if isinstance(value, list):
+        return [int(v) for v in value]
+    value = str(value or '').strip()
+    if value.startswith('['):
+        return [int(v) for v in json.loads(value)]
+    import re
+    return [int(v) for v in re.split(r'[|;,\s]+', value) if v]
+
+
+def validate_bulk_request_rows(defaults, rows, test_types_by_id):
+    """
+    Minden sor ellenőrzése beszúrás előtt
+    
+    Returns:
+        (kész sor dict-ek listája, hibák listája [{row, field, message}])
+    """
+    parsed, errors = [], []
+    
+    for index, raw in enumerate(rows, start=1):
+        if not isinstance(raw, dict):
+            errors.append({'row': index, 'field': None, 'message': 'A sornak objektumnak kell lennie'})
+            continue
+        
+        item = {field: raw.get(field, defaults.get(field)) for field in BULK_REQUEST_FIELDS}
+        unknown = sorted(set(raw) - set(BULK_REQUEST_FIELDS))
+        if unknown:
+            errors.append({'row': index, 'field': ', '.join(unknown), 'message': 'Ismeretlen mező'})
+        
+        try:
+            ids = parse_bulk_test_type_ids(item['test_types'])
+        except (ValueError, TypeError):
+            ids = None
+            errors.append({'row': index, 'field': 'test_types', 'message': 'Hibás vizsgálattípus lista'})
+        if ids is not None:
+            missing = [tt_id for tt_id in ids if tt_id not in test_types_by_id]
+            if not ids:
+                errors.append({'row': index, 'field': 'test_types', 'message': 'Legalább egy vizsgálat szükséges'})
+            elif missing:
+                errors.append({'row': index, 'field': 'test_types', 'message': f'Nem létező vizsgálattípus: {missing}'})
+            item['test_types'] = list(dict.fromkeys(ids))
+        
+        for field in ('sampling_datetime', 'deadline'):
+            value = item[field]
+            if value in (None, ''):
+                item[field] = None
+                continue
+            try:
+                item[field] = datetime.datetime.fromisoformat(str(value))
+            except ValueError:
+                errors.append({'row': index, 'field': field, 'message': f'Hibás dátum: {value}'})
+        
+        for field, choices in BULK_REQUEST_CHOICES.items():
+            item[field] = item[field] or choices[0]
+            if item[field] not in choices:
+                errors.append({'row': index, 'field': field, 'message': f'Érvénytelen érték: {item[field]}'})
+        
+        parsed.append(item)
+    
+    return parsed, errors
+
+
+@app.route('/api/requests/bulk', methods=['POST'])
+@token_required
+def create_requests_bulk(current_user):
+    """
+    v8.4.15: Tömeges kérés létrehozás CSV / JSON kötegből
+    
+    Minden sort előre ellenőrzünk - bármely hibánál egy kérés sem jön létre (400,
+    soronkénti hibalista). Utána egy tranzakcióban: kérésszámok egy számláló
+    növeléssel, LabRequest / kapcsolótábla / TestResult sorok tömeges INSERT-tel,
+    és egyetlen összesített értesítés címzettenként.
+    """
+    if not current_user.company_id:
+        return jsonify({'message': 'Tömeges létrehozáshoz céghez rendelt felhasználó szükséges!'}), 400
+    
+    try:
+        defaults, rows = read_bulk_request_payload()
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'message': f'Hibás bemenet: {str(e)}'}), 400
+    
+    if not rows:
+        return jsonify({'message': 'Nincs létrehozandó kérés!'}), 400
+    max_rows = app.config['BULK_REQUEST_MAX_ROWS']
+    if len(rows) > max_rows:
+        return jsonify({'message': f'Egy kötegben legfeljebb {max_rows} kérés hozható létre!'}), 400
+    
+    test_types_by_id = {tt.id: tt for tt in TestType.query.all()}
+    items, errors = validate_bulk_request_rows(defaults, rows, test_types_by_id)
+    if errors:
+        return jsonify({'message': 'Hibás sorok - egy kérés sem jött létre!', 'errors': errors}), 400
+    
+    company = Company.query.get(current_user.company_id)
+    company_short = company.name[:5] if company else 'LAB'
+    request_numbers = generate_request_numbers(company_short, len(items))
+    now = datetime.datetime.utcnow()
+    
+    request_rows = []
+    for item, request_number in zip(items, request_numbers):
+        status = item['status']
+        # v7.0.29: Company admin jóváhagyásra küldésnél automatikusan awaiting_shipment
+        if current_user.role == 'company_admin' and status == 'pending_approval':
+            status = 'awaiting_shipment'
+        request_rows.append({
+            'user_id': current_user.id,
+            'company_id': current_user.company_id,
+            'request_number': request_number,
+            'internal_id': item['internal_id'] or '',
+            'sample_id': item['sample_id'] or item['internal_id'] or '',
+            'sample_description': item['sample_description'],
+            'sampling_datetime': item['sampling_datetime'],
+            'sampling_location': item['sampling_location'],
+            'logistics_type': item['logistics_type'],
+            'shipping_address': item['shipping_address'],
+            'contact_person': item['contact_person'],
+            'contact_phone': item['contact_phone'],
+            'sampling_address': item['shipping_address'],  # Legacy alias
+            'test_types': json.dumps(item['test_types']),
+            'total_price': sum(test_types_by_id[tt_id].price or 0 for tt_id in item['test_types']),
+            'urgency': item['urgency'],
+            'deadline': item['deadline'],
+            'status': status,
+            'special_instructions': item['special_instructions'],
+            'created_at': now,
+            'updated_at': now
+        })
+    
+    # RETURNING nélkül: SQLite-on a sorrendtartó RETURNING soronkénti INSERT-re váltana;
+    # az ID-kat az egyedi kérésszámok alapján egy lekérdezéssel olvassuk vissza
+    db.session.execute(db.insert(LabRequest), request_rows)
+    stats_rollup.record_inserted_rows(db.session.connection(), request_rows)  # v8.4.23: Core INSERT - nincs ORM esemény
+    ids_by_number = dict(db.session.execute(
+        db.select(LabRequest.request_number, LabRequest.id).where(LabRequest.request_number.in_(request_numbers))
+    ).all())
+    request_ids = [ids_by_number[request_number] for request_number in request_numbers]
+    status_history.record_inserted_rows(db.session.connection(), request_ids, request_rows, current_user)  # v8.4.25
+    
+    link_rows, result_rows = [], []
+    for request_id, item in zip(request_ids, items):
+        for position, tt_id in enumerate(item['test_types']):
+            link_rows.append({'lab_request_id': request_id, 'test_type_id': tt_id, 'position': position})
+            result_rows.append({'lab_request_id': request_id, 'test_type_id': tt_id, 'status': 'pending'})
+    db.session.execute(db.insert(LabRequestTestType), link_rows)
+    db.session.execute(db.insert(TestResult), result_rows)
+    
+    # Egy összesített értesítés a teljes kötegről (kérésenkénti helyett)
+    frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+    prefix = request_numbers[0].rsplit('-', 1)[0] + '-'
+    NotificationService.notify('status_to_draft', event_data={
+        'request_count': len(request_numbers),
+        'request_number': f"{request_numbers[0]} … {request_numbers[-1]}" if len(request_numbers) > 1 else request_numbers[0],
+        'request_number_prefix': prefix,
+        'company_id': current_user.company_id,
+        'company_name': company.name if company else '',
+        'requester_name': current_user.name,
+        'new_status': 'draft',
+        'old_status': None,
+        'request_url': f"{frontend_url}/requests?search={prefix}"
+    })
+    
+    db.session.commit()
+    
+    return jsonify({
+        'message': f'{len(request_ids)} laborkérés sikeresen létrehozva!',
+        'count': len(request_ids),
+        'requests': [
+            {'id': request_id, 'request_number': request_number, 'internal_id': row['internal_id']}
+            for request_id, request_number, row in zip(request_ids, request_numbers, request_rows)
+        ]
+    }), 201
+
 @app.route('/api/requests/<int:request_id>', methods=['PUT'])
 @token_required
 def update_request(current_user, request_id):
@@ -1299,18 +2342,11 @@ def update_request(current_user, request_id):
     if current_user.role == 'company_user' and req.user_id != current_user.id:
         return jsonify({'message': 'Nincs jogosultságod!'}), 403
     
-    old_status = req.status
-    
     # Update fields
     if 'status' in data:
-        old_status_value = old_status
-        new_status_value = data['status']
-        req.status = new_status_value
-        
-        # Legacy support: submitted → arrived_at_provider
-        if new_status_value == 'submitted':
-            new_status_value = 'arrived_at_provider'
-            req.status = new_status_value
+        # v8.4.25: Központi státuszváltás (esemény napló; legacy submitted → arrived_at_provider)
+        old_status_value = status_history.transition(req, data['status'], current_user, 'update_request')
+        new_status_value = req.status
         
         # v8.0: Státuszváltozás notification
         if new_status_value != old_status_value:
@@ -1365,8 +2401,9 @@ def update_request(current_user, request_id):
         req.special_instructions = data['special_instructions']
     if 'test_types' in data:
         test_type_ids = json.loads(data['test_types'])
-        req.test_types = json.dumps(test_type_ids)
         test_types = TestType.query.filter(TestType.id.in_(test_type_ids)).all()
+        existing_ids = {tt.id for tt in test_types}
+        set_request_test_types(req, [tt_id for tt_id in test_type_ids if int(tt_id) in existing_ids])
         req.total_price = sum(tt.price for tt in test_types)
     
     # Handle new attachment
@@ -1433,11 +2470,22 @@ def delete_request(current_user, request_id):
                     print(f"TestResult melléklet törlési hiba: {e}")
     TestResult.query.filter_by(lab_request_id=request_id).delete()
     
-    # v7.0.16: LabRequestTestType törölve - ez a tábla már nem létezik
-    # A vizsgálat típusok JSON-ban vannak tárolva (test_types mező)
+    # v8.4.3: Kapcsolótábla sorok törlése (SQLite-on az ON DELETE CASCADE nem mindig aktív)
+    LabRequestTestType.query.filter_by(lab_request_id=request_id).delete()
+    LabRequestTestFact.query.filter_by(lab_request_id=request_id).delete()  # v8.4.24
+    LabRequestStatusEvent.query.filter_by(lab_request_id=request_id).delete()  # v8.4.25
     
-    # Notification-ok törlése
+    # Notification-ok törlése (v8.4.11: olvasatlan számlálók csökkentése is)
+    unread_by_user = db.session.query(Notification.user_id, db.func.count(Notification.id))\
+        .filter(Notification.request_id == request_id, Notification.is_read == 0)\
+        .group_by(Notification.user_id).all()
+    NotificationService.adjust_unread_counters({user_id: -count for user_id, count in unread_by_user})
     Notification.query.filter_by(request_id=request_id).delete()
+    # v8.4.6: Még ki nem küldött értesítések (a feldolgozás alatt állót a dispatch hagyja ki)
+    NotificationOutbox.query.filter(
+        NotificationOutbox.request_id == request_id,
+        NotificationOutbox.status.in_(('pending', 'failed'))
+    ).delete(synchronize_session=False)
     
     # Kérés törlése
     db.session.delete(req)
@@ -1457,6 +2505,10 @@ def get_my_worklist(current_user):
     Labor munkatárs: Csak azokat a kéréseket látja, amelyekben van olyan vizsgálat, 
                      ami az ő szervezeti egységéhez tartozik
     Super admin: Minden in_progress/validation_pending/completed kérést lát
+    
+    v8.4.4: Query paraméterek: completed_days (lezárt kérések időablaka napokban,
+    alapértelmezés WORKLIST_COMPLETED_WINDOW_DAYS, 0 = mind), valamint a lista
+    szűrők és az opcionális lapozás (limit, cursor)
     """
     # v7.0.1: Super admin is allowed (sees everything)
     if current_user.role not in ['labor_staff', 'super_admin']:
@@ -1466,68 +2518,116 @@ def get_my_worklist(current_user):
     if current_user.role == 'labor_staff' and not current_user.department_id:
         return jsonify({'message': 'Nincs szervezeti egység hozzárendelve!'}), 400
     
-    # Lekérjük az in_progress, validation_pending és completed kéréseket
-    requests = LabRequest.query.filter(
+    # v8.4.4: Lezárt kérések időablaka (query paraméterrel felülírható, 0 = minden lezárt kérés)
+    try:
+        completed_days = int(request.args.get('completed_days', app.config['WORKLIST_COMPLETED_WINDOW_DAYS']))
+    except ValueError:
+        return jsonify({'message': 'Érvénytelen paraméter: completed_days'}), 400
+    
+    # v8.4.4: Egyetlen aggregált lekérdezés - saját (szervezeti egység) vizsgálatok száma és
+    # az elkészültek száma kérésenként, az adatbázisban számolva
+    done_statuses = ['completed', 'validation_pending']  # v7.0.25: csak completed és validation_pending
+    my_tests = db.session.query(
+        LabRequestTestType.lab_request_id.label('lab_request_id'),
+        db.func.count(db.distinct(LabRequestTestType.test_type_id)).label('my_test_count'),
+        db.func.count(db.distinct(db.case(
+            (TestResult.status.in_(done_statuses), LabRequestTestType.test_type_id)
+        ))).label('my_completed_count')
+    ).join(
+        TestType, TestType.id == LabRequestTestType.test_type_id
+    ).outerjoin(TestResult, db.and_(
+        TestResult.lab_request_id == LabRequestTestType.lab_request_id,
+        TestResult.test_type_id == LabRequestTestType.test_type_id
+    ))
+    # v7.0.1: Super admin minden vizsgálatot lát
+    if current_user.role == 'labor_staff':
+        my_tests = my_tests.filter(TestType.department_id == current_user.department_id)
+    my_tests = my_tests.group_by(LabRequestTestType.lab_request_id).subquery()
+    
+    # Lekérjük az in_progress, validation_pending és completed kéréseket (csak amikben van saját vizsgálat)
+    query = db.session.query(
+        LabRequest.id, LabRequest.request_number, LabRequest.internal_id,
+        LabRequest.sample_description, LabRequest.status, LabRequest.urgency,
+        LabRequest.deadline, LabRequest.created_at,
+        Company.name.label('company_name'),
+        my_tests.c.my_test_count, my_tests.c.my_completed_count
+    ).join(
+        my_tests, my_tests.c.lab_request_id == LabRequest.id
+    ).outerjoin(
+        Company, Company.id == LabRequest.company_id
+    ).filter(
         LabRequest.status.in_(['in_progress', 'validation_pending', 'completed'])
-    ).all()
-    
-    # Szűrjük azokra, amelyekben van saját dept vizsgálat (vagy super_admin esetén mindent)
-    worklist = []
-    for req in requests:
-        test_type_ids = json.loads(req.test_types)
-        test_types = TestType.query.filter(TestType.id.in_(test_type_ids)).all()
-        
-        # v7.0.1: Super admin sees all tests
-        if current_user.role == 'super_admin':
-            my_tests = test_types  # All tests
-        else:
-            # Van-e saját szervezeti egységhez tartozó vizsgálat?
-            my_tests = [tt for tt in test_types if tt.department_id == current_user.department_id]
-        
-        if my_tests:
-            # Lekérjük az eredményeket is
-            results = TestResult.query.filter_by(lab_request_id=req.id).all()
-            results_dict = {r.test_type_id: r for r in results}
-            
-            # Számoljuk, hány saját vizsgálat van és hány elkészült
-            my_test_count = len(my_tests)
-            # v7.0.25: Egyszerűsített - csak completed és validation_pending
-            my_completed_count = sum(1 for tt in my_tests if results_dict.get(tt.id) and results_dict[tt.id].status in ['completed', 'validation_pending'])
-            
-            # v7.0.1: Test list for display
-            test_list = [
-                {
-                    'id': tt.id,
-                    'name': tt.name,
-                    'department_name': tt.department.name if tt.department else None,
-                    'status': results_dict[tt.id].status if tt.id in results_dict else 'pending'
-                }
-                for tt in my_tests
-            ]
-            
-            worklist.append({
-                'id': req.id,
-                'request_number': req.request_number,
-                'internal_id': req.internal_id,
-                'sample_description': req.sample_description,
-                'status': req.status,
-                'urgency': req.urgency,
-                'deadline': req.deadline.isoformat() if req.deadline else None,
-                'created_at': req.created_at.isoformat(),
-                'company_name': req.company.name if req.company else None,
-                'my_test_count': my_test_count,
-                'my_completed_count': my_completed_count,
-                'progress': round((my_completed_count / my_test_count * 100) if my_test_count > 0 else 0),
-                'test_list': test_list  # v7.0.1: Add test list
+    )
+    if completed_days > 0:
+        completed_cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=completed_days)
+        query = query.filter(db.or_(
+            LabRequest.status != 'completed',
+            LabRequest.updated_at >= completed_cutoff
+        ))
+    
+    # v8.4.2: Szerveroldali szűrés + keyset lapozás (a rendezés az oldalon belül sürgősség szerint)
+    try:
+        query = apply_request_list_filters(query, request.args)
+        rows, headers = paginate_request_query(query, request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    # v7.0.1: Vizsgálat lista megjelenítéshez - egy lekérdezés az egész oldalra
+    test_lists = {}
+    if rows:
+        test_query = db.session.query(
+            LabRequestTestType.lab_request_id, TestType.id, TestType.name,
+            Department.name, TestResult.status
+        ).join(
+            TestType, TestType.id == LabRequestTestType.test_type_id
+        ).outerjoin(
+            Department, Department.id == TestType.department_id
+        ).outerjoin(TestResult, db.and_(
+            TestResult.lab_request_id == LabRequestTestType.lab_request_id,
+            TestResult.test_type_id == LabRequestTestType.test_type_id
+        )).filter(
+            LabRequestTestType.lab_request_id.in_([row.id for row in rows])
+        )
+        if current_user.role == 'labor_staff':
+            test_query = test_query.filter(TestType.department_id == current_user.department_id)
+        test_query = test_query.order_by(LabRequestTestType.lab_request_id, LabRequestTestType.position)
+        
+        for request_id, tt_id, tt_name, department_name, result_status in test_query:
+            tests = test_lists.setdefault(request_id, [])
+            if any(t['id'] == tt_id for t in tests):
+                continue  # Duplikált eredmény rekord
+            tests.append({
+                'id': tt_id,
+                'name': tt_name,
+                'department_name': department_name,
+                'status': result_status or 'pending'
             })
     
+    worklist = [{
+        'id': row.id,
+        'request_number': row.request_number,
+        'internal_id': row.internal_id,
+        'sample_description': row.sample_description,
+        'status': row.status,
+        'urgency': row.urgency,
+        'deadline': row.deadline.isoformat() if row.deadline else None,
+        'created_at': row.created_at.isoformat(),
+        'company_name': row.company_name,
+        'my_test_count': row.my_test_count,
+        'my_completed_count': row.my_completed_count,
+        'progress': round((row.my_completed_count / row.my_test_count * 100) if row.my_test_count > 0 else 0),
+        'test_list': test_lists.get(row.id, [])  # v7.0.1: Add test list
+    } for row in rows]
+    
     # Rendezés: sürgős elöl, határidő szerint
     worklist.sort(key=lambda x: (
         0 if x['urgency'] == 'critical' else 1 if x['urgency'] == 'urgent' else 2,
         x['deadline'] if x['deadline'] else '9999-12-31'
     ))
     
-    return jsonify(worklist)
+    response = jsonify(worklist)
+    response.headers.update(headers)
+    return response
 
 @app.route('/api/requests/<int:request_id>/test-results', methods=['GET'])
 @token_required
@@ -1541,9 +2641,8 @@ def get_test_results(current_user, request_id):
     if current_user.role == 'company_user' and req.user_id != current_user.id:
         return jsonify({'message': 'Nincs jogosultságod!'}), 403
     
-    # Lekérjük a vizsgálatokat
-    test_type_ids = json.loads(req.test_types)
-    test_types = TestType.query.filter(TestType.id.in_(test_type_ids)).all()
+    # Lekérjük a vizsgálatokat (v8.4.3: kapcsolótáblából)
+    test_types = req.requested_test_types
     
     # Lekérjük az eredményeket
     results = TestResult.query.filter_by(lab_request_id=request_id).all()
@@ -1686,13 +2785,26 @@ def upload_result_attachment(current_user, result_id):
     })
 
 @app.route('/api/test-results/<int:result_id>/attachment', methods=['GET'])
-@token_required
-def download_result_attachment(current_user, result_id):
+def download_result_attachment(result_id):
     """
     Vizsgálati eredmény fájl letöltése
     v7.0.10: Debug logging hozzáadva
+    
+    Bejelentkezési token (header / token param) vagy a PDF-be írt melléklet link token (link param)
     """
-    print(f"[ATTACHMENT DOWNLOAD] Kezdés - result_id={result_id}, user_id={current_user.id}")
+    link = request.args.get('link')
+    if link and attachment_link_valid(link, result_id):
+        return send_result_attachment(result_id, 'pdf link')
+    return download_result_attachment_with_token(result_id)
+
+
+@token_required
+def download_result_attachment_with_token(current_user, result_id):
+    return send_result_attachment(result_id, f"user_id={current_user.id}")
+
+
+def send_result_attachment(result_id, requested_by):
+    print(f"[ATTACHMENT DOWNLOAD] Kezdés - result_id={result_id}, {requested_by}")
     
     result = TestResult.query.get_or_404(result_id)
     print(f"[ATTACHMENT DOWNLOAD] TestResult megtalálva - attachment_filename={result.attachment_filename}")
@@ -1748,8 +2860,7 @@ def submit_for_validation(current_user, request_id):
     if current_user.role == 'labor_staff' and not current_user.department_id:
         return jsonify({'message': 'Nincs szervezeti egység hozzárendelve!'}), 400
     
-    test_type_ids = json.loads(req.test_types)
-    test_types = TestType.query.filter(TestType.id.in_(test_type_ids)).all()
+    test_types = req.requested_test_types
     all_results = TestResult.query.filter_by(lab_request_id=request_id).all()
     results_dict = {r.test_type_id: r for r in all_results}
     
@@ -1787,16 +2898,17 @@ def submit_for_validation(current_user, request_id):
         }), 400
     
     # MINDEN vizsgálat kész → validation_pending
-    req.status = 'validation_pending'
+    # v8.4.6: Fix - old_status korábban nem volt definiálva (NameError a notify előtt)
+    old_status = status_history.transition(req, 'validation_pending', current_user, 'submit_validation')  # v8.4.25
     
     # Összes completed result → validation_pending
     for result in all_results:
         if result.status == 'completed':
             result.status = 'validation_pending'
     
-    db.session.commit()
     
     # v8.0: Státuszváltozás notification
+    # v8.4.6: Outbox sor a státuszváltozással egy tranzakcióban
     event_data = {
         'request_number': req.request_number,
         'old_status': old_status,
@@ -1805,6 +2917,7 @@ def submit_for_validation(current_user, request_id):
         'requester_name': req.user.name
     }
     NotificationService.notify('status_to_validation_pending', request_id=req.id, event_data=event_data)
+    db.session.commit()
     
     return jsonify({
         'message': 'Kérés validálásra küldve!',
@@ -1882,11 +2995,10 @@ def complete_request_validation(current_user, request_id):
         }), 400
     
     # Összes vizsgálat validált → Kérés lezárása
-    old_status = req.status
-    req.status = 'completed'
-    db.session.commit()
+    old_status = status_history.transition(req, 'completed', current_user, 'complete_validation')  # v8.4.25
     
     # v8.0: Státuszváltozás notification
+    # v8.4.6: Outbox sor a státuszváltozással egy tranzakcióban
     event_data = {
         'request_number': req.request_number,
         'old_status': old_status,
@@ -1895,6 +3007,7 @@ def complete_request_validation(current_user, request_id):
         'requester_name': req.user.name
     }
     NotificationService.notify('status_to_completed', request_id=req.id, event_data=event_data)
+    db.session.commit()
     
     return jsonify({
         'message': 'Kérés sikeresen lezárva!',
@@ -1921,6 +3034,161 @@ def download_attachment(current_user, request_id):
     return send_file(filepath, as_attachment=True, download_name=req.attachment_filename)
 
 # --- PDF Export ---
+# v8.4.16: Layout, fontok és stílusok a pdf_rendering modulban; itt csak a
+# jogosultság ellenőrzés és az ORM → egyszerű adat (snapshot) átalakítás marad
+def build_request_pdf_snapshot(req):
+    """
+    Kérés PDF-ekhez szükséges adatai egyszerű dict-ként (pdf_rendering bemenete)
+    
+    Returns:
+        dict: formázott mezők + test_types lista
+    """
+    sampling_time = '-'
+    if req.sampling_datetime:
+        sampling_time = req.sampling_datetime.strftime('%Y-%m-%d %H:%M')
+    elif req.sampling_date:
+        sampling_time = req.sampling_date.strftime('%Y-%m-%d')
+    
+    return {
+        'id': req.id,
+        'request_number': req.request_number or f"LAB-{req.id}",
+        'internal_id': req.internal_id,
+        'sample_id': req.sample_id,
+        'status': req.status,
+        'user_name': req.user.name,
+        'company_name': req.company.name if req.company else None,
+        'category_name': req.category.name if req.category else None,
+        'sampling_location': req.sampling_location,
+        'sampling_time': sampling_time,
+        'deadline': req.deadline.strftime('%Y-%m-%d') if req.deadline else None,
+        'sample_description': req.sample_description,
+        'logistics_type': req.logistics_type,
+        'contact_person': req.contact_person,
+        'contact_phone': req.contact_phone,
+        'shipping_address': req.shipping_address,
+        'total_price': req.total_price or 0,
+        'special_instructions': req.special_instructions,
+        'test_types': [
+            {
+                'name': tt['name'],
+                'department_name': tt.get('department_name', '-'),
+                'turnaround_days': tt.get('turnaround_days', '-'),
+                'price': tt['price']
+            }
+            for tt in get_request_test_type_details(req)
+        ]
+    }
+
+
+def attachment_link_token(result_id):
+    """
+    Csak egy eredmény melléklet letöltésére jogosító link token (PDF-be írt linkekhez)
+    
+    Felhasználótól független, a lejárat PDF_ATTACHMENT_LINK_DAYS hosszú időszakra
+    kerekített (1-2 időszakig érvényes): időszakon belül a link - így a PDF cache
+    kulcsa is - minden felhasználónak azonos, és a cache-be nem kerül bejelentkezési token.
+    """
+    period = app.config['PDF_ATTACHMENT_LINK_DAYS'] * 86400
+    period_start = int(time.time()) // period * period
+    return jwt.encode({
+        'scope': 'result_attachment',
+        'result_id': result_id,
+        'exp': period_start + 2 * period
+    }, app.config['SECRET_KEY'], algorithm="HS256")
+
+
+def attachment_link_valid(token, result_id):
+    """attachment_link_token() ellenőrzése az adott eredményre"""
+    try:
+        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return False
+    return data.get('scope') == 'result_attachment' and data.get('result_id') == result_id
+
+
+def build_request_results_snapshot(req):
+    """Eredmény oldal adatai (completed kérés PDF) - mellékletlinkek link token-nel (bejelentkezési token nélkül)"""
+    # API base URL melléklet linkekhez
+    api_base_url = request.host_url.rstrip('/')  # pl. https://your-backend.railway.app
+    
+    results = []
+    for result in TestResult.query.filter_by(lab_request_id=req.id).all():
+        results.append({
+            'test_type_name': result.test_type.name if result.test_type else f"Vizsgálat #{result.test_type_id}",
+            'result_text': result.result_text,
+            'attachment_filename': result.attachment_filename,
+            'attachment_url': f"{api_base_url}/api/test-results/{result.id}/attachment?link={attachment_link_token(result.id)}"
+                              if result.attachment_filename else None,
+            'completed_by': result.completed_by.name if result.completed_by else None,
+            'completed_at': result.completed_at.strftime('%Y-%m-%d %H:%M') if result.completed_at else None,
+            'validated_by': result.validated_by.name if result.validated_by else None,
+            'validated_at': result.validated_at.strftime('%Y-%m-%d %H:%M') if result.validated_at else None
+        })
+    return results
+
+
+pdf_cache = PdfCache(app.config['PDF_CACHE_FOLDER'], app.config['PDF_CACHE_MAX_BYTES'])
+pdf_service.configure(app.config['PDF_RENDER_WORKERS'], app.config['PDF_RENDER_MAX_PENDING'],
+                     app.config['PDF_RENDER_TIMEOUT_SECONDS'],
+                     app.config['QR_CACHE_FOLDER'], app.config['QR_CACHE_MAX_ITEMS'])
+# Helyi (web processzbeli) rendereléshez; a render pool processzei a configure()-ból kapják
+pdf_rendering.qr_images.configure(app.config['QR_CACHE_FOLDER'], app.config['QR_CACHE_MAX_ITEMS'])
+
+
+def pdf_service_unavailable(error):
+    """v8.4.19: 503 válasz, ha a render sor tele van vagy lejárt az időkorlát"""
+    if isinstance(error, pdf_service.PdfServiceBusy):
+        message = 'A PDF generálás jelenleg túlterhelt, próbáld újra néhány másodperc múlva!'
+    else:
+        message = 'A PDF generálás túllépte az időkorlátot, próbáld újra később!'
+    print(f"⚠️ PDF render: {type(error).__name__} - {pdf_service.metrics()}")
+    response = jsonify({'message': message})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+def send_cached_pdf(kind, snapshot, updated_at, download_name):
+    """
+    v8.4.17: PDF válasz a tartalom alapú cache-ből
+    
+    If-None-Match egyezésnél 304 renderelés nélkül; cache találatnál fájl olvasás;
+    egyébként renderelés (v8.4.19: a render poolban) és mentés. Az ETag a cache kulcs.
+    """
+    key = pdf_cache_key(kind, snapshot, updated_at)
+    
+    if request.if_none_match.contains(key):
+        response = app.response_class(status=304)
+        response.set_etag(key)
+    else:
+        data = pdf_cache.get(key)
+        if data is None:
+            try:
+                data = pdf_service.render(kind, snapshot)
+            except (pdf_service.PdfServiceBusy, pdf_service.PdfRenderTimeout) as e:
+                return pdf_service_unavailable(e)
+            pdf_cache.put(key, data)
+        response = send_file(
+            BytesIO(data),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=download_name,
+            etag=key
+        )
+    
+    # Jogosultság felhasználónként eltér - csak böngésző cache
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def build_request_document_snapshot(req):
+    """Kérés PDF bemenete - v7.0.7: eredmények szekció csak completed kéréseknél"""
+    snapshot = build_request_pdf_snapshot(req)
+    if req.status == 'completed':
+        snapshot['results'] = build_request_results_snapshot(req)
+    return snapshot
+
 @app.route('/api/requests/<int:request_id>/pdf', methods=['GET'])
 @token_required
 def export_request_pdf(current_user, request_id):
@@ -1934,269 +3202,27 @@ def export_request_pdf(current_user, request_id):
     if current_user.role == 'company_admin' and req.company_id != current_user.company_id:
         return jsonify({'message': 'Nincs jogosultságod!'}), 403
     
-    # v6.7 - Improved UTF-8 font registration for Hungarian characters
-    default_font = 'Helvetica'
-    bold_font = 'Helvetica-Bold'
-    
-    font_paths = [
-        # Linux paths
-        ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
-        # Ubuntu/Debian alternative
-        ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
-        # FreeSans (wide Unicode support)
-        ('/usr/share/fonts/truetype/freefont/FreeSans.ttf', '/usr/share/fonts/truetype/freefont/FreeSansBold.ttf'),
-        # Liberation Sans
-        ('/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf', '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf'),
-    ]
-    
-    font_registered = False
-    for regular_path, bold_path in font_paths:
-        try:
-            if os.path.exists(regular_path) and os.path.exists(bold_path):
-                pdfmetrics.registerFont(TTFont('CustomFont', regular_path))
-                pdfmetrics.registerFont(TTFont('CustomFont-Bold', bold_path))
-                default_font = 'CustomFont'
-                bold_font = 'CustomFont-Bold'
-                font_registered = True
-                print(f"✅ PDF font registered: {regular_path}")
-                break
-        except Exception as e:
-            print(f"⚠️ Font registration failed for {regular_path}: {e}")
-            continue
-    
-    if not font_registered:
-        print("⚠️ Using Helvetica fallback (no UTF-8 support)")
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#4F46E5'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName=bold_font
-    )
-    elements.append(Paragraph('LABORKÉRÉS', title_style))
-    elements.append(Spacer(1, 0.5*cm))
-    
-    # v6.7: Kérés azonosító
-    id_style = ParagraphStyle('IDStyle', parent=styles['Normal'], fontSize=14, spaceAfter=20, fontName=default_font)
-    request_number = req.request_number or f"LAB-{req.id}"
-    elements.append(Paragraph(f'<b>Kérés azonosító:</b> {request_number}', id_style))
-    if req.internal_id:
-        elements.append(Paragraph(f'<b>Céges belső azonosító:</b> {req.internal_id}', id_style))
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # v6.7: Mintavétel időpont
-    sampling_time = '-'
-    if req.sampling_datetime:
-        sampling_time = req.sampling_datetime.strftime('%Y-%m-%d %H:%M')
-    elif req.sampling_date:
-        sampling_time = req.sampling_date.strftime('%Y-%m-%d')
-    
-    # v6.7: Logisztika info
-    logistics_text = 'Feladó gondoskodik' if req.logistics_type == 'sender' else 'Szolgáltató szállít'
-    
-    data = [
-        ['Feladó:', req.user.name],
-        ['Cég:', req.company.name if req.company else '-'],
-        ['Kategória:', req.category.name if req.category else '-'],
-        ['Mintavétel helye:', req.sampling_location or '-'],
-        ['Mintavétel időpontja:', sampling_time],
-        ['Határidő:', req.deadline.strftime('%Y-%m-%d') if req.deadline else '-'],
-        ['Minta leírása:', req.sample_description or '-'],
-        ['Logisztika:', logistics_text],
-        ['Kontakt:', f"{req.contact_person or '-'} ({req.contact_phone or '-'})"],
-    ]
-    
-    if req.logistics_type == 'provider' and req.shipping_address:
-        data.append(['Szállítási cím:', req.shipping_address])
-    
-    table = Table(data, colWidths=[5*cm, 12*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F3F4F6')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), bold_font),
-        ('FONTNAME', (1, 0), (1, -1), default_font),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 0.5*cm))
-    
-    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontName=bold_font)
-    elements.append(Paragraph('<b>Kért vizsgálatok:</b>', heading_style))
-    elements.append(Spacer(1, 0.2*cm))
-    
-    test_data = [['Vizsgálat neve', 'Szervezeti egység', 'Átfutás (nap)', 'Ár (Ft)']]
-    test_types = get_test_type_details(req.test_types)
-    for tt in test_types:
-        test_data.append([
-            tt['name'],
-            tt.get('department_name', '-'),
-            str(tt.get('turnaround_days', '-')),
-            f"{tt['price']:,.0f}"
-        ])
-    
-    test_table = Table(test_data, colWidths=[7*cm, 4*cm, 3*cm, 3*cm])
-    test_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), bold_font),  # v6.5
-        ('FONTNAME', (0, 1), (-1, -1), default_font),  # v6.5
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elements.append(test_table)
-    elements.append(Spacer(1, 0.3*cm))
-    
-    total_style = ParagraphStyle('Total', parent=styles['Normal'], fontSize=14, alignment=TA_LEFT, fontName=bold_font)  # v6.5
-    elements.append(Paragraph(f'<b>Összköltség: {req.total_price:,.0f} Ft</b>', total_style))
-    
-    if req.special_instructions:
-        elements.append(Spacer(1, 0.5*cm))
-        elements.append(Paragraph('<b>Különleges kezelési utasítások:</b>', heading_style))
-        instruction_style = ParagraphStyle('Instruction', parent=styles['Normal'], fontName=default_font)
-        elements.append(Paragraph(req.special_instructions, instruction_style))
-    
-    # v7.0.7: Eredmények szekció - csak completed kéréseknél
-    if req.status == 'completed':
-        elements.append(PageBreak())  # Új oldal az eredményeknek
-        
-        # API base URL melléklet linkekhez
-        api_base_url = request.host_url.rstrip('/')  # pl. https://your-backend.railway.app
-        
-        # v7.0.10: JWT token generálás PDF linkekhez
-        # FONTOS: current_user token-jét használjuk, hogy a PDF link működjön
-        try:
-            # Token lekérése header-ből vagy query param-ból
-            user_token = request.headers.get('Authorization')
-            if user_token and user_token.startswith('Bearer '):
-                user_token = user_token[7:]
-            elif not user_token:
-                user_token = request.args.get('token')
-            
-            # Ha nincs token, generálunk egy újat (24 órás érvényességgel)
-            if not user_token:
-                user_token = jwt.encode({
-                    'user_id': current_user.id,
-                    'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-                }, app.config['SECRET_KEY'], algorithm='HS256')
-        except Exception as e:
-            # Fallback: Új token generálás
-            user_token = jwt.encode({
-                'user_id': current_user.id,
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-            }, app.config['SECRET_KEY'], algorithm='HS256')
-        
-        # Eredmények header
-        results_title_style = ParagraphStyle(
-            'ResultsTitle',
-            parent=styles['Heading1'],
-            fontSize=20,
-            textColor=colors.HexColor('#059669'),  # Zöld
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName=bold_font
-        )
-        elements.append(Paragraph('VIZSGÁLATI EREDMÉNYEK', results_title_style))
-        elements.append(Spacer(1, 0.5*cm))
-        
-        # Link style mellékletekhez
-        link_style = ParagraphStyle(
-            'AttachmentLink',
-            parent=styles['Normal'],
-            fontName=default_font,
-            fontSize=10,
-            textColor=colors.HexColor('#2563EB'),  # Kék link
-            underline=True
-        )
-        
-        # TestResult-ok lekérdezése
-        test_results = TestResult.query.filter_by(lab_request_id=request_id).all()
-        
-        if test_results:
-            for idx, result in enumerate(test_results, 1):
-                # Vizsgálat neve
-                test_name_style = ParagraphStyle(
-                    'TestName',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    textColor=colors.HexColor('#4F46E5'),
-                    spaceAfter=10,
-                    fontName=bold_font
-                )
-                test_type_name = result.test_type.name if result.test_type else f"Vizsgálat #{result.test_type_id}"
-                elements.append(Paragraph(f'{idx}. {test_type_name}', test_name_style))
-                
-                # Eredmény adatok táblázat
-                result_data = []
-                
-                # Eredmény szöveg
-                result_text = result.result_text or '-'
-                result_data.append(['Eredmény:', result_text])
-                
-                # Melléklet - v7.0.10: Kattintható link token-nel
-                if result.attachment_filename:
-                    attachment_url = f"{api_base_url}/api/test-results/{result.id}/attachment?token={user_token}"
-                    attachment_link = Paragraph(
-                        f'<a href="{attachment_url}" color="blue"><u>{result.attachment_filename}</u></a>',
-                        link_style
-                    )
-                    result_data.append(['Melléklet:', attachment_link])
-                
-                # Kitöltő adatok
-                completed_by_name = result.completed_by.name if result.completed_by else '-'
-                completed_at_str = result.completed_at.strftime('%Y-%m-%d %H:%M') if result.completed_at else '-'
-                result_data.append(['Kitöltötte:', f"{completed_by_name} • {completed_at_str}"])
-                
-                # Validáló adatok
-                if result.validated_by:
-                    validated_by_name = result.validated_by.name if result.validated_by else '-'
-                    validated_at_str = result.validated_at.strftime('%Y-%m-%d %H:%M') if result.validated_at else '-'
-                    result_data.append(['Validálta:', f"{validated_by_name} • {validated_at_str}"])
-                
-                result_table = Table(result_data, colWidths=[4*cm, 13*cm])
-                result_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0FDF4')),  # Világos zöld
-                    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # v7.0.9: Top align (link miatt)
-                    ('FONTNAME', (0, 0), (0, -1), bold_font),
-                    ('FONTNAME', (1, 0), (1, -1), default_font),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                    ('TOPPADDING', (0, 0), (-1, -1), 8),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#D1FAE5'))  # Zöld border
-                ]))
-                elements.append(result_table)
-                elements.append(Spacer(1, 0.4*cm))
-        else:
-            # Nincs eredmény
-            no_result_style = ParagraphStyle('NoResult', parent=styles['Normal'], fontSize=12, textColor=colors.grey, fontName=default_font)
-            elements.append(Paragraph('Nincs rögzített eredmény.', no_result_style))
-    
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'laborkeres_{req.sample_id}.pdf'
-    )
+    snapshot = build_request_document_snapshot(req)
+    return send_cached_pdf('request', snapshot, req.updated_at, f'laborkeres_{req.sample_id}.pdf')
 
 # v7.0.31: Minta átadás-átvételi jegyzőkönyv PDF (QR kóddal)
+HANDOVER_ALLOWED_STATUSES = ['awaiting_shipment', 'in_transit', 'arrived_at_provider', 'in_progress', 'validation_pending', 'completed']
+
+
+def handover_qr_payload(req):
+    """QR kód tartalma: logisztikai scan URL a kérésszámmal"""
+    frontend_url = os.environ.get('FRONTEND_URL', 'https://lab-request-frontend.netlify.app')
+    return f"{frontend_url}/logistics/scan?request={req.request_number}"
+
+
+def build_handover_snapshot(req):
+    """Átadás-átvételi jegyzőkönyv adatai: kérés snapshot + QR tartalom + jóváhagyás dátuma"""
+    snapshot = build_request_pdf_snapshot(req)
+    snapshot['qr_payload'] = handover_qr_payload(req)
+    snapshot['approval_date'] = datetime.datetime.now().strftime('%Y. %m. %d.')
+    return snapshot
+
+
 @app.route('/api/requests/<int:request_id>/handover-pdf', methods=['GET'])
 @token_required
 def export_handover_pdf(current_user, request_id):
@@ -2204,8 +3230,7 @@ def export_handover_pdf(current_user, request_id):
     req = LabRequest.query.get_or_404(request_id)
     
     # Jogosultság: Csak awaiting_shipment vagy későbbi státuszú kéréseknél
-    allowed_statuses = ['awaiting_shipment', 'in_transit', 'arrived_at_provider', 'in_progress', 'validation_pending', 'completed']
-    if req.status not in allowed_statuses:
+    if req.status not in HANDOVER_ALLOWED_STATUSES:
         return jsonify({'message': 'Ez a dokumentum csak jóváhagyott kéréseknél elérhető!'}), 403
     
     # Jogosultság ellenőrzés
@@ -2214,202 +3239,234 @@ def export_handover_pdf(current_user, request_id):
     if current_user.role == 'company_admin' and req.company_id != current_user.company_id:
         return jsonify({'message': 'Nincs jogosultságod!'}), 403
     
-    # Font registration
-    default_font = 'Helvetica'
-    bold_font = 'Helvetica-Bold'
+    return send_cached_pdf('handover', build_handover_snapshot(req), req.updated_at,
+                           f'atadas_atveteli_{req.request_number}.pdf')
+
+# Kötegben kérhető dokumentumok (a címkeív - 'labels' - saját végponton készül)
+BATCH_PDF_DOCUMENTS = ('request', 'handover')
+
+@app.route('/api/requests/batch-pdf', methods=['POST'])
+@token_required
+def export_requests_batch_pdf(current_user):
+    """
+    v8.4.18: Kötegelt PDF export - menet közben épülő ZIP vagy egyetlen egyesített PDF
     
-    font_paths = [
-        ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
-        ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
-        ('/usr/share/fonts/truetype/freefont/FreeSans.ttf', '/usr/share/fonts/truetype/freefont/FreeSansBold.ttf'),
-        ('/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf', '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf'),
-    ]
+    JSON body:
+        document: 'handover' (alapértelmezett) vagy 'request'
+        format: 'zip' (alapértelmezett) vagy 'pdf'
+        ids: kérés azonosítók listája, és/vagy
+        filters: a GET /api/requests szűrői (status, company_id, created_from, created_to, ...)
     
-    font_registered = False
-    for regular_path, bold_path in font_paths:
+    A jogosultság a kéréslistával egyezik; átadás-átvételi jegyzőkönyv csak
+    jóváhagyott kérésekhez készül, a kihagyott azonosítók száma az
+    X-Batch-Skipped fejlécben jön vissza.
+    """
+    data = request.get_json(silent=True) or {}
+    kind = data.get('document', 'handover')
+    output_format = data.get('format', 'zip')
+    if kind not in BATCH_PDF_DOCUMENTS or output_format not in ('zip', 'pdf'):
+        return jsonify({'message': 'Érvénytelen dokumentum típus vagy formátum!'}), 400
+    if not data.get('ids') and not data.get('filters'):
+        return jsonify({'message': 'Add meg a kérés azonosítókat (ids) vagy a szűrőket (filters)!'}), 400
+    
+    query = visible_requests_query(current_user)
+    try:
+        requested_ids = set()
+        if data.get('ids'):
+            requested_ids = {int(request_id) for request_id in data['ids']}
+            query = query.filter(LabRequest.id.in_(requested_ids))
+        if data.get('filters'):
+            filters = {
+                key: ','.join(str(v) for v in value) if isinstance(value, list) else str(value)
+                for key, value in dict(data['filters']).items()
+            }
+            query = apply_request_list_filters(query, filters)
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    if kind == 'handover':
+        query = query.filter(LabRequest.status.in_(HANDOVER_ALLOWED_STATUSES))
+    
+    max_requests = app.config['PDF_BATCH_MAX_REQUESTS']
+    requests_to_export = query.options(
+        db.joinedload(LabRequest.user), db.joinedload(LabRequest.company), db.joinedload(LabRequest.category)
+    ).order_by(LabRequest.id).limit(max_requests + 1).all()
+    if not requests_to_export:
+        return jsonify({'message': 'Nincs exportálható kérés!'}), 404
+    if len(requests_to_export) > max_requests:
+        return jsonify({'message': f'Egyszerre legfeljebb {max_requests} kérés exportálható, szűkítsd a szűrőket!'}), 400
+    
+    # Snapshot-ok és cache kulcsok még a kérés kontextusában (a válasz törzse már azon kívül generálódik)
+    documents = []
+    for req in requests_to_export:
+        if kind == 'handover':
+            snapshot = build_handover_snapshot(req)
+        else:
+            snapshot = build_request_document_snapshot(req)
+        documents.append((snapshot, pdf_cache_key(kind, snapshot, req.updated_at)))
+    
+    prefix = 'atadas_atveteli' if kind == 'handover' else 'laborkeres'
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    timeout = app.config['PDF_RENDER_TIMEOUT_SECONDS']
+    print(f"📦 Kötegelt PDF export: {len(documents)} kérés ({kind}, {output_format}) - {current_user.name}")
+    
+    if output_format == 'pdf':
         try:
-            if os.path.exists(regular_path) and os.path.exists(bold_path):
-                pdfmetrics.registerFont(TTFont('CustomFont', regular_path))
-                pdfmetrics.registerFont(TTFont('CustomFont-Bold', bold_path))
-                default_font = 'CustomFont'
-                bold_font = 'CustomFont-Bold'
-                font_registered = True
-                break
-        except Exception as e:
+            # Egy dokumentum - az időkorlát a kérések számával arányos
+            path = pdf_batch.render_merged(kind, [snapshot for snapshot, _ in documents], timeout * len(documents))
+        except (pdf_service.PdfServiceBusy, pdf_service.PdfRenderTimeout) as e:
+            return pdf_service_unavailable(e)
+        response = Response(pdf_batch.stream_file(path), mimetype='application/pdf')
+        filename = f'{prefix}_{timestamp}.pdf'
+    else:
+        items = [(f"{prefix}_{snapshot['request_number']}.pdf", snapshot, key) for snapshot, key in documents]
+        # A sor legfeljebb felét foglaljuk, hogy az egyedi letöltések ne kapjanak 503-at
+        window = max(1, min(app.config['PDF_RENDER_WORKERS'] * 2, app.config['PDF_RENDER_MAX_PENDING'] // 2))
+        files = pdf_batch.render_documents(kind, items, pdf_cache, window, timeout)
+        response = Response(pdf_batch.stream_zip(files), mimetype='application/zip')
+        filename = f'{prefix}_{timestamp}.zip'
+    
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Batch-Count'] = str(len(documents))
+    if requested_ids:
+        response.headers['X-Batch-Skipped'] = str(len(requested_ids) - len(documents))
+    return response
+
+@app.route('/api/admin/pdf-service/metrics', methods=['GET'])
+@token_required
+@role_required('super_admin')
+def get_pdf_service_metrics(current_user):
+    """v8.4.19: PDF render pool állapota (sorhossz, időtúllépések, átlagos renderidő) - a kiszolgáló web processzé"""
+    return jsonify({'pid': os.getpid(), **pdf_service.metrics()})
+
+# --- Request Export (v8.4.21) ---
+REQUEST_EXPORT_HEADER = [
+    'id', 'request_number', 'internal_id', 'sample_id', 'status', 'urgency', 'company_name', 'requester_name',
+    'category_name', 'created_at', 'approved_at', 'deadline', 'updated_at', 'total_price',
+    'test_type_count', 'test_types', 'departments', 'results_completed', 'results_validated'
+]
+RESULT_EXPORT_HEADER = [
+    'request_id', 'request_number', 'internal_id', 'company_name', 'request_status', 'request_created_at',
+    'test_type_id', 'test_type_name', 'department_name', 'test_type_price', 'result_status', 'result_text',
+    'attachment_filename', 'completed_by', 'completed_at', 'validated_by', 'validated_at'
+]
+
+
+def build_request_export_query(current_user, args):
+    """
+    Kérés x vizsgálattípus x eredmény sorok lapos lekérdezése (kérés, majd pozíció szerint rendezve)
+    
+    Csak oszlopokat kérdez le (nincs ORM objektum / identity map), és yield_per-rel
+    kötegenként olvas - PostgreSQL-en szerveroldali cursorral.
+    
+    Raises:
+        ValueError: hibás szűrő paraméter esetén
+    """
+    requester = aliased(User)
+    completed_by = aliased(User)
+    validated_by = aliased(User)
+    
+    query = apply_request_list_filters(visible_requests_query(current_user), args)
+    return query.with_entities(
+        LabRequest.id, LabRequest.request_number, LabRequest.internal_id, LabRequest.sample_id,
+        LabRequest.status, LabRequest.urgency, Company.name, requester.name, RequestCategory.name,
+        LabRequest.created_at, LabRequest.approved_at, LabRequest.deadline, LabRequest.updated_at,
+        LabRequest.total_price,
+        TestType.id, TestType.name, Department.name, TestType.price,
+        TestResult.status, TestResult.result_text, TestResult.attachment_filename,
+        completed_by.name, TestResult.completed_at, validated_by.name, TestResult.validated_at
+    ).outerjoin(Company, Company.id == LabRequest.company_id
+    ).outerjoin(requester, requester.id == LabRequest.user_id
+    ).outerjoin(RequestCategory, RequestCategory.id == LabRequest.category_id
+    ).outerjoin(LabRequestTestType, LabRequestTestType.lab_request_id == LabRequest.id
+    ).outerjoin(TestType, TestType.id == LabRequestTestType.test_type_id
+    ).outerjoin(Department, Department.id == TestType.department_id
+    ).outerjoin(TestResult, db.and_(
+        TestResult.lab_request_id == LabRequest.id,
+        TestResult.test_type_id == LabRequestTestType.test_type_id
+    )).outerjoin(completed_by, completed_by.id == TestResult.completed_by_user_id
+    ).outerjoin(validated_by, validated_by.id == TestResult.validated_by_user_id
+    ).order_by(LabRequest.id, LabRequestTestType.position
+    ).yield_per(app.config['EXPORT_YIELD_PER'])
+
+
+def iter_request_export_rows(rows):
+    """Kérésenként egy sor: a vizsgálattípusok és eredmények összesítve"""
+    from itertools import groupby
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)  # Egy kérés sorai (vizsgálattípusonként egy)
+        first = group[0]
+        tests = [row for row in group if row[14] is not None]
+        departments = list(dict.fromkeys(row[16] for row in tests if row[16]))
+        yield list(first[:14]) + [
+            len(tests),
+            '; '.join(row[15] for row in tests),
+            '; '.join(departments),
+            sum(1 for row in tests if row[18] == 'completed'),
+            sum(1 for row in tests if row[24] is not None)
+        ]
+
+
+def iter_result_export_rows(rows):
+    """Vizsgálattípusonként egy sor az eredmény adatokkal"""
+    for row in rows:
+        if row[14] is None:
             continue
+        yield [row[0], row[1], row[2], row[6], row[4], row[9]] + list(row[14:])
+
+
+def stream_request_export(current_user, level):
+    """Közös streamelt válasz a kérés / eredmény exporthoz"""
+    format_type = request.args.get('format', 'csv')
+    if format_type == 'excel':
+        format_type = 'xlsx'
+    if format_type not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Érvénytelen formátum. Használj: csv, xlsx'}), 400
     
-    # QR kód generálás
-    frontend_url = os.environ.get('FRONTEND_URL', 'https://lab-request-frontend.netlify.app')
-    qr_data = f"{frontend_url}/logistics/scan?request={req.request_number}"
-    qr = qrcode.QRCode(version=1, box_size=10, border=2)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    
-    # QR kód BytesIO-ba mentés
-    qr_buffer = BytesIO()
-    qr_img.save(qr_buffer, format='PNG')
-    qr_buffer.seek(0)
-    
-    # PDF build
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#4F46E5'),
-        spaceAfter=15,
-        alignment=TA_CENTER,
-        fontName=bold_font
-    )
-    elements.append(Paragraph('MINTA ÁTADÁS-ÁTVÉTELI JEGYZŐKÖNYV', title_style))
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # Header with QR code
-    qr_image = Image(qr_buffer, width=3.5*cm, height=3.5*cm)
-    id_para = Paragraph(f'<b>Kérés azonosító:</b> {req.request_number}', ParagraphStyle('IDStyle', parent=styles['Normal'], fontSize=13, fontName=default_font))
-    header_table = Table([[id_para, qr_image]], colWidths=[13*cm, 4*cm])
-    header_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    elements.append(header_table)
-    elements.append(Spacer(1, 0.4*cm))
-    
-    # Internal ID
-    if req.internal_id:
-        id_style = ParagraphStyle('IDStyle2', parent=styles['Normal'], fontSize=11, spaceAfter=12, fontName=default_font)
-        elements.append(Paragraph(f'<b>Céges belső azonosító:</b> {req.internal_id}', id_style))
-    
-    # Sampling time
-    sampling_time = '-'
-    if req.sampling_datetime:
-        sampling_time = req.sampling_datetime.strftime('%Y-%m-%d %H:%M')
-    elif req.sampling_date:
-        sampling_time = req.sampling_date.strftime('%Y-%m-%d')
+    try:
+        rows = build_request_export_query(current_user, request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
     
-    # Logistics info
-    logistics_text = 'Feladó gondoskodik' if req.logistics_type == 'sender' else 'Szolgáltató szállít'
-    
-    # Main info table
-    data = [
-        ['Feladó:', req.user.name],
-        ['Cég:', req.company.name if req.company else '-'],
-        ['Kategória:', req.category.name if req.category else '-'],
-        ['Mintavétel helye:', req.sampling_location or '-'],
-        ['Mintavétel időpontja:', sampling_time],
-        ['Határidő:', req.deadline.strftime('%Y-%m-%d') if req.deadline else '-'],
-        ['Minta leírása:', req.sample_description or '-'],
-        ['Logisztika:', logistics_text],
-        ['Kontakt:', f"{req.contact_person or '-'} ({req.contact_phone or '-'})"],
-    ]
+    if level == 'requests':
+        header, data, sheet_name = REQUEST_EXPORT_HEADER, iter_request_export_rows(rows), 'Kérések'
+    else:
+        header, data, sheet_name = RESULT_EXPORT_HEADER, iter_result_export_rows(rows), 'Eredmények'
     
-    if req.logistics_type == 'provider' and req.shipping_address:
-        data.append(['Szállítási cím:', req.shipping_address])
-    
-    table = Table(data, colWidths=[5*cm, 11*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F3F4F6')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), bold_font),
-        ('FONTNAME', (1, 0), (1, -1), default_font),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 0.4*cm))
-    
-    # Test types
-    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=13, fontName=bold_font)
-    elements.append(Paragraph('<b>Kért vizsgálatok:</b>', heading_style))
-    elements.append(Spacer(1, 0.2*cm))
-    
-    test_data = [['Vizsgálat neve', 'Szervezeti egység', 'Átfutás (nap)', 'Ár (Ft)']]
-    test_types = get_test_type_details(req.test_types)
-    for tt in test_types:
-        test_data.append([
-            tt['name'],
-            tt.get('department_name', '-'),
-            str(tt.get('turnaround_days', '-')),
-            f"{tt['price']:,.0f}"
-        ])
-    
-    test_table = Table(test_data, colWidths=[6*cm, 4*cm, 3*cm, 3*cm])
-    test_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), bold_font),
-        ('FONTNAME', (0, 1), (-1, -1), default_font),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
-    elements.append(test_table)
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # Total price
-    total_style = ParagraphStyle('Total', parent=styles['Normal'], fontSize=13, alignment=TA_LEFT, fontName=bold_font)
-    elements.append(Paragraph(f'<b>Összköltség: {req.total_price:,.0f} Ft</b>', total_style))
-    
-    # Special instructions
-    if req.special_instructions:
-        elements.append(Spacer(1, 0.4*cm))
-        elements.append(Paragraph('<b>Különleges kezelési utasítások:</b>', heading_style))
-        instruction_style = ParagraphStyle('Instruction', parent=styles['Normal'], fontSize=10, fontName=default_font)
-        elements.append(Paragraph(req.special_instructions, instruction_style))
-    
-    # Handover-specific content
-    elements.append(Spacer(1, 0.8*cm))
-    
-    # Order statement
-    order_style = ParagraphStyle('Order', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER, fontName=bold_font, spaceAfter=25)
-    elements.append(Paragraph('<b>A fentiek szerinti vizsgálatok ezúton megrendelem.</b>', order_style))
-    
-    # Signature section
-    today = datetime.datetime.now().strftime('%Y. %m. %d.')
-    signature_data = [
-        ['Jóváhagyás dátuma:', today],
-        ['', ''],
-        ['Cég bélyegzője:', 'Jóváhagyó aláírása:'],
-        ['', ''],
-        ['', '________________________________'],
-    ]
-    signature_table = Table(signature_data, colWidths=[8*cm, 8*cm])
-    signature_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, 0), bold_font),
-        ('FONTNAME', (1, 0), (1, 0), default_font),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 2), 6),
-        ('FONTNAME', (0, 2), (-1, 2), bold_font),
-    ]))
-    elements.append(signature_table)
-    
-    # Italic instruction
-    elements.append(Spacer(1, 0.4*cm))
-    italic_style = ParagraphStyle('Italic', parent=styles['Normal'], fontSize=9, alignment=TA_CENTER, fontName=default_font, textColor=colors.grey, leading=12)
-    elements.append(Paragraph('<i>Kérem, az eredeti átadás-átvételi jegyzőkönyvet aláírni és a mintához mellékelni szíveskedjen.</i>', italic_style))
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'atadas_atveteli_{req.request_number}.pdf'
-    )
+    if format_type == 'csv':
+        body, mimetype = streaming_export.csv_stream(header, data), 'text/csv'  # Werkzeug adja hozzá a charset=utf-8-at
+    else:
+        body = streaming_export.xlsx_stream(sheet_name, header, data)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    
+    print(f"📤 Streamelt export: {level} ({format_type}) - {current_user.name}")
+    # stream_with_context: a generátor a kérés (és az adatbázis session) kontextusában fut végig
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    filename = f'{level}_{datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.{format_type}'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/api/export/requests', methods=['GET'])
+@token_required
+@role_required('super_admin', 'company_admin')
+def export_requests(current_user):
+    """
+    Kérések exportja (CSV / XLSX), kérésenként egy sor - streamelve, állandó memóriával
+    
+    Query paraméterek: format=csv|xlsx, valamint a kéréslista szűrői
+    (status, company_id, created_from, created_to, ...)
+    """
+    return stream_request_export(current_user, 'requests')
+
+
+@app.route('/api/export/test-results', methods=['GET'])
+@token_required
+@role_required('super_admin', 'company_admin')
+def export_test_results(current_user):
+    """Vizsgálati eredmények exportja (CSV / XLSX), kérés x vizsgálattípus soronként - streamelve"""
+    return stream_request_export(current_user, 'results')
 
 # --- Users Routes ---
 @app.route('/api/users', methods=['GET'])
@@ -2483,6 +3540,7 @@ def delete_user(current_user, user_id):
         return jsonify({'message': 'Nem törölheted magadat!'}), 400
     
     db.session.delete(user)
+    invalidate_auth_cache()  # v8.4.13
     db.session.commit()
     
     return jsonify({'message': 'Felhasználó sikeresen törölve!'})
@@ -2530,6 +3588,7 @@ def update_user(current_user, user_id):
         # Empty string to None
         user.department_id = data['department_id'] if data['department_id'] != '' else None
     
+    invalidate_auth_cache()  # v8.4.13: szerepkör / cég / egység változhatott
     db.session.commit()
     
     return jsonify({'message': 'Felhasználó sikeresen frissítve!'})
@@ -2553,26 +3612,36 @@ def get_logistics_requests(current_user):
     
     if current_user.role in ['super_admin', 'university_logistics']:
         # Admin és egyetemi logisztika: minden kérés
-        requests = LabRequest.query.filter(
+        query = LabRequest.query.filter(
             LabRequest.status.in_(logistics_statuses)
-        ).all()
+        )
     elif current_user.role in ['company_logistics', 'company_admin']:
         # Céges logisztika és céges admin: csak saját cég
-        requests = LabRequest.query.filter(
+        query = LabRequest.query.filter(
             LabRequest.company_id == current_user.company_id,
             LabRequest.status.in_(logistics_statuses)
-        ).all()
+        )
     elif current_user.role == 'company_user':
         # Céges user: csak saját kérései
-        requests = LabRequest.query.filter(
+        query = LabRequest.query.filter(
             LabRequest.user_id == current_user.id,
             LabRequest.status.in_(logistics_statuses)
-        ).all()
+        )
     else:
         # Labor staff nincs jogosultsága
         return jsonify({'message': 'Nincs jogosultságod ehhez a modulhoz!'}), 403
     
-    return jsonify([{
+    # v8.4.2: Szerveroldali szűrés + keyset lapozás
+    try:
+        query = apply_request_list_filters(query, request.args)
+        requests, headers = paginate_request_query(query, request.args)
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    # v8.4.1: Batch-betöltött hivatkozások (fix lekérdezésszám)
+    maps = build_request_list_maps(requests)
+    
+    response = jsonify([{
         'id': req.id,
         # Azonosítók
         'request_number': req.request_number,
@@ -2587,7 +3656,7 @@ def get_logistics_requests(current_user):
         'contact_person': req.contact_person,
         'contact_phone': req.contact_phone,
         # Vizsgálatok
-        'test_types': get_test_type_details(req.test_types),
+        'test_types': request_test_types_from_maps(req, maps),
         'total_price': req.total_price,
         # Prioritás
         'urgency': req.urgency,
@@ -2597,9 +3666,11 @@ def get_logistics_requests(current_user):
         # Egyéb
         'special_instructions': req.special_instructions,
         'created_at': req.created_at.isoformat(),
-        'user_name': req.user.name,
-        'company_name': req.company.name if req.company else None
+        'user_name': maps['users'].get(req.user_id),
+        'company_name': maps['companies'].get(req.company_id)
     } for req in requests])
+    response.headers.update(headers)
+    return response
 
 
 @app.route('/api/logistics/<int:request_id>/update-status', methods=['PUT'])
@@ -2647,12 +3718,10 @@ def update_logistics_status(current_user, request_id):
     else:
         return jsonify({'message': 'Érvénytelen művelet!'}), 403
     
-    old_status = req.status
-    req.status = new_status
-    req.updated_at = datetime.datetime.utcnow()
-    db.session.commit()
+    old_status = status_history.transition(req, new_status, current_user, 'logistics')  # v8.4.25
     
     # v8.0: Státuszváltozás notification
+    # v8.4.6: Outbox sor a státuszváltozással egy tranzakcióban
     event_key = f'status_to_{new_status}'  # ✅ Dinamikus event key
     event_data = {
         'request_number': req.request_number,
@@ -2662,6 +3731,7 @@ def update_logistics_status(current_user, request_id):
         'requester_name': req.user.name
     }
     NotificationService.notify(event_key, request_id=req.id, event_data=event_data)
+    db.session.commit()
     
     return jsonify({
         'message': 'Státusz sikeresen frissítve!',
@@ -2708,12 +3778,10 @@ def scan_qr_code(current_user):
         return jsonify({'message': 'Csak saját céged kéréseit módosíthatod!'}), 403
     
     # Státusz frissítés
-    old_status = req.status
-    req.status = 'in_transit'
-    req.updated_at = datetime.datetime.utcnow()
-    db.session.commit()
+    old_status = status_history.transition(req, 'in_transit', current_user, 'qr_scan')  # v8.4.25
     
     # v8.0: Státuszváltozás notification
+    # v8.4.6: Outbox sor a státuszváltozással egy tranzakcióban
     event_data = {
         'request_number': req.request_number,
         'old_status': old_status,
@@ -2722,6 +3790,7 @@ def scan_qr_code(current_user):
         'requester_name': req.user.name
     }
     NotificationService.notify('status_to_in_transit', request_id=req.id, event_data=event_data)
+    db.session.commit()
     
     return jsonify({
         'success': True,
@@ -2731,6 +3800,56 @@ def scan_qr_code(current_user):
         'scanned_by': current_user.name
     }), 200
 
+@app.route('/api/logistics/labels', methods=['GET'])
+@token_required
+def export_logistics_labels(current_user):
+    """
+    v8.4.20: QR címkeív (A4, 3x8 címke) szállításra váró kérésekhez
+    
+    Query paraméterek:
+        ids: kérés azonosítók vesszővel elválasztva (opcionális)
+        a kéréslista szűrői (company_id, created_from, created_to, request_number, search)
+    
+    Jogosultság: super_admin és university_logistics minden kérésre,
+    company_logistics és company_admin csak saját cégére.
+    """
+    if current_user.role in ['super_admin', 'university_logistics']:
+        query = LabRequest.query
+    elif current_user.role in ['company_logistics', 'company_admin']:
+        query = LabRequest.query.filter(LabRequest.company_id == current_user.company_id)
+    else:
+        return jsonify({'message': 'Nincs jogosultságod ehhez a modulhoz!'}), 403
+    
+    # Csak szállításra váró, kérésszámmal rendelkező kérések (a QR a kérésszámot hordozza)
+    query = query.filter(LabRequest.status == 'awaiting_shipment', LabRequest.request_number.isnot(None))
+    try:
+        args = request.args.to_dict()
+        args.pop('status', None)
+        if args.get('ids'):
+            query = query.filter(LabRequest.id.in_([int(i) for i in args['ids'].split(',') if i.strip()]))
+        query = apply_request_list_filters(query, args)
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    max_labels = app.config['PDF_BATCH_MAX_REQUESTS']
+    requests_to_label = query.options(db.joinedload(LabRequest.company)).order_by(
+        LabRequest.request_number
+    ).limit(max_labels + 1).all()
+    if not requests_to_label:
+        return jsonify({'message': 'Nincs szállításra váró kérés!'}), 404
+    if len(requests_to_label) > max_labels:
+        return jsonify({'message': f'Egyszerre legfeljebb {max_labels} címke készíthető, szűkítsd a szűrőket!'}), 400
+    
+    labels = [{
+        'qr_payload': handover_qr_payload(req),
+        'request_number': req.request_number,
+        'company_name': req.company.name if req.company else None,
+        'internal_id': req.internal_id
+    } for req in requests_to_label]
+    
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M')
+    return send_cached_pdf('labels', labels, None, f'qr_cimkek_{timestamp}.pdf')
+
 # v7.0.27: === END LOGISTICS MODULE ===
 
 # v8.0: === NOTIFICATION MODULE ===
@@ -2773,6 +3892,58 @@ def delete_notification(current_user, notification_id):
     NotificationService.delete_notification(notification_id, current_user.id)
     return jsonify({'message': 'Értesítés törölve!'})
 
+# v8.4.10: Server-Sent Events push - a NotificationBell 30 mp-es pollingja helyett
+SSE_KEEPALIVE_SECONDS = 25  # Proxy-k ne bontsák az üres kapcsolatot
+SSE_MAX_STREAM_SECONDS = 30 * 60  # Utána a böngésző automatikusan újracsatlakozik
+_sse_slots = threading.BoundedSemaphore(max(app.config['SSE_MAX_STREAMS'], 1))
+
+@app.route('/api/notifications/stream', methods=['GET'])
+@token_required
+def stream_notifications(current_user):
+    """
+    Értesítés stream (text/event-stream) - token a ?token= paraméterben (EventSource)
+    
+    Események: 'notification' (új értesítés), 'unread_count' (olvasatlan számláló).
+    Várakozás közben nincs adatbázis kapcsolat és lekérdezés, csak keepalive komment.
+    Gunicorn alatt szálas worker kell (gunicorn.conf.py: gthread), mert minden
+    nyitott stream egy szálat foglal - ezért legfeljebb SSE_MAX_STREAMS stream
+    lehet nyitva, a többi kérés 503 + Retry-After választ kap (a kliens pollingra vált).
+    """
+    from notification_pubsub import get_pubsub
+    
+    if not _sse_slots.acquire(blocking=False):
+        response = jsonify({'message': 'Túl sok nyitott értesítés stream, a kliens pollingra vált.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    
+    try:
+        subscription = get_pubsub(db.engine).subscribe(current_user.id)
+    except Exception:
+        _sse_slots.release()
+        raise
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                payload = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if payload is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {payload['type']}\ndata: {json.dumps(payload, default=str)}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Nginx / proxy pufferelés kikapcsolása
+    })
+    # A szerver a válasz lezárásakor hívja (akkor is, ha a generátor el sem indult)
+    response.call_on_close(_sse_slots.release)
+    return response
+
 # Admin notification management endpoints
 @app.route('/api/admin/notification-event-types', methods=['GET'])
 @token_required
@@ -2856,6 +4027,7 @@ def create_notification_rule(current_user):
     )
     
     db.session.add(rule)
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({
@@ -2882,6 +4054,7 @@ def update_notification_rule(current_user, rule_id):
     rule.priority = data.get('priority', 5)
     rule.is_active = 1 if data.get('is_active', True) else 0
     
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({'message': 'Értesítési szabály frissítve!'})
@@ -2893,6 +4066,7 @@ def delete_notification_rule(current_user, rule_id):
     """Notification rule törlése"""
     rule = NotificationRule.query.get_or_404(rule_id)
     db.session.delete(rule)
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({'message': 'Értesítési szabály törölve!'})
@@ -2943,6 +4117,7 @@ def create_notification_template(current_user):
     )
     
     db.session.add(template)
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({
@@ -2964,6 +4139,7 @@ def update_notification_template(current_user, template_id):
     template.body_html = data['body']
     template.variables_used = json.dumps(data.get('variables_used', []))
     
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({'message': 'Email sablon frissítve!'})
@@ -2980,6 +4156,7 @@ def delete_notification_template(current_user, template_id):
     
     template = NotificationTemplate.query.get_or_404(template_id)
     db.session.delete(template)
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({'message': 'Email sablon törölve!'})
@@ -3074,6 +4251,7 @@ def update_smtp_settings(current_user):
             
         settings.updated_at = datetime.datetime.utcnow()
     
+    NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
     db.session.commit()
     
     return jsonify({'message': 'SMTP beállítások mentve!'})
@@ -3351,6 +4529,7 @@ def run_migration_v8_1(current_user):
                 except Exception as e:
                     errors.append(f"{event_name}: {str(e)}")
         
+        NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
         db.session.commit()
         
         return jsonify({
@@ -3438,6 +4617,7 @@ def cleanup_old_notification_rules(current_user):
             """)
         )
         
+        NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
         db.session.commit()
         
         # Végső állapot
@@ -3509,66 +4689,282 @@ def migrate_smtp_api_key(current_user):
 @app.route('/api/stats', methods=['GET'])
 @token_required
 def get_stats(current_user):
+    # v8.4.23: Előre összesített rollup sorokból (lab_request_stats) a teljes lab_request tábla helyett
     if current_user.role == 'super_admin' or current_user.role == 'labor_staff':  # v7.0.1: lab_staff → labor_staff
-        total_requests = LabRequest.query.count()
-        requests_by_status = db.session.query(
-            LabRequest.status, db.func.count(LabRequest.id)
-        ).group_by(LabRequest.status).all()
-        requests_by_category = db.session.query(
-            RequestCategory.name, db.func.count(LabRequest.id)
-        ).join(LabRequest.category).group_by(RequestCategory.name).all()
-        total_revenue = db.session.query(db.func.sum(LabRequest.total_price)).scalar() or 0
-        revenue_by_status = db.session.query(
-            LabRequest.status, db.func.sum(LabRequest.total_price)
-        ).group_by(LabRequest.status).all()
+        rows = stats_rollup.read_stats()
     elif current_user.role == 'company_admin':
-        total_requests = LabRequest.query.filter_by(company_id=current_user.company_id).count()
-        requests_by_status = db.session.query(
-            LabRequest.status, db.func.count(LabRequest.id)
-        ).filter_by(company_id=current_user.company_id).group_by(LabRequest.status).all()
-        requests_by_category = db.session.query(
-            RequestCategory.name, db.func.count(LabRequest.id)
-        ).join(LabRequest.category).filter(LabRequest.company_id == current_user.company_id).group_by(RequestCategory.name).all()
-        total_revenue = db.session.query(db.func.sum(LabRequest.total_price)).filter_by(
-            company_id=current_user.company_id
-        ).scalar() or 0
-        revenue_by_status = db.session.query(
-            LabRequest.status, db.func.sum(LabRequest.total_price)
-        ).filter_by(company_id=current_user.company_id).group_by(LabRequest.status).all()
+        rows = stats_rollup.read_stats(company_id=current_user.company_id)
     else:
-        total_requests = LabRequest.query.filter_by(user_id=current_user.id).count()
-        requests_by_status = db.session.query(
-            LabRequest.status, db.func.count(LabRequest.id)
-        ).filter_by(user_id=current_user.id).group_by(LabRequest.status).all()
-        requests_by_category = db.session.query(
-            RequestCategory.name, db.func.count(LabRequest.id)
-        ).join(LabRequest.category).filter(LabRequest.user_id == current_user.id).group_by(RequestCategory.name).all()
-        total_revenue = db.session.query(db.func.sum(LabRequest.total_price)).filter_by(
-            user_id=current_user.id
-        ).scalar() or 0
-        revenue_by_status = db.session.query(
-            LabRequest.status, db.func.sum(LabRequest.total_price)
-        ).filter_by(user_id=current_user.id).group_by(LabRequest.status).all()
-    
-    # v7.0.29: submitted státusz egyesítése arrived_at_provider-rel (duplikáció fix)
-    by_status_dict = {status: count for status, count in requests_by_status}
-    if 'submitted' in by_status_dict:
-        by_status_dict['arrived_at_provider'] = by_status_dict.get('arrived_at_provider', 0) + by_status_dict['submitted']
-        del by_status_dict['submitted']
-    
-    revenue_by_status_dict = {status: (revenue or 0) for status, revenue in revenue_by_status}
-    if 'submitted' in revenue_by_status_dict:
-        revenue_by_status_dict['arrived_at_provider'] = revenue_by_status_dict.get('arrived_at_provider', 0) + revenue_by_status_dict['submitted']
-        del revenue_by_status_dict['submitted']
+        rows = stats_rollup.read_stats(user_id=current_user.id)
+    
+    category_names = dict(db.session.query(RequestCategory.id, RequestCategory.name).all())
+    
+    total_requests = 0
+    total_revenue = 0
+    by_status_dict = {}
+    revenue_by_status_dict = {}
+    by_category = {}
+    for status, category_id, count, revenue in rows:
+        revenue = revenue or 0
+        total_requests += count
+        total_revenue += revenue
+        # v7.0.29: submitted státusz egyesítése arrived_at_provider-rel (duplikáció fix)
+        status = 'arrived_at_provider' if status == 'submitted' else status
+        by_status_dict[status] = by_status_dict.get(status, 0) + count
+        revenue_by_status_dict[status] = revenue_by_status_dict.get(status, 0) + revenue
+        if category_id in category_names:
+            name = category_names[category_id]
+            by_category[name] = by_category.get(name, 0) + count
     
     return jsonify({
         'total_requests': total_requests,
         'by_status': by_status_dict,
-        'by_category': {cat: count for cat, count in requests_by_category},
+        'by_category': by_category,
         'total_revenue': total_revenue,
         'revenue_by_status': revenue_by_status_dict
     })
 
+# v8.4.24: Idősoros kapacitás analitika (lab_request_test_fact ténytáblából)
+ANALYTICS_DEFAULT_DAYS = {'day': 30, 'week': 84, 'month': 365}
+
+def analytics_company_scope(current_user):
+    """Analitika láthatóság: (engedélyezett, cég szűrő) - super_admin / labor_staff mindent, company_admin a saját cégét"""
+    if current_user.role in ['super_admin', 'labor_staff']:
+        return True, None
+    if current_user.role == 'company_admin':
+        return True, current_user.company_id
+    return False, None
+
+def parse_analytics_days(args, default_days):
+    """
+    from / to query paraméterek (YYYY-MM-DD, a 'to' napja is benne van) -> (első nap, utolsó nap)
+    
+    Raises:
+        ValueError: hibás dátum vagy fordított intervallum esetén
+    """
+    last_day = datetime.date.fromisoformat(args['to']) if args.get('to') else datetime.datetime.utcnow().date()
+    first_day = datetime.date.fromisoformat(args['from']) if args.get('from') \
+        else last_day - datetime.timedelta(days=default_days - 1)
+    if first_day > last_day:
+        raise ValueError('a kezdő dátum későbbi a záró dátumnál')
+    return first_day, last_day
+
+@app.route('/api/analytics', methods=['GET'])
+@token_required
+def get_analytics(current_user):
+    """
+    v8.4.24: Időszakonkénti kapacitás mutatók szervezeti egységenként
+    
+    Query paraméterek:
+        bucket: day | week | month (alap: week)
+        from, to: YYYY-MM-DD (a 'to' napja is benne van; alap: az időszakhoz illő visszatekintés)
+        department_id: csak az adott szervezeti egység vizsgálattípusai
+    
+    Mutatók:
+        - létrehozott kérések / vizsgálatok időszakonként
+        - áteresztés: lezárt kérések / vizsgálatok időszakonként (TestResult.validated_at)
+        - átfutási idő (megérkezés -> lezárás) medián és p90, egységenként és vizsgálattípusonként
+        - jelenlegi hátralék egységenként és vizsgálattípusonként
+    """
+    allowed, company_id = analytics_company_scope(current_user)  # v8.4.25: közös jogosultság
+    if not allowed:
+        return jsonify({'message': 'Nincs jogosultságod!'}), 403
+    
+    bucket = request.args.get('bucket', 'week')
+    if bucket not in analytics.BUCKETS:
+        return jsonify({'message': 'Érvénytelen paraméter: bucket (day, week vagy month)'}), 400
+    try:
+        first_day, last_day = parse_analytics_days(request.args, ANALYTICS_DEFAULT_DAYS[bucket])
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    department_id = request.args.get('department_id', type=int)
+    
+    buckets = analytics.bucket_starts(first_day, last_day, bucket)
+    if len(buckets) > analytics.MAX_BUCKETS:
+        return jsonify({'message': f'Túl sok időszak ({len(buckets)}), legfeljebb {analytics.MAX_BUCKETS} kérhető!'}), 400
+    
+    # A ténytáblát a háttér feldolgozó frissíti (NotificationService.run_worker) - a végpont csak olvas
+    test_types = db.session.query(TestType.id, TestType.name, TestType.department_id).all()
+    department_of = {tt_id: dept_id for tt_id, _, dept_id in test_types}
+    department_names = dict(db.session.query(Department.id, Department.name).all())
+    test_type_ids = None
+    if department_id is not None:
+        test_type_ids = [tt_id for tt_id, dept_id in department_of.items() if dept_id == department_id]
+    
+    date_from = datetime.datetime.combine(buckets[0], datetime.time())
+    date_to = datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time())
+    window = (date_from, date_to, bucket, company_id, test_type_ids)
+    
+    requests_created = analytics.distinct_requests('created_at', *window)
+    requests_completed = analytics.distinct_requests('request_completed_at', *window)
+    tests_created, tests_finished = {}, {}  # (időszak, vizsgálattípus) -> darab
+    created_totals, finished_totals = {}, {}  # időszak -> darab
+    for target, totals, column_name in ((tests_created, created_totals, 'created_at'),
+                                        (tests_finished, finished_totals, 'finished_at')):
+        for bucket_key, test_type_id, count in analytics.series(column_name, *window):
+            target[(bucket_key, test_type_id)] = count
+            totals[bucket_key] = totals.get(bucket_key, 0) + count
+    turnaround_by_test_type, turnaround_by_department = analytics.turnaround(
+        date_from, date_to, department_of, company_id, test_type_ids)
+    backlog = analytics.backlog(company_id, test_type_ids)
+    
+    bucket_keys = [day.isoformat() for day in buckets]
+    empty_backlog = {'in_lab': 0, 'awaiting_validation': 0}
+    
+    def total(counts, bucket_key, ids):
+        return sum(counts.get((bucket_key, tt_id), 0) for tt_id in ids)
+    
+    # Szervezeti egységenként: az egység vizsgálattípusainak összesítése
+    ids_by_department = {}
+    for tt_id, dept_id in department_of.items():
+        if test_type_ids is None or tt_id in test_type_ids:
+            ids_by_department.setdefault(dept_id, []).append(tt_id)
+    departments = []
+    for dept_id, ids in sorted(ids_by_department.items(), key=lambda item: department_names.get(item[0]) or ''):
+        dept_backlog = dict(empty_backlog)
+        for tt_id in ids:
+            for key, value in backlog.get(tt_id, empty_backlog).items():
+                dept_backlog[key] += value
+        departments.append({
+            'department_id': dept_id,
+            'department_name': department_names.get(dept_id, 'Nincs szervezeti egység'),
+            'series': [{
+                'bucket': key,
+                'tests_created': total(tests_created, key, ids),
+                'tests_finished': total(tests_finished, key, ids)
+            } for key in bucket_keys],
+            'turnaround': turnaround_by_department.get(dept_id, analytics.EMPTY_TURNAROUND),
+            'backlog': dept_backlog
+        })
+    
+    # Vizsgálattípusonként csak azok, amelyeknek van adata az időablakban vagy hátraléka
+    test_type_rows = []
+    for tt_id, name, dept_id in sorted(test_types, key=lambda row: row[1]):
+        if tt_id not in turnaround_by_test_type and tt_id not in backlog:
+            continue
+        if test_type_ids is not None and tt_id not in test_type_ids:
+            continue
+        test_type_rows.append({
+            'test_type_id': tt_id,
+            'test_type_name': name,
+            'department_id': dept_id,
+            'turnaround': turnaround_by_test_type.get(tt_id, analytics.EMPTY_TURNAROUND),
+            'backlog': backlog.get(tt_id, empty_backlog)
+        })
+    
+    refreshed_at = analytics.last_refreshed_at()
+    return jsonify({
+        'bucket': bucket,
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'refreshed_at': refreshed_at.isoformat() if refreshed_at else None,
+        'series': [{
+            'bucket': key,
+            'requests_created': requests_created.get(key, 0),
+            'requests_completed': requests_completed.get(key, 0),
+            'tests_created': created_totals.get(key, 0),
+            'tests_finished': finished_totals.get(key, 0)
+        } for key in bucket_keys],
+        'departments': departments,
+        'test_types': test_type_rows
+    })
+
+# v8.4.25: Státusz előzmények és SLA lekérdezések (lab_request_status_event)
+STATUS_ENTRIES_MAX_LIMIT = 1000
+
+def serialize_status_event(item):
+    return {
+        'from_status': item.from_status,
+        'to_status': item.to_status,
+        'changed_at': item.changed_at.isoformat() if item.changed_at else None,
+        'changed_by': item.changed_by.name if item.changed_by else None,
+        'source': item.source
+    }
+
+@app.route('/api/requests/<int:request_id>/status-history', methods=['GET'])
+@token_required
+def get_request_status_history(current_user, request_id):
+    """v8.4.25: Egy kérés státuszváltozásai és az egyes státuszokban töltött idő (másodperc)"""
+    req = visible_requests_query(current_user).filter(LabRequest.id == request_id).first()
+    if not req:
+        return jsonify({'message': 'Laborkérés nem található!'}), 404
+    
+    events, durations = status_history.request_history(req.id)
+    return jsonify({
+        'request_id': req.id,
+        'request_number': req.request_number,
+        'status': req.status,
+        'events': [serialize_status_event(item) for item in events],
+        'time_in_state_seconds': {status: round(seconds) for status, seconds in durations.items()}
+    })
+
+@app.route('/api/analytics/status-entries', methods=['GET'])
+@token_required
+def get_status_entries(current_user):
+    """
+    v8.4.25: Az adott státuszba az időablakban került kérések
+    
+    Query paraméterek: status (kötelező), from, to (YYYY-MM-DD, alap: utolsó 30 nap), limit (max 1000)
+    """
+    allowed, company_id = analytics_company_scope(current_user)
+    if not allowed:
+        return jsonify({'message': 'Nincs jogosultságod!'}), 403
+    
+    status = request.args.get('status')
+    if not status:
+        return jsonify({'message': 'Hiányzó paraméter: status'}), 400
+    try:
+        first_day, last_day = parse_analytics_days(request.args, 30)
+        limit = max(1, min(int(request.args.get('limit', STATUS_ENTRIES_MAX_LIMIT)), STATUS_ENTRIES_MAX_LIMIT))
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    date_from = datetime.datetime.combine(first_day, datetime.time())
+    date_to = datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time())
+    rows = status_history.entered_state(status_history.LEGACY_STATUSES.get(status, status),
+                                        date_from, date_to, company_id, limit + 1)
+    
+    request_ids = {row[0] for row in rows[:limit]}
+    numbers = dict(db.session.query(LabRequest.id, LabRequest.request_number)
+                   .filter(LabRequest.id.in_(request_ids)).all()) if request_ids else {}
+    return jsonify({
+        'status': status,
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'truncated': len(rows) > limit,
+        'entries': [{
+            'request_id': request_id,
+            'request_number': numbers.get(request_id),
+            'entered_at': entered_at.isoformat(),
+            'from_status': from_status
+        } for request_id, entered_at, from_status in rows[:limit]]
+    })
+
+@app.route('/api/analytics/time-in-state', methods=['GET'])
+@token_required
+def get_time_in_state(current_user):
+    """
+    v8.4.25: Státuszonként eltöltött idő (SLA) az időablakban megkezdett szakaszokra
+    
+    Query paraméterek: from, to (YYYY-MM-DD, alap: utolsó 30 nap)
+    A még tartó szakaszok ('open') a mostani időpontig számítanak.
+    """
+    allowed, company_id = analytics_company_scope(current_user)
+    if not allowed:
+        return jsonify({'message': 'Nincs jogosultságod!'}), 403
+    try:
+        first_day, last_day = parse_analytics_days(request.args, 30)
+    except ValueError as e:
+        return jsonify({'message': f'Érvénytelen paraméter: {str(e)}'}), 400
+    
+    date_from = datetime.datetime.combine(first_day, datetime.time())
+    date_to = datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time())
+    return jsonify({
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'states': status_history.time_in_states(date_from, date_to, company_id)
+    })
+
 # --- v6.7 Data Definitions ---
 V67_CATEGORIES = [
     {'name': 'Anyagvizsgálat', 'description': 'Anyagösszetétel és tulajdonságok meghatározása', 'color': '#0EA5E9', 'icon': 'Beaker'},
@@ -4158,7 +5554,6 @@ def init_db():
                     user_id=4, company_id=1, category_id=1,
                     sample_id='MOL-2024-001',
                     sample_description='Kőolaj minta az algyői mezőről',
-                    test_types=json.dumps([1, 2, 3]),
                     total_price=35000,
                     urgency='normal', status='submitted',
                     sampling_location='Algyő, 3. kút',
@@ -4170,7 +5565,6 @@ def init_db():
                     user_id=4, company_id=1, category_id=2,
                     sample_id='MOL-2024-002',
                     sample_description='Dízelolaj minta',
-                    test_types=json.dumps([4, 5]),
                     total_price=28000,
                     urgency='urgent', status='in_progress',
                     sampling_location='Százhalombatta, finomító',
@@ -4179,6 +5573,9 @@ def init_db():
                     special_instructions='Gyúlékony anyag, óvatosan kezelendő'
                 ),
             ]
+            # v8.4.3: Vizsgálatok a kapcsolótáblába is
+            set_request_test_types(requests[0], [1, 2, 3])
+            set_request_test_types(requests[1], [4, 5])
             for req in requests:
                 db.session.add(req)
             db.session.commit()
@@ -4370,6 +5767,14 @@ def ensure_initialized():
         print(f"⚠️  Auto-initialization failed: {e}")
         _app_initialized = True  # Don't try again
 
+@app.before_request
+def ensure_notification_worker():
+    """
+    v8.4.6: Outbox feldolgozó szál indítása (NOTIFICATION_DISPATCH_MODE=thread esetén)
+    Kérésnél indul, nem importkor - gunicorn --preload fork után is él
+    """
+    NotificationService.ensure_background_worker(app)
+
 @app.route('/api/init', methods=['GET'])
 def initialize_database():
     """Database initialization endpoint - csak egyszer kell meghívni!"""
@@ -4398,7 +5803,12 @@ def reset_data_endpoint(current_user):
         
         # Delete in correct order (foreign keys)
         print("  🗑️  Deleting lab requests...")
+        db.session.execute(text("DELETE FROM lab_request_test_type"))  # v8.4.3
+        db.session.execute(text("DELETE FROM lab_request_test_fact"))  # v8.4.24
+        db.session.execute(text("DELETE FROM lab_request_status_event"))  # v8.4.25
         db.session.execute(text("DELETE FROM lab_request"))
+        db.session.execute(text("DELETE FROM lab_request_stats"))  # v8.4.23
+        db.session.execute(text("DELETE FROM request_number_sequence"))  # v8.4.14
         
         print("  🗑️  Deleting test types...")
         db.session.execute(text("DELETE FROM test_type"))
@@ -4548,8 +5958,10 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False') == 'True'
     app.run(host='0.0.0.0', port=port, debug=debug)
-else:
+elif __name__ != '__mp_main__':
     # Production mode (Gunicorn) - init on first import
+    # (v8.4.19: a PDF render pool processzei - forkserver / spawn - a `python app.py` fő scriptet
+    # __mp_main__ néven importálják újra; ott nincs inicializálás)
     print("\n🔄 Production mode: Running auto-initialization...")
     with app.app_context():
         # Create tables if they don't exist
@@ -4750,6 +6162,7 @@ def migrate_v8_simple():
             VALUES (:h, :p, :e, :n, :a)
         """), {'h': 'smtp.gmail.com', 'p': 587, 'e': 'noreply@example.com', 'n': 'Labor', 'a': 0})
         
+        NotificationService.bump_config_version()  # v8.4.8: Konfiguráció cache érvénytelenítés
         db.session.commit()
         results.append('✅ SMTP settings created')
         
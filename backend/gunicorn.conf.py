@@ -0,0 +1,17 @@
+"""
+Gunicorn beállítások - v8.4.10
+
+A gunicorn automatikusan betölti a munkakönyvtárból (./gunicorn.conf.py).
+A parancssori kapcsolók (--workers, --timeout, --bind) felülírják ezeket.
+
+Szálas (gthread) worker: az SSE értesítés stream (/api/notifications/stream)
+kapcsolatonként egy szálat tart nyitva, sync worker mellett egyetlen nyitott
+stream az egész alkalmazást blokkolná. A nyitott streamek száma SSE_MAX_STREAMS
+(alapból a szálak negyede) - így a többi API hívásnak mindig marad szál, a
+limit feletti kliensek pollingra váltanak.
+"""
+
+import os
+
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
@@ -14,6 +14,22 @@ Add new migrations to the MIGRATIONS list below. Each migration is a dictionary
 
 The auto_migrate() function will automatically apply all pending migrations.
 
+Index migrations (v8.4.5):
+--------------------------
+INDEX_MIGRATIONS entries create missing indexes with 'name', 'table',
+'columns' (SQL expressions), optional 'unique' and 'postgresql_only'.
+Names must match the db.Index() declarations on the models, so fresh
+databases (db.create_all) and migrated ones end up identical. On
+PostgreSQL indexes are built CONCURRENTLY (no table write lock).
+
+Data migrations (v8.4.3):
+-------------------------
+DATA_MIGRATIONS entries run after the column migrations. Each one has a
+'table', a 'description' and an idempotent 'apply' function(db) that returns
+the number of affected rows (0 = nothing to do). Entries with a 'once' key
+run until they succeed once: completion is recorded in the config_version
+table under that key, later startups skip them without scanning.
+
 Example:
 --------
 MIGRATIONS = [
@@ -218,6 +234,323 @@ MIGRATIONS = [
         'definition': 'TEXT',
         'description': 'Elutasítás indoklása (ha visszaküldve)'
     },
+    
+    # v8.4.24: Analitika - átfutási idő kezdete
+    {
+        'table': 'lab_request',
+        'column': 'arrived_at',
+        'definition': 'TIMESTAMP',
+        'description': 'Minta megérkezése a szolgáltatóhoz (első arrived_at_provider)'
+    },
+    
+    # v8.4.6: Outbox - kiküldés rögzítése, hogy az újrapróbálás ne duplikáljon
+    {
+        'table': 'notification_outbox',
+        'column': 'in_app_delivered_at',
+        'definition': 'TIMESTAMP',
+        'description': 'In-app értesítések kiküldve (újrapróbáláskor kihagyandók)'
+    },
+    {
+        'table': 'notification_outbox',
+        'column': 'emailed_user_ids',
+        'definition': 'TEXT',
+        'description': 'Már kiküldött email címzettek (JSON lista)'
+    },
+]
+
+# ============================================================================
+# INDEX MIGRATIONS
+# ============================================================================
+# v8.4.5: Gyakori szűrések indexei - a modellek __table_args__ deklarációival egyezik
+
+INDEX_MIGRATIONS = [
+    {
+        'name': 'ix_lab_request_status',
+        'table': 'lab_request',
+        'columns': ['status'],
+        'description': 'Request status filter'
+    },
+    {
+        'name': 'ix_lab_request_company_status',
+        'table': 'lab_request',
+        'columns': ['company_id', 'status'],
+        'description': 'Company request list by status'
+    },
+    {
+        'name': 'ix_lab_request_user_created',
+        'table': 'lab_request',
+        'columns': ['user_id', 'created_at'],
+        'description': 'Own requests ordered by date'
+    },
+    {
+        'name': 'ix_lab_request_created_id',
+        'table': 'lab_request',
+        'columns': ['created_at', 'id'],
+        'description': 'Keyset pagination order'
+    },
+    {
+        'name': 'ix_lab_request_number_pattern',
+        'table': 'lab_request',
+        'columns': ['request_number varchar_pattern_ops'],
+        'postgresql_only': True,
+        'description': "request_number LIKE 'PREFIX%' lookup"
+    },
+    {
+        'name': 'uq_test_result_request_test_type',
+        'table': 'test_result',
+        'columns': ['lab_request_id', 'test_type_id'],
+        'unique': True,
+        'description': 'One result per request and test type (fails if duplicates exist)'
+    },
+    {
+        'name': 'ix_notifications_user_read_created',
+        'table': 'notifications',
+        'columns': ['user_id', 'is_read', 'created_at'],
+        'description': 'Unread notifications per user'
+    },
+    {
+        'name': 'ix_notifications_request_id',
+        'table': 'notifications',
+        'columns': ['request_id'],
+        'description': 'Notifications of a request'
+    },
+    {
+        'name': 'ix_notifications_created_at',
+        'table': 'notifications',
+        'columns': ['created_at'],
+        'description': 'Retention purge by age'
+    },
+    # v8.4.24: Analitika ténytábla inkrementális frissítése (módosult kérések / eredmények)
+    {
+        'name': 'ix_lab_request_updated_at',
+        'table': 'lab_request',
+        'columns': ['updated_at'],
+        'description': 'Requests changed since the analytics watermark'
+    },
+    {
+        'name': 'ix_test_result_updated_at',
+        'table': 'test_result',
+        'columns': ['updated_at'],
+        'description': 'Results changed since the analytics watermark'
+    },
+]
+
+# ============================================================================
+# DATA MIGRATIONS
+# ============================================================================
+
+def backfill_lab_request_test_types(db):
+    """
+    v8.4.3: lab_request_test_type kapcsolótábla feltöltése a JSON test_types mezőből
+    
+    Csak azokat a kéréseket dolgozza fel, amelyeknek még nincs kapcsolótábla sora,
+    így többször is futtatható. Nem létező vizsgálattípus ID-kat és duplikátumokat kihagy.
+    Egyszeri ('once'): v8.4.3 óta a kérések mentése tölti a kapcsolótáblát, az érvényes
+    ID nélküli kéréseket nem kell minden induláskor újra átnézni.
+    
+    Returns:
+        int: beszúrt sorok száma
+    """
+    import json
+    
+    existing_test_types = {row[0] for row in db.session.execute(db.text("SELECT id FROM test_type"))}
+    
+    pending = db.session.execute(db.text("""
+        SELECT r.id, r.test_types FROM lab_request r
+        WHERE NOT EXISTS (
+            SELECT 1 FROM lab_request_test_type l WHERE l.lab_request_id = r.id
+        )
+    """)).fetchall()
+    
+    rows = []
+    for request_id, test_types in pending:
+        try:
+            ids = json.loads(test_types) if test_types else []
+        except (ValueError, TypeError):
+            print(f"  ⚠️  lab_request #{request_id}: hibás test_types JSON, kihagyva")
+            continue
+        
+        seen = set()
+        for tt_id in ids:
+            try:
+                tt_id = int(tt_id)
+            except (ValueError, TypeError):
+                continue
+            if tt_id in seen or tt_id not in existing_test_types:
+                continue
+            seen.add(tt_id)
+            rows.append({'lab_request_id': request_id, 'test_type_id': tt_id, 'position': len(seen) - 1})
+    
+    if rows:
+        db.session.execute(db.text("""
+            INSERT INTO lab_request_test_type (lab_request_id, test_type_id, position)
+            VALUES (:lab_request_id, :test_type_id, :position)
+        """), rows)
+    
+    return len(rows)
+
+
+def backfill_notification_unread_counters(db):
+    """
+    v8.4.11: notification_unread_counter feltöltése a notifications táblából
+    
+    Csak üres számláló táblára fut (első telepítés), utána a számlálókat a
+    NotificationService tartja karban; eltérés esetén: scripts/rebuild_unread_counters.py
+    
+    Returns:
+        int: létrehozott számláló sorok száma
+    """
+    if db.session.execute(db.text("SELECT 1 FROM notification_unread_counter LIMIT 1")).fetchone():
+        return 0
+    
+    result = db.session.execute(db.text("""
+        INSERT INTO notification_unread_counter (user_id, unread_count)
+        SELECT user_id, COUNT(*) FROM notifications
+        WHERE is_read = 0
+        GROUP BY user_id
+    """))
+    return result.rowcount or 0
+
+
+def backfill_lab_request_stats(db):
+    """
+    v8.4.23: lab_request_stats rollup feltöltése a lab_request táblából
+    
+    Csak üres rollup táblára fut (első telepítés), utána a stats_rollup modul
+    tartja karban; eltérés esetén: scripts/rebuild_stats_rollup.py
+    
+    Returns:
+        int: létrehozott rollup sorok száma
+    """
+    if db.session.execute(db.text("SELECT 1 FROM lab_request_stats LIMIT 1")).fetchone():
+        return 0
+    
+    result = db.session.execute(db.text("""
+        INSERT INTO lab_request_stats (company_id, user_id, status, category_id, request_count, total_revenue)
+        SELECT company_id, user_id, COALESCE(status, ''), COALESCE(category_id, 0),
+               COUNT(*), COALESCE(SUM(total_price), 0)
+        FROM lab_request
+        GROUP BY company_id, user_id, COALESCE(status, ''), COALESCE(category_id, 0)
+    """))
+    return result.rowcount or 0
+
+
+def backfill_lab_request_arrived_at(db):
+    """
+    v8.4.24: lab_request.arrived_at kitöltése a korábbi státuszváltozás értesítésekből
+    
+    A megérkezés időpontját korábban nem tároltuk; a 'status_to_arrived_at_provider'
+    outbox sorok és értesítések legkorábbi időpontja a legjobb közelítés. Ahol
+    nincs ilyen (pl. a megőrzési idő miatt törölve), NULL marad - ezek a kérések
+    az átfutási idő statisztikából kimaradnak.
+    
+    Returns:
+        int: kitöltött kérések száma
+    """
+    result = db.session.execute(db.text("""
+        UPDATE lab_request SET arrived_at = (
+            SELECT MIN(e.created_at) FROM (
+                SELECT o.request_id, o.created_at FROM notification_outbox o
+                WHERE o.event_key = 'status_to_arrived_at_provider'
+                UNION ALL
+                SELECT n.request_id, n.created_at FROM notifications n
+                JOIN notification_event_types t ON t.id = n.event_type_id
+                WHERE t.event_key = 'status_to_arrived_at_provider'
+            ) e WHERE e.request_id = lab_request.id
+        )
+        WHERE arrived_at IS NULL
+          AND status IN ('arrived_at_provider', 'submitted', 'in_progress', 'validation_pending', 'completed')
+          AND (
+            EXISTS (SELECT 1 FROM notification_outbox o
+                    WHERE o.request_id = lab_request.id AND o.event_key = 'status_to_arrived_at_provider')
+            OR EXISTS (SELECT 1 FROM notifications n
+                       JOIN notification_event_types t ON t.id = n.event_type_id
+                       WHERE n.request_id = lab_request.id AND t.event_key = 'status_to_arrived_at_provider')
+          )
+    """))
+    return result.rowcount or 0
+
+
+def backfill_lab_request_test_facts(db):
+    """
+    v8.4.24: lab_request_test_fact analitika ténytábla első feltöltése
+    
+    Csak üres táblára fut; utána a háttér feldolgozó (NotificationService.run_worker) /
+    scripts/refresh_analytics_facts.py frissíti inkrementálisan.
+    
+    Returns:
+        int: írt tény sorok száma
+    """
+    if db.session.execute(db.text("SELECT 1 FROM lab_request_test_fact LIMIT 1")).fetchone():
+        return 0
+    
+    import analytics
+    return analytics.refresh_facts(full=True)['rows']
+
+
+def backfill_lab_request_status_events(db):
+    """
+    v8.4.25: Kezdő státusz esemény az esemény nélküli kérésekhez
+    
+    A korábbi státuszváltozások nem rekonstruálhatók; a kérés a jelenlegi
+    státuszába az utolsó módosításakor (updated_at) került - ennél korábbi
+    szakaszokra nincs adat. Csak az esemény nélküli kéréseket dolgozza fel
+    (egyszer fut: a NOT EXISTS a teljes kérés táblát végigolvasná minden induláskor).
+    
+    Returns:
+        int: beszúrt esemény sorok száma
+    """
+    result = db.session.execute(db.text("""
+        INSERT INTO lab_request_status_event (lab_request_id, from_status, to_status, changed_at, source)
+        SELECT r.id, NULL, COALESCE(r.status, 'draft'), COALESCE(r.updated_at, r.created_at), 'backfill'
+        FROM lab_request r
+        WHERE NOT EXISTS (
+            SELECT 1 FROM lab_request_status_event e WHERE e.lab_request_id = r.id
+        )
+    """))
+    return result.rowcount or 0
+
+
+DATA_MIGRATIONS = [
+    # v8.4.3: JSON test_types -> kapcsolótábla
+    {
+        'table': 'lab_request_test_type',
+        'description': 'Backfill from lab_request.test_types JSON',
+        'apply': backfill_lab_request_test_types,
+        'once': 'data_migration:lab_request_test_type'
+    },
+    # v8.4.11: Olvasatlan számlálók kezdeti feltöltése
+    {
+        'table': 'notification_unread_counter',
+        'description': 'Backfill unread counts from notifications',
+        'apply': backfill_notification_unread_counters
+    },
+    # v8.4.23: Dashboard statisztika rollup kezdeti feltöltése
+    {
+        'table': 'lab_request_stats',
+        'description': 'Backfill dashboard stats rollup from lab_request',
+        'apply': backfill_lab_request_stats
+    },
+    # v8.4.24: Megérkezés időpontja + analitika ténytábla
+    {
+        'table': 'lab_request',
+        'description': 'Backfill arrived_at from status change notifications',
+        'apply': backfill_lab_request_arrived_at,
+        'once': 'data_migration:lab_request_arrived_at'
+    },
+    {
+        'table': 'lab_request_test_fact',
+        'description': 'Initial fill of the analytics fact table',
+        'apply': backfill_lab_request_test_facts,
+        'once': 'data_migration:lab_request_test_fact'
+    },
+    # v8.4.25: Státusz esemény napló - kezdő esemény a korábbi kérésekhez
+    {
+        'table': 'lab_request_status_event',
+        'description': 'Backfill current status events for requests without history',
+        'apply': backfill_lab_request_status_events,
+        'once': 'data_migration:lab_request_status_event'
+    },
 ]
 
 # ============================================================================
@@ -284,7 +617,7 @@ def apply_migrations(db, inspector=None):
             errors.append(error_msg)
             print(f"  {error_msg}")
     
-    # Commit all changes at once
+    # Oszlopok véglegesítése az adatmigrációk előtt (egy hibás adatmigráció rollback-je ne vigye el)
     if applied:
         try:
             db.session.commit()
@@ -294,9 +627,124 @@ def apply_migrations(db, inspector=None):
             errors.append(f"❌ Commit failed: {str(e)}")
             return False, applied, errors
     
+    # v8.4.3: Adatmigrációk (idempotens, minden induláskor lefutnak - a 'once' jelölésűek csak egyszer)
+    # Migrációnként külön commit: egy hibás migráció csak a saját módosításait és jelölőjét görgeti vissza
+    has_markers = inspector.has_table('config_version')
+    for migration in DATA_MIGRATIONS:
+        table = migration['table']
+        description = migration['description']
+        marker = migration.get('once') if has_markers else None
+        
+        try:
+            if not inspector.has_table(table):
+                errors.append(f"❌ Table '{table}' not found for data migration")
+                continue
+            
+            if marker and db.session.execute(db.text(
+                "SELECT 1 FROM config_version WHERE config_key = :key"
+            ), {'key': marker}).fetchone():
+                print(f"  ⏭️  Skipped: {table} - {description} (already done)")
+                continue
+            
+            count = migration['apply'](db)
+            if marker:
+                # Ugyanabban a tranzakcióban, mint az adatmódosítás
+                db.session.execute(db.text("""
+                    INSERT INTO config_version (config_key, version, updated_at)
+                    VALUES (:key, 1, CURRENT_TIMESTAMP)
+                """), {'key': marker})
+            db.session.commit()
+            if count:
+                applied.append({
+                    'table': table,
+                    'column': '(data)',
+                    'description': f"{description} ({count} rows)"
+                })
+                print(f"  ✅ Applied: {table} - {description} ({count} rows)")
+            else:
+                print(f"  ⏭️  Skipped: {table} - {description} (nothing to do)")
+        
+        except Exception as e:
+            db.session.rollback()
+            error_msg = f"❌ Data migration failed on {table}: {str(e)}"
+            errors.append(error_msg)
+            print(f"  {error_msg}")
+    
+    # v8.4.5: Indexek (a session tranzakción kívül, PostgreSQL-en CONCURRENTLY)
+    apply_index_migrations(db, inspector, applied, errors)
+    
     return len(errors) == 0, applied, errors
 
 
+def apply_index_migrations(db, inspector, applied, errors):
+    """
+    Create missing indexes from INDEX_MIGRATIONS (idempotent)
+    
+    PostgreSQL: CREATE INDEX CONCURRENTLY csak tranzakción kívül futhat, ezért
+    AUTOCOMMIT kapcsolatot használunk. Egy megszakadt CONCURRENTLY build INVALID
+    indexet hagy maga után - ezt eldobjuk és újraépítjük.
+    SQLite: sima CREATE INDEX IF NOT EXISTS.
+    """
+    is_postgres = db.engine.dialect.name == 'postgresql'
+    indexes_cache = {}
+    
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for migration in INDEX_MIGRATIONS:
+            name = migration['name']
+            table = migration['table']
+            description = migration['description']
+            
+            if migration.get('postgresql_only') and not is_postgres:
+                continue
+            
+            try:
+                if table not in indexes_cache:
+                    try:
+                        indexes_cache[table] = {idx['name'] for idx in inspector.get_indexes(table)}
+                    except Exception as e:
+                        errors.append(f"❌ Table '{table}' not found: {e}")
+                        continue
+                
+                exists = name in indexes_cache[table]
+                if exists and is_postgres:
+                    valid = conn.execute(db.text("""
+                        SELECT i.indisvalid FROM pg_index i
+                        JOIN pg_class c ON c.oid = i.indexrelid
+                        WHERE c.relname = :name
+                    """), {'name': name}).scalar()
+                    if valid is False:
+                        print(f"  🔄 Rebuilding invalid index: {name}")
+                        conn.execute(db.text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                        exists = False
+                
+                if exists:
+                    print(f"  ⏭️  Skipped: index {name} (already exists)")
+                    continue
+                
+                unique = 'UNIQUE ' if migration.get('unique') else ''
+                # v8.4.12: Particionált táblán (notifications) nincs CONCURRENTLY
+                partitioned = is_postgres and conn.execute(db.text(
+                    "SELECT relkind = 'p' FROM pg_class WHERE relname = :table"
+                ), {'table': table}).scalar()
+                concurrently = 'CONCURRENTLY ' if is_postgres and not partitioned else ''
+                columns = ', '.join(migration['columns'])
+                conn.execute(db.text(
+                    f'CREATE {unique}INDEX {concurrently}IF NOT EXISTS {name} ON "{table}" ({columns})'
+                ))
+                
+                applied.append({
+                    'table': table,
+                    'column': f"(index {name})",
+                    'description': description
+                })
+                print(f"  ✅ Applied: index {name} on {table} - {description}")
+            
+            except Exception as e:
+                error_msg = f"❌ Failed to create index {name}: {str(e)}"
+                errors.append(error_msg)
+                print(f"  {error_msg}")
+
+
 def get_migration_status(inspector, table_name):
     """
     Get status of all migrations for a specific table
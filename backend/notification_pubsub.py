@@ -0,0 +1,191 @@
+"""
+Notification pub/sub - v8.4.10
+==============================
+
+Push csatorna az SSE végponthoz (/api/notifications/stream): a NotificationService
+commit után ide publikál, az SSE kapcsolatok felhasználónként feliratkoznak.
+
+Backendek (NOTIFICATION_PUBSUB környezeti változó):
+    postgres - PostgreSQL LISTEN/NOTIFY, több processz / worker között is működik
+               (alapértelmezett PostgreSQL adatbázisnál)
+    memory   - processzen belüli sorok (SQLite / fejlesztés / teszt)
+
+Egy üzenet: publish(event_type, data, users) - a users dict user_id -> felhasználónkénti
+mezők; a feliratkozó a {'type': event_type, **data, **users[user_id]} payload-ot kapja.
+"""
+
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+CHANNEL = 'lab_notifications'
+PG_NOTIFY_MAX_BYTES = 7900  # PostgreSQL NOTIFY payload limit: 8000 byte
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+_pubsub = None
+_pubsub_lock = threading.Lock()
+
+
+class Subscription:
+    """Egy SSE kapcsolat feliratkozása"""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def get(self, timeout=None):
+        """Következő payload, vagy None ha timeout-ig nem jött semmi"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryPubSub:
+    """Processzen belüli pub/sub - csak az ugyanebben a processzben publikált üzeneteket látja"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # user_id -> set(Subscription)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscriptions)
+
+    def publish(self, event_type, data, users):
+        for user_id, fields in users.items():
+            self._deliver(user_id, {'type': event_type, **data, **fields})
+
+    def _deliver(self, user_id, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(payload)
+            except queue.Full:
+                # Lassú kliens: eldobjuk, újracsatlakozáskor úgyis újratölti a listát
+                pass
+
+
+class PostgresPubSub(InMemoryPubSub):
+    """
+    LISTEN/NOTIFY alapú pub/sub
+
+    Publikálás: pg_notify() AUTOCOMMIT kapcsolaton (a hívó már commit-olt).
+    Fogadás: processzenként egy háttér szál egy dedikált kapcsolaton, csak az
+    első feliratkozáskor indul - ha senki sem figyel, nincs LISTEN kapcsolat.
+    """
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self._listener_started = False
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        self._ensure_listener()
+        return subscription
+
+    def publish(self, event_type, data, users):
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            from sqlalchemy import text
+            for chunk in self._chunk_payloads(event_type, data, users):
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": CHANNEL, "payload": chunk})
+
+    @staticmethod
+    def _chunk_payloads(event_type, data, users):
+        """Felhasználók szétosztása NOTIFY méretkorlát alatti payload-okra"""
+        base = {'t': event_type, 'd': data, 'u': {}}
+        base_size = len(json.dumps(base))
+        chunk, size = {}, base_size
+        for user_id, fields in users.items():
+            item_size = len(json.dumps({str(user_id): fields})) + 1
+            if chunk and size + item_size > PG_NOTIFY_MAX_BYTES:
+                yield json.dumps({**base, 'u': chunk})
+                chunk, size = {}, base_size
+            chunk[str(user_id)] = fields
+            size += item_size
+        if chunk:
+            yield json.dumps({**base, 'u': chunk})
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener_started:
+                return
+            self._listener_started = True
+        thread = threading.Thread(target=self._listen_loop, name='notification-pubsub-listener', daemon=True)
+        thread.start()
+
+    def _listen_loop(self):
+        while True:
+            connection = None
+            try:
+                # Dedikált kapcsolat, nem foglal helyet a pool-ban
+                connection = self.engine.raw_connection()
+                connection.detach()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+
+                while True:
+                    readable, _, _ = select.select([dbapi_connection], [], [], 60)
+                    if not readable:
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notification = dbapi_connection.notifies.pop(0)
+                        self._handle_notify(notification.payload)
+
+            except Exception as e:
+                print(f"⚠️  Notification LISTEN hiba, újracsatlakozás 5s múlva: {e}")
+                time.sleep(5)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _handle_notify(self, raw_payload):
+        try:
+            message = json.loads(raw_payload)
+        except ValueError:
+            return
+        for user_id, fields in message.get('u', {}).items():
+            self._deliver(int(user_id), {'type': message['t'], **message.get('d', {}), **fields})
+
+
+def get_pubsub(engine):
+    """Processzenkénti pub/sub példány (backend a NOTIFICATION_PUBSUB vagy az adatbázis alapján)"""
+    global _pubsub
+
+    if _pubsub is None:
+        with _pubsub_lock:
+            if _pubsub is None:
+                default = 'postgres' if engine.dialect.name == 'postgresql' else 'memory'
+                backend = os.environ.get('NOTIFICATION_PUBSUB', default).lower()
+                _pubsub = PostgresPubSub(engine) if backend == 'postgres' else InMemoryPubSub()
+    return _pubsub
@@ -17,20 +17,195 @@ Használat:
             'requester_name': 'Kiss János'
         }
     )
+
+v8.4.6 - Outbox alapú kiküldés:
+    A notify() csak egy notification_outbox sort ír a hívó tranzakciójába
+    (a hívó commit-ja menti a státuszváltozással együtt). A kiküldést a
+    háttér feldolgozó végzi (process_outbox), újrapróbálással és backoff-fal.
+    
+    NOTIFICATION_DISPATCH_MODE környezeti változó:
+        thread  - (alapértelmezett) feldolgozó szál a web processzben
+        worker  - csak sorba állítás, külön processz: python notification_worker.py
+        inline  - régi viselkedés, szinkron kiküldés a kérésen belül
 """
 
 import json
+import os
 import re
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from flask import current_app
 from sqlalchemy import text
 
 # LATE IMPORT - db, User, LabRequest csak függvényeken belül!
 # Ezzel elkerüljük a circular import-ot (app.py imports notification_service)
 
+# v8.4.6: Háttér feldolgozó szál állapota (processzenként)
+_worker_lock = threading.Lock()
+_worker_pid = None
+_worker_wake = threading.Event()
+_last_retention_run = 0.0  # v8.4.12: utolsó megőrzési futás (monotonic)
+_last_analytics_run = 0.0  # v8.4.24: utolsó analitika ténytábla frissítés (monotonic)
+
+# v8.4.7: MailerSend bulk API
+MAILERSEND_BULK_URL = "https://api.mailersend.com/v1/bulk-email"
+MAILERSEND_BULK_LIMIT = 500
+
+
+class EmailDeliveryError(Exception):
+    """
+    Email kiküldés sikertelen (kapcsolat / szerver / API hiba) - az outbox sor újrapróbálandó
+    
+    sent_user_ids: a hiba előtt már sikeresen kiküldött címzettek (újrapróbáláskor kihagyandók)
+    """
+    
+    def __init__(self, message, sent_user_ids=()):
+        super().__init__(message)
+        self.sent_user_ids = set(sent_user_ids)
+
+
+class SMTPConnectionPool:
+    """
+    v8.4.7: Újrahasznosítható SMTP kapcsolatok
+    
+    A kapcsolatok a beállításokkal (host, port, user, jelszó, TLS) kulcsolva
+    maradnak nyitva. Kiadás előtt NOOP-pal ellenőrizzük őket; az idle_timeout-nál
+    régebben használtakat eldobjuk (a legtöbb szerver úgyis bontja őket).
+    """
+    
+    def __init__(self, max_idle=2, idle_timeout=60, timeout=30):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = []  # [(key, server, last_used)]
+    
+    def _connect(self, key):
+        import smtplib
+        
+        host, port, username, password, use_tls = key
+        server = smtplib.SMTP(host, port, timeout=self.timeout)
+        if use_tls:
+            server.starttls()
+        if username:
+            server.login(username, password)
+        return server
+    
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def acquire(self, key):
+        """Élő kapcsolat a pool-ból, vagy új kapcsolat"""
+        now = time.monotonic()
+        stale = []
+        server = None
+        
+        with self._lock:
+            keep = []
+            for entry in self._idle:
+                entry_key, entry_server, last_used = entry
+                if entry_key != key or now - last_used > self.idle_timeout:
+                    stale.append(entry_server)  # Régi beállítás vagy túl régóta áll
+                elif server is None:
+                    server = entry_server
+                else:
+                    keep.append(entry)
+            self._idle = keep
+        
+        for old in stale:
+            self._close(old)
+        
+        if server is not None:
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except Exception:
+                pass
+            self._close(server)
+        
+        return self._connect(key)
+    
+    def release(self, key, server, broken=False):
+        """Kapcsolat visszaadása (hibás kapcsolat bezárása)"""
+        if not broken:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append((key, server, time.monotonic()))
+                    return
+        self._close(server)
+    
+    @contextmanager
+    def connection(self, key):
+        server = self.acquire(key)
+        try:
+            yield server
+        except Exception:
+            self.release(key, server, broken=True)
+            raise
+        self.release(key, server)
+    
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, server, _ in idle:
+            self._close(server)
+
+
+_smtp_pool = SMTPConnectionPool()
+_http_session = None
+
+# v8.4.8: Értesítési konfiguráció cache (event típusok, szabályok, sablonok, SMTP)
+# A config_version tábla 'notification_config' sorát az admin endpointok növelik;
+# a verziót processzenként legfeljebb CONFIG_VERSION_CHECK_SECONDS-onként ellenőrizzük.
+CONFIG_VERSION_KEY = 'notification_config'
+CONFIG_VERSION_CHECK_SECONDS = 5
+_config_lock = threading.Lock()
+_config_cache = {'version': None, 'checked_at': 0.0, 'data': None}
+
+
+def _get_http_session():
+    """v8.4.7: Közös keep-alive HTTP session az email API hívásokhoz"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        session.mount('https://', adapter)
+        _http_session = session
+    return _http_session
+
 class NotificationService:
     """Központi értesítési szolgáltatás"""
     
+    # v8.4.6: Outbox feldolgozás beállításai
+    OUTBOX_BATCH_SIZE = 20
+    OUTBOX_MAX_ATTEMPTS = 6
+    OUTBOX_BACKOFF_BASE_SECONDS = 10  # 10s, 20s, 40s, ... (max. OUTBOX_BACKOFF_MAX_SECONDS)
+    OUTBOX_BACKOFF_MAX_SECONDS = 3600
+    OUTBOX_LOCK_TIMEOUT_SECONDS = 300  # Ennyi után egy 'processing' sor újra felvehető (összeomlott worker)
+    OUTBOX_POLL_INTERVAL_SECONDS = 5
+    
+    # v8.4.12: Megőrzés / törlés beállításai (TTL-ek az app config-ban)
+    RETENTION_BATCH_SIZE = 1000
+    RETENTION_BATCH_PAUSE_SECONDS = 0.1  # Kötegek között - a többi írás ne várjon sokat
+    RETENTION_INTERVAL_SECONDS = 3600  # Háttér feldolgozóban ennyi időnként fut
+    PARTITION_MONTHS_AHEAD = 3
+    
+    @staticmethod
+    def dispatch_mode():
+        """Kiküldési mód: thread / worker / inline"""
+        mode = os.environ.get('NOTIFICATION_DISPATCH_MODE', 'thread').lower()
+        return mode if mode in ('thread', 'worker', 'inline') else 'thread'
+    
     @staticmethod
     def notify_status_change(request, old_status, new_status):
         """
@@ -71,7 +246,10 @@ class NotificationService:
     @staticmethod
     def notify(event_key, request_id=None, event_data=None, specific_users=None):
         """
-        Értesítés küldése esemény alapján
+        Értesítés sorba állítása esemény alapján (v8.4.6)
+        
+        Az outbox sort a hívó session-jébe írja, NEM commit-ol: a hívó commit-ja
+        a státuszváltozással együtt menti. inline módban azonnal kiküld (dispatch).
         
         Args:
             event_key (str): Esemény kulcs (pl. 'status_change', 'new_request')
@@ -79,8 +257,50 @@ class NotificationService:
             event_data (dict): Esemény specifikus adatok
             specific_users (list): Konkrét user ID-k listája (felülírja a szabályokat)
         
+        Returns:
+            dict: inline módban statisztika (in_app_count, email_count), egyébként {'queued': True}
+        """
+        if NotificationService.dispatch_mode() == 'inline':
+            return NotificationService.dispatch(event_key, request_id, event_data, specific_users)
+        
+        # Late import - circular import elkerülése
+        from app import db
+        
+        db.session.execute(text("""
+            INSERT INTO notification_outbox
+            (event_key, request_id, event_data, specific_users, status, attempts, next_attempt_at, created_at)
+            VALUES (:event_key, :request_id, :event_data, :specific_users, 'pending', 0, :now, :now)
+        """), {
+            "event_key": event_key,
+            "request_id": request_id,
+            "event_data": json.dumps(event_data or {}),
+            "specific_users": json.dumps(list(specific_users)) if specific_users else None,
+            "now": datetime.utcnow()
+        })
+        # Commit után felébresztjük a feldolgozó szálat (ld. _on_session_commit)
+        db.session.info['notification_outbox_pending'] = True
+        
+        return {'queued': True}
+    
+    @staticmethod
+    def dispatch(event_key, request_id=None, event_data=None, specific_users=None, delivery=None):
+        """
+        Értesítés tényleges kiküldése esemény alapján (szabályok, in-app, email)
+        
+        v8.4.6: A feldolgozó hívja az outbox sorokra (inline módban a notify() közvetlenül).
+        
+        Sorrend: az in-app értesítések commit-ja után mennek ki az emailek. Outbox
+        soron (delivery) rögzítjük az in-app kiküldést és a már kiment email
+        címzetteket, így újrapróbáláskor egyik sem duplikálódik.
+        
+        Args:
+            delivery (dict): outbox feldolgozásnál {'outbox_id', 'in_app_delivered', 'emailed_user_ids'}
+        
         Returns:
             dict: Statisztika (in_app_count, email_count)
+        
+        Raises:
+            EmailDeliveryError: outbox feldolgozásnál, ha az emailek nem mentek ki (újrapróbálandó)
         """
         # Late import - circular import elkerülése
         from app import db, User, LabRequest
@@ -88,12 +308,8 @@ class NotificationService:
         if event_data is None:
             event_data = {}
         
-        # Event type lekérése
-        cursor = db.session.execute(
-            text("SELECT id, event_name FROM notification_event_types WHERE event_key = :key"),
-            {"key": event_key}
-        )
-        event_type = cursor.fetchone()
+        # Event type lekérése (v8.4.8: cache-ből)
+        event_type = NotificationService.get_config()['event_types'].get(event_key)
         
         if not event_type:
             current_app.logger.warning(f"Unknown event type: {event_key}")
@@ -101,6 +317,13 @@ class NotificationService:
         
         event_type_id, event_name = event_type
         
+        # A kérés azóta törölve (outbox feldolgozás) - az értesítés a nem létező kérésre
+        # mutatna (PostgreSQL-en FK hiba), ezért kihagyjuk; az outbox sor 'done' lesz
+        request = LabRequest.query.get(request_id) if request_id else None
+        if request_id and request is None:
+            current_app.logger.info(f"Notification skipped, request #{request_id} no longer exists ({event_key})")
+            return {'in_app_count': 0, 'email_count': 0}
+        
         # Specifikus userek vagy szabály alapján
         if specific_users:
             target_users = User.query.filter(User.id.in_(specific_users)).all()
@@ -115,32 +338,43 @@ class NotificationService:
         
         # Generate message
         # Ha van request_id és ez státusz-alapú event, akkor lekérjük a request adatait
-        if request_id and event_key.startswith('status_to_'):
+        if request and event_key.startswith('status_to_'):
             import os
-            request = LabRequest.query.get(request_id)
-            if request:
-                # Frontend URL environment variable-ból
-                frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
-                
-                # Felülírjuk az event_data-t a request aktuális adataival
-                event_data = {
-                    **event_data,  # Meglévő adatok megtartása
-                    'request_id': request.id,
-                    'request_number': request.request_number,
-                    'company_name': request.company.name if request.company else '',
-                    'requester_name': request.user.name if request.user else '',
-                    'new_status': request.status,
-                    # ✅ request_url dinamikus frontend URL-lel
-                    'request_url': f"{frontend_url}/requests?search={request.request_number}"
-                }
+            # Frontend URL environment variable-ból
+            frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+            
+            # Felülírjuk az event_data-t a request aktuális adataival
+            # A new_status a sorba állításkori érték: az outbox feldolgozásáig a kérés
+            # státusza már tovább változhatott
+            event_data = {
+                **event_data,  # Meglévő adatok megtartása
+                'request_id': request.id,
+                'request_number': request.request_number,
+                'company_name': request.company.name if request.company else '',
+                'requester_name': request.user.name if request.user else '',
+                'new_status': event_data.get('new_status') or request.status,
+                # ✅ request_url dinamikus frontend URL-lel
+                'request_url': f"{frontend_url}/requests?search={request.request_number}"
+            }
         
         message = NotificationService._generate_in_app_message(event_key, event_data)
         # ✅ Link URL szűrővel - navigál a kérések listára request_number szűrővel
         link_url = f"/requests?search={event_data.get('request_number', '')}" if request_id and event_data.get('request_number') else None
+        # v8.4.15: Tömeges létrehozás összesített értesítése - a napi kérésszám prefix-re szűr
+        if not request_id and event_data.get('request_number_prefix'):
+            link_url = f"/requests?search={event_data['request_number_prefix']}"
         
         # Create notifications
         stats = {'in_app_count': 0, 'email_count': 0}
         
+        # v8.4.7: Email címzettek sablononként gyűjtve - egy eseményre egy SMTP session / API hívás
+        email_recipients = {}
+        # v8.4.9: In-app címzettek - egyetlen többsoros INSERT az esemény végén
+        in_app_user_ids = []
+        
+        delivery = delivery or {}
+        emailed_user_ids = delivery.get('emailed_user_ids') or set()
+        
         for user in target_users:
             # Find user's applicable rule
             user_rule = next((r for r in rules if r['role'] == user.role), None)
@@ -148,24 +382,280 @@ class NotificationService:
             if not user_rule:
                 continue
             
-            # In-app notification
-            if user_rule.get('in_app_enabled'):
-                NotificationService._create_in_app_notification(
-                    user.id, event_type_id, message, link_url, request_id, event_data
-                )
+            # In-app notification (újrapróbáláskor már kiment)
+            if user_rule.get('in_app_enabled') and not delivery.get('in_app_delivered'):
+                in_app_user_ids.append(user.id)
                 stats['in_app_count'] += 1
             
             # Email notification
-            if user_rule.get('email_enabled') and user_rule.get('email_template_id'):
-                NotificationService._send_email_notification(
-                    user, event_data, user_rule['email_template_id']
-                )
+            if user_rule.get('email_enabled') and user_rule.get('email_template_id') \
+                    and user.id not in emailed_user_ids:
+                email_recipients.setdefault(user_rule['email_template_id'], []).append(user)
                 stats['email_count'] += 1
         
+        created = {}
+        if in_app_user_ids:
+            created = NotificationService._create_in_app_notifications(
+                in_app_user_ids, event_type_id, message, link_url, request_id, event_data
+            )
+        if delivery.get('outbox_id'):
+            db.session.execute(text("""
+                UPDATE notification_outbox SET in_app_delivered_at = :now
+                WHERE id = :id AND in_app_delivered_at IS NULL
+            """), {"id": delivery['outbox_id'], "now": datetime.utcnow()})
+        
+        # In-app értesítések (és az outbox jelölés) mentése az emailek előtt
         db.session.commit()
         
+        # v8.4.10: Push az SSE kapcsolatoknak (commit után - csak mentett értesítést küldünk)
+        if created:
+            NotificationService._publish('notification', {
+                'notification': {
+                    'message': message,
+                    'link_url': link_url,
+                    'is_read': False,
+                    'read_at': None,
+                    'created_at': datetime.utcnow().isoformat(),
+                    'event_key': event_key,
+                    'event_name': event_name,
+                    'event_data': event_data
+                }
+            }, {user_id: {'notification_id': notification_id} for user_id, notification_id in created.items()})
+        
+        if email_recipients:
+            try:
+                NotificationService._send_email_notifications(email_recipients, event_data)
+            except EmailDeliveryError as e:
+                if not delivery.get('outbox_id'):
+                    # Inline mód: nincs újrapróbálás, a hívó kérését nem buktatjuk el
+                    current_app.logger.error(f"Email notification failed ({event_key}): {str(e)}")
+                    return stats
+                # A már kiment címzettek mentése, hogy az újrapróbálás ne küldje újra
+                db.session.execute(text("""
+                    UPDATE notification_outbox SET emailed_user_ids = :emailed WHERE id = :id
+                """), {
+                    "id": delivery['outbox_id'],
+                    "emailed": json.dumps(sorted(emailed_user_ids | e.sent_user_ids))
+                })
+                db.session.commit()
+                raise
+        
         return stats
     
+    # ============================================
+    # v8.4.6: OUTBOX FELDOLGOZÁS
+    # ============================================
+    
+    @staticmethod
+    def process_outbox(batch_size=None):
+        """
+        Esedékes outbox sorok feldolgozása (app context-ben hívandó)
+        
+        Minden sort feltételes UPDATE-tel "foglalunk le" (status → processing), így
+        több párhuzamos feldolgozó sem küldi ki kétszer ugyanazt. Hiba esetén
+        exponenciális backoff-fal újrapróbáljuk, OUTBOX_MAX_ATTEMPTS után 'failed'.
+        
+        Returns:
+            int: feldolgozott (sikeres vagy sikertelen) sorok száma
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        
+        batch_size = batch_size or NotificationService.OUTBOX_BATCH_SIZE
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=NotificationService.OUTBOX_LOCK_TIMEOUT_SECONDS)
+        
+        candidate_ids = [row[0] for row in db.session.execute(text("""
+            SELECT id FROM notification_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= :now)
+               OR (status = 'processing' AND locked_at < :stale_before)
+            ORDER BY id
+            LIMIT :limit
+        """), {"now": now, "stale_before": stale_before, "limit": batch_size})]
+        
+        claimed = []
+        for outbox_id in candidate_ids:
+            result = db.session.execute(text("""
+                UPDATE notification_outbox SET status = 'processing', locked_at = :now
+                WHERE id = :id AND (
+                    (status = 'pending' AND next_attempt_at <= :now)
+                    OR (status = 'processing' AND locked_at < :stale_before)
+                )
+            """), {"id": outbox_id, "now": now, "stale_before": stale_before})
+            if result.rowcount == 1:
+                claimed.append(outbox_id)
+        db.session.commit()
+        
+        for outbox_id in claimed:
+            NotificationService._process_outbox_entry(outbox_id)
+        
+        return len(claimed)
+    
+    @staticmethod
+    def _process_outbox_entry(outbox_id):
+        """Egy lefoglalt outbox sor kiküldése + eredmény rögzítése"""
+        # Late import - circular import elkerülése
+        from app import db
+        
+        row = db.session.execute(text("""
+            SELECT event_key, request_id, event_data, specific_users, attempts,
+                   in_app_delivered_at, emailed_user_ids
+            FROM notification_outbox WHERE id = :id
+        """), {"id": outbox_id}).fetchone()
+        if not row:
+            return
+        
+        event_key, request_id, event_data, specific_users, attempts, in_app_delivered_at, emailed_user_ids = row
+        
+        try:
+            NotificationService.dispatch(
+                event_key,
+                request_id=request_id,
+                event_data=json.loads(event_data) if event_data else {},
+                specific_users=json.loads(specific_users) if specific_users else None,
+                delivery={
+                    'outbox_id': outbox_id,
+                    'in_app_delivered': in_app_delivered_at is not None,
+                    'emailed_user_ids': set(json.loads(emailed_user_ids)) if emailed_user_ids else set()
+                }
+            )
+            db.session.execute(text("""
+                UPDATE notification_outbox
+                SET status = 'done', attempts = :attempts, processed_at = :now, last_error = NULL
+                WHERE id = :id
+            """), {"id": outbox_id, "attempts": attempts + 1, "now": datetime.utcnow()})
+            db.session.commit()
+        
+        except Exception as e:
+            db.session.rollback()
+            attempts += 1
+            delay = min(
+                NotificationService.OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)),
+                NotificationService.OUTBOX_BACKOFF_MAX_SECONDS
+            )
+            status = 'failed' if attempts >= NotificationService.OUTBOX_MAX_ATTEMPTS else 'pending'
+            current_app.logger.error(
+                f"Notification outbox #{outbox_id} ({event_key}) attempt {attempts} failed: {str(e)}"
+            )
+            db.session.execute(text("""
+                UPDATE notification_outbox
+                SET status = :status, attempts = :attempts, next_attempt_at = :next_attempt_at,
+                    locked_at = NULL, last_error = :error
+                WHERE id = :id
+            """), {
+                "id": outbox_id,
+                "status": status,
+                "attempts": attempts,
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay),
+                "error": str(e)[:2000]
+            })
+            db.session.commit()
+    
+    @staticmethod
+    def run_worker(app, stop_event=None, once=False):
+        """
+        Outbox feldolgozó ciklus (háttér szál vagy notification_worker.py)
+        
+        Ha nincs esedékes sor, OUTBOX_POLL_INTERVAL_SECONDS-ig vár, vagy amíg
+        egy notify() utáni commit fel nem ébreszti.
+        """
+        global _last_retention_run, _last_analytics_run
+        
+        while not (stop_event and stop_event.is_set()):
+            processed = 0
+            with app.app_context():
+                try:
+                    processed = NotificationService.process_outbox()
+                except Exception as e:
+                    app.logger.error(f"Notification outbox worker error: {str(e)}")
+                    try:
+                        from app import db
+                        db.session.rollback()
+                    except Exception:
+                        pass
+                
+                # v8.4.12: Lejárt értesítések törlése óránként (ha nincs sürgős outbox munka)
+                if not once and not processed and \
+                        time.monotonic() - _last_retention_run >= NotificationService.RETENTION_INTERVAL_SECONDS:
+                    _last_retention_run = time.monotonic()
+                    try:
+                        stats = NotificationService.purge_expired_notifications()
+                        if stats['deleted']:
+                            app.logger.info(f"Notification retention: {stats['deleted']} rows purged")
+                    except Exception as e:
+                        app.logger.error(f"Notification retention error: {str(e)}")
+                        try:
+                            from app import db
+                            db.session.rollback()
+                        except Exception:
+                            pass
+                
+                # v8.4.24: Analitika ténytábla inkrementális frissítése (a /api/analytics csak olvas)
+                if not once and time.monotonic() - _last_analytics_run >= app.config['ANALYTICS_REFRESH_SECONDS']:
+                    _last_analytics_run = time.monotonic()
+                    NotificationService.refresh_analytics_facts()
+            
+            if once:
+                return processed
+            if not processed:
+                _worker_wake.wait(NotificationService.OUTBOX_POLL_INTERVAL_SECONDS)
+                _worker_wake.clear()
+    
+    @staticmethod
+    def refresh_analytics_facts():
+        """
+        v8.4.24: Analitika ténytábla inkrementális frissítése (háttér feldolgozó, app kontextusban)
+        
+        Returns:
+            dict vagy None: analytics.refresh_facts() statisztika, hiba esetén None
+        """
+        import analytics
+        from app import db
+        
+        try:
+            stats = analytics.refresh_facts()
+            db.session.commit()
+            return stats
+        except Exception as e:
+            # Hiba esetén a végpont a korábbi állapotból válaszol
+            db.session.rollback()
+            current_app.logger.error(f"Analytics fact refresh error: {str(e)}")
+            return None
+    
+    @staticmethod
+    def ensure_background_worker(app):
+        """
+        Feldolgozó szál indítása ebben a processzben (csak thread módban, egyszer)
+        
+        A PID-et is figyeljük: gunicorn --preload fork után a szülő szála nem él tovább.
+        """
+        global _worker_pid
+        
+        if _worker_pid == os.getpid() or NotificationService.dispatch_mode() != 'thread':
+            return
+        
+        with _worker_lock:
+            if _worker_pid == os.getpid():
+                return
+            
+            from sqlalchemy import event
+            from app import db
+            event.listen(db.session, 'after_commit', NotificationService._on_session_commit)
+            
+            thread = threading.Thread(
+                target=NotificationService.run_worker, args=(app,),
+                name='notification-outbox-worker', daemon=True
+            )
+            thread.start()
+            _worker_pid = os.getpid()
+            app.logger.info("Notification outbox worker thread started")
+    
+    @staticmethod
+    def _on_session_commit(session):
+        """Commit után: ha a tranzakcióban volt notify(), feldolgozó ébresztése"""
+        if session.info.pop('notification_outbox_pending', False):
+            _worker_wake.set()
+    
     @staticmethod
     def _determine_target_users(event_type_id, event_data, request_id):
         """Érintett userek meghatározása szabályok alapján"""
@@ -199,6 +689,18 @@ class NotificationService:
                             )
                         )
                     )
+        elif event_data.get('company_id'):
+            # v8.4.15: Több kérést összesítő esemény (nincs request_id) - cég az event_data-ból
+            company_roles = ['company_admin', 'company_user', 'company_logistics']
+            query = query.filter(
+                db.or_(
+                    User.role.notin_(company_roles),
+                    db.and_(
+                        User.role.in_(company_roles),
+                        User.company_id == event_data['company_id']
+                    )
+                )
+            )
         
         target_users = query.all()
         
@@ -206,30 +708,130 @@ class NotificationService:
     
     @staticmethod
     def _get_rules_for_event(event_type_id):
-        """Aktív szabályok lekérése eseményhez"""
+        """Aktív szabályok lekérése eseményhez (v8.4.8: cache-ből, prioritás szerint csökkenő)"""
+        return NotificationService.get_config()['rules'].get(event_type_id, [])
+    
+    # ============================================
+    # v8.4.8: KONFIGURÁCIÓ CACHE
+    # ============================================
+    
+    @staticmethod
+    def get_config():
+        """
+        Értesítési konfiguráció a cache-ből
+        
+        Legfeljebb CONFIG_VERSION_CHECK_SECONDS-onként egy olcsó verzió lekérdezés;
+        újratöltés csak ha a verzió változott (admin módosítás bármelyik worker-ben).
+        
+        Returns:
+            dict: event_types (key -> (id, name)), rules (event_type_id -> [rule]),
+                  templates (id -> (subject, body_html)), smtp (settings tuple vagy None)
+        """
+        now = time.monotonic()
+        
+        with _config_lock:
+            data = _config_cache['data']
+            if data is not None and now - _config_cache['checked_at'] < CONFIG_VERSION_CHECK_SECONDS:
+                return data
+        
+        version = NotificationService._read_config_version()
+        
+        with _config_lock:
+            if _config_cache['data'] is not None and _config_cache['version'] == version:
+                _config_cache['checked_at'] = now
+                return _config_cache['data']
+        
+        data = NotificationService._load_config()
+        
+        with _config_lock:
+            _config_cache.update({'version': version, 'checked_at': now, 'data': data})
+        return data
+    
+    @staticmethod
+    def _read_config_version():
         # Late import - circular import elkerülése
         from app import db
         
-        cursor = db.session.execute(text("""
-            SELECT role, event_filter, in_app_enabled, email_enabled, 
+        row = db.session.execute(text(
+            "SELECT version FROM config_version WHERE config_key = :key"
+        ), {"key": CONFIG_VERSION_KEY}).fetchone()
+        return row[0] if row else 0
+    
+    @staticmethod
+    def _load_config():
+        """Teljes konfiguráció betöltése (kis táblák, 4 lekérdezés)"""
+        # Late import - circular import elkerülése
+        from app import db
+        
+        event_types = {
+            row[0]: (row[1], row[2]) for row in
+            db.session.execute(text("SELECT event_key, id, event_name FROM notification_event_types"))
+        }
+        
+        rules = {}
+        for row in db.session.execute(text("""
+            SELECT event_type_id, role, event_filter, in_app_enabled, email_enabled,
                    email_template_id, priority
             FROM notification_rules
-            WHERE event_type_id = :event_id AND is_active = 1
+            WHERE is_active = 1
             ORDER BY priority DESC
-        """), {"event_id": event_type_id})
-        
-        rules = []
-        for row in cursor:
-            rules.append({
-                'role': row[0],
-                'event_filter': row[1],
-                'in_app_enabled': bool(row[2]),
-                'email_enabled': bool(row[3]),
-                'email_template_id': row[4],
-                'priority': row[5]
+        """)):
+            rules.setdefault(row[0], []).append({
+                'role': row[1],
+                'event_filter': row[2],
+                'in_app_enabled': bool(row[3]),
+                'email_enabled': bool(row[4]),
+                'email_template_id': row[5],
+                'priority': row[6]
             })
         
-        return rules
+        templates = {
+            row[0]: (row[1], row[2]) for row in
+            db.session.execute(text("SELECT id, subject, body_html FROM notification_templates"))
+        }
+        
+        # SMTP beállítások (most már smtp_api_key-vel!)
+        smtp = db.session.execute(text("""
+            SELECT smtp_host, smtp_port, smtp_username, smtp_password,
+                   from_email, from_name, use_tls, is_active, smtp_api_key
+            FROM smtp_settings
+            LIMIT 1
+        """)).fetchone()
+        
+        return {
+            'event_types': event_types,
+            'rules': rules,
+            'templates': templates,
+            'smtp': tuple(smtp) if smtp else None
+        }
+    
+    @staticmethod
+    def bump_config_version():
+        """
+        Konfiguráció verzió növelése - a hívó tranzakciójában (commit a hívónál)
+        
+        Minden admin módosítás után hívandó (szabály, sablon, event típus, SMTP).
+        A saját processz cache-ét azonnal, a többi worker-ét a következő
+        verzió ellenőrzéskor érvényteleníti.
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        
+        result = db.session.execute(text("""
+            UPDATE config_version SET version = version + 1, updated_at = :now WHERE config_key = :key
+        """), {"key": CONFIG_VERSION_KEY, "now": datetime.utcnow()})
+        if result.rowcount == 0:
+            db.session.execute(text("""
+                INSERT INTO config_version (config_key, version, updated_at) VALUES (:key, 1, :now)
+            """), {"key": CONFIG_VERSION_KEY, "now": datetime.utcnow()})
+        
+        NotificationService.invalidate_config_cache()
+    
+    @staticmethod
+    def invalidate_config_cache():
+        """Saját processz cache-ének eldobása (következő get_config() újratölt)"""
+        with _config_lock:
+            _config_cache.update({'version': None, 'checked_at': 0.0, 'data': None})
     
     @staticmethod
     def _generate_in_app_message(event_key, event_data):
@@ -251,6 +853,10 @@ class NotificationService:
             request_number = event_data.get('request_number', 'N/A')
             company_name = event_data.get('company_name', '')
             
+            # v8.4.15: Tömeges létrehozás - egy összesített üzenet
+            if event_data.get('request_count', 1) > 1:
+                request_number = f"{event_data['request_count']} kérés ({request_number})"
+            
             if company_name:
                 return f"{company_name} - {request_number}: {status_hu}"
             else:
@@ -281,36 +887,65 @@ class NotificationService:
                 return f"Esemény: {event_key}"
     
     @staticmethod
-    def _create_in_app_notification(user_id, event_type_id, message, link_url, request_id, event_data):
-        """In-app notification létrehozása"""
+    def _create_in_app_notifications(user_ids, event_type_id, message, link_url, request_id, event_data):
+        """
+        In-app notificationök létrehozása egy esemény összes címzettjének
+        
+        v8.4.9: Egyetlen executemany a Core insert()-tel - SQLAlchemy 2.x ezt
+        többsoros INSERT ... VALUES kötegekké alakítja (PostgreSQL-en is), így
+        a round trip-ek száma nem nő a címzettek számával. Az event_data JSON-t
+        eseményenként egyszer szerializáljuk.
+        
+        Returns:
+            dict: user_id -> új notification ID (v8.4.10: RETURNING, az SSE push-hoz)
+        """
         # Late import - circular import elkerülése
-        from app import db
+        from app import db, Notification
         
-        db.session.execute(text("""
-            INSERT INTO notifications 
-            (user_id, event_type_id, event_data, message, link_url, request_id)
-            VALUES (:p0, :p1, :p2, :p3, :p4, :p5)
-        """), {"p0": user_id, "p1": event_type_id, "p2": json.dumps(event_data), "p3": message, "p4": link_url, "p5": request_id})
+        if not user_ids:
+            return {}
+        
+        event_data_json = json.dumps(event_data)
+        now = datetime.utcnow()
+        table = Notification.__table__
+        
+        result = db.session.execute(table.insert().returning(
+            table.c.id, table.c.user_id, sort_by_parameter_order=True
+        ), [{
+            'user_id': user_id,
+            'event_type_id': event_type_id,
+            'event_data': event_data_json,
+            'message': message,
+            'link_url': link_url,
+            'request_id': request_id,
+            'is_read': 0,
+            'created_at': now
+        } for user_id in user_ids])
+        created = {user_id: notification_id for notification_id, user_id in result}
+        
+        # v8.4.11: Olvasatlan számlálók növelése ugyanebben a tranzakcióban
+        increments = {}
+        for user_id in user_ids:
+            increments[user_id] = increments.get(user_id, 0) + 1
+        NotificationService.adjust_unread_counters(increments)
+        
+        return created
     
     @staticmethod
-    def _send_email_notification(user, event_data, template_id):
-        """Email értesítés küldése (SMTP vagy API)"""
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        import requests
+    def _send_email_notifications(recipients_by_template, event_data):
+        """
+        Egy esemény összes email értesítésének kiküldése (SMTP vagy API)
         
-        # Late import - circular import elkerülése
-        from app import db
+        v8.4.7: SMTP beállítás és sablonok egyszer betöltve; SMTP esetén egyetlen
+        (pool-ból vett) kapcsolaton megy minden levél, API esetén egy bulk kérés.
         
-        # SMTP beállítások lekérése (most már smtp_api_key-vel!)
-        cursor = db.session.execute(text("""
-            SELECT smtp_host, smtp_port, smtp_username, smtp_password,
-                   from_email, from_name, use_tls, is_active, smtp_api_key
-            FROM smtp_settings
-            LIMIT 1
-        """))
-        smtp_settings = cursor.fetchone()
+        Args:
+            recipients_by_template (dict): email_template_id -> [User]
+            event_data (dict): sablon változók
+        """
+        # v8.4.8: SMTP beállítások és sablonok a konfiguráció cache-ből
+        config = NotificationService.get_config()
+        smtp_settings = config['smtp']
         
         if not smtp_settings or smtp_settings[7] != 1:  # is_active check
             current_app.logger.warning("SMTP not configured or inactive - email not sent")
@@ -318,93 +953,150 @@ class NotificationService:
         
         smtp_host, smtp_port, smtp_username, smtp_password, from_email, from_name, use_tls, is_active, smtp_api_key = smtp_settings
         
-        # Template lekérése
-        cursor = db.session.execute(text("""
-            SELECT subject, body_html FROM notification_templates WHERE id = :p0
-        """), {"p0": template_id})
-        template = cursor.fetchone()
+        templates = config['templates']
         
-        if not template:
-            return
-        
-        subject, body_html = template
-        
-        # Template renderelés
-        rendered_subject = NotificationService._render_template(subject, event_data)
-        rendered_body = NotificationService._render_template(body_html, event_data)
+        # Levelek összeállítása: (user, subject, body)
+        messages = []
+        for template_id, users in recipients_by_template.items():
+            if template_id not in templates:
+                continue
+            
+            subject, body_html = templates[template_id]
+            
+            # Template renderelés (sablononként egyszer - a változók eseményszintűek)
+            rendered_subject = NotificationService._render_template(subject, event_data)
+            rendered_body = NotificationService._render_template(body_html, event_data)
+            
+            for user in users:
+                # Email címzett ellenőrzés
+                if not user.email:
+                    current_app.logger.warning(f"User {user.id} has no email address")
+                    continue
+                messages.append((user, rendered_subject, rendered_body))
         
-        # Email címzett ellenőrzés
-        if not user.email:
-            current_app.logger.warning(f"User {user.id} has no email address")
+        if not messages:
             return
         
         # ✅ MailerSend API használata ha van API key
         if smtp_api_key:
+            NotificationService._send_via_mailersend(smtp_api_key, from_email, from_name, messages)
+        # ✅ Hagyományos SMTP használata ha nincs API key
+        else:
+            smtp_key = (smtp_host, smtp_port, smtp_username, smtp_password, bool(use_tls))
+            NotificationService._send_via_smtp(smtp_key, from_email, from_name, messages)
+    
+    @staticmethod
+    def _send_via_mailersend(api_key, from_email, from_name, messages):
+        """
+        v8.4.7: MailerSend bulk API - címzettenként külön levél, de egy HTTP kérésben
+        (a bulk endpoint max. MAILERSEND_BULK_LIMIT levelet fogad egyszerre)
+        """
+        import requests
+        
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        sent_user_ids = set()
+        for start in range(0, len(messages), MAILERSEND_BULK_LIMIT):
+            chunk = messages[start:start + MAILERSEND_BULK_LIMIT]
+            payload = [{
+                "from": {
+                    "email": from_email,
+                    "name": from_name
+                },
+                "to": [
+                    {
+                        "email": user.email,
+                        "name": user.name
+                    }
+                ],
+                "subject": subject,
+                "html": body
+            } for user, subject, body in chunk]
+            
             try:
-                # MailerSend API endpoint
-                url = "https://api.mailersend.com/v1/email"
-                
-                headers = {
-                    "Authorization": f"Bearer {smtp_api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "from": {
-                        "email": from_email,
-                        "name": from_name
-                    },
-                    "to": [
-                        {
-                            "email": user.email,
-                            "name": user.name
-                        }
-                    ],
-                    "subject": rendered_subject,
-                    "html": rendered_body
-                }
-                
-                response = requests.post(url, json=payload, headers=headers)
-                
-                if response.status_code == 202:
-                    current_app.logger.info(f"Email sent via MailerSend API to {user.email}: {rendered_subject}")
-                else:
-                    current_app.logger.error(f"MailerSend API error: {response.status_code} - {response.text}")
-                    
+                response = _get_http_session().post(
+                    MAILERSEND_BULK_URL, json=payload, headers=headers, timeout=30
+                )
             except requests.exceptions.RequestException as e:
                 current_app.logger.error(f"MailerSend API request error: {str(e)}")
-            except Exception as e:
-                current_app.logger.error(f"Error sending email via MailerSend: {str(e)}")
+                raise EmailDeliveryError(f"MailerSend API request error: {str(e)}", sent_user_ids)
+            
+            if response.status_code != 202:
+                current_app.logger.error(f"MailerSend API error: {response.status_code} - {response.text}")
+                raise EmailDeliveryError(f"MailerSend API error: {response.status_code}", sent_user_ids)
+            
+            sent_user_ids.update(user.id for user, _, _ in chunk)
+            current_app.logger.info(
+                f"{len(chunk)} email queued via MailerSend bulk API: "
+                f"{', '.join(user.email for user, _, _ in chunk)}"
+            )
+    
+    @staticmethod
+    def _send_via_smtp(smtp_key, from_email, from_name, messages):
+        """
+        v8.4.7: Minden levél egy pool-ból vett SMTP kapcsolaton
+        Ha a szerver menet közben bontja a kapcsolatot, egyszer újracsatlakozunk
+        és a maradék levelekkel folytatjuk.
         
-        # ✅ Hagyományos SMTP használata ha nincs API key
-        else:
+        Címzett-specifikus (végleges) hibánál a levelet kihagyjuk; kapcsolat /
+        szerver hibánál EmailDeliveryError (a már kiment címzettekkel).
+        """
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        
+        pending = list(messages)
+        sent_user_ids = set()
+        
+        for attempt in range(2):
             try:
-                # Email összeállítás
-                msg = MIMEMultipart('alternative')
-                msg['Subject'] = rendered_subject
-                msg['From'] = f"{from_name} <{from_email}>"
-                msg['To'] = user.email
-                
-                # ✅ UTF-8 charset for Hungarian characters
-                msg.attach(MIMEText(rendered_body, 'html', 'utf-8'))
-                
-                # SMTP kapcsolat és küldés
-                if use_tls:
-                    server = smtplib.SMTP(smtp_host, smtp_port)
-                    server.starttls()
-                else:
-                    server = smtplib.SMTP(smtp_host, smtp_port)
-                
-                server.login(smtp_username, smtp_password)
-                server.send_message(msg)
-                server.quit()
-                
-                current_app.logger.info(f"Email sent via SMTP to {user.email}: {rendered_subject}")
-                
+                with _smtp_pool.connection(smtp_key) as server:
+                    while pending:
+                        user, subject, body = pending[0]
+                        
+                        # Email összeállítás
+                        msg = MIMEMultipart('alternative')
+                        msg['Subject'] = subject
+                        msg['From'] = f"{from_name} <{from_email}>"
+                        msg['To'] = user.email
+                        
+                        # ✅ UTF-8 charset for Hungarian characters
+                        msg.attach(MIMEText(body, 'html', 'utf-8'))
+                        
+                        try:
+                            server.send_message(msg)
+                            current_app.logger.info(f"Email sent via SMTP to {user.email}: {subject}")
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                                smtplib.SMTPSenderRefused) as e:
+                            # Címzett-specifikus hiba - a kapcsolat használható marad, újraküldés nem segítene
+                            current_app.logger.error(f"SMTP error sending email to {user.email}: {str(e)}")
+                        sent_user_ids.add(user.id)
+                        pending.pop(0)
+                return
+            
+            except smtplib.SMTPServerDisconnected as e:
+                if attempt == 0:
+                    current_app.logger.warning(f"SMTP connection lost, reconnecting: {str(e)}")
+                    continue
+                error = e
             except smtplib.SMTPException as e:
-                current_app.logger.error(f"SMTP error sending email to {user.email}: {str(e)}")
+                # Auth / protokoll hiba - újracsatlakozás most nem segítene, az outbox később újrapróbálja
+                error = e
+                break
+            except OSError as e:
+                if attempt == 0:
+                    current_app.logger.warning(f"SMTP connection error, reconnecting: {str(e)}")
+                    continue
+                error = e
             except Exception as e:
-                current_app.logger.error(f"Error sending email via SMTP to {user.email}: {str(e)}")
+                error = e
+                break
+        
+        current_app.logger.error(f"SMTP error, {len(pending)} email not sent: {str(error)}")
+        raise EmailDeliveryError(f"SMTP error, {len(pending)} email not sent: {str(error)}", sent_user_ids)
     
     @staticmethod
     def _render_template(template, data):
@@ -419,18 +1111,120 @@ class NotificationService:
     # USER-FACING API METHODS
     # ============================================
     
+    @staticmethod
+    def _publish(event_type, data, users):
+        """
+        v8.4.10: Push üzenet a feliratkozott SSE kapcsolatoknak
+        Hibája nem akadályozhatja a kiküldést - a kliens újracsatlakozáskor újratölt.
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        from notification_pubsub import get_pubsub
+        
+        try:
+            get_pubsub(db.engine).publish(event_type, data, users)
+        except Exception as e:
+            current_app.logger.warning(f"Notification push failed: {str(e)}")
+    
+    @staticmethod
+    def _publish_unread_count(user_id):
+        """v8.4.10: Olvasatlan számláló push (más nyitott fülek / eszközök szinkronja)"""
+        NotificationService._publish('unread_count', {}, {
+            user_id: {'unread_count': NotificationService.get_unread_count(user_id)}
+        })
+    
+    # ============================================
+    # v8.4.11: OLVASATLAN SZÁMLÁLÓK
+    # ============================================
+    
+    @staticmethod
+    def adjust_unread_counters(deltas):
+        """
+        Olvasatlan számlálók módosítása a hívó tranzakciójában (commit a hívónál)
+        
+        Args:
+            deltas (dict): user_id -> változás (+n új olvasatlan, -n olvasott/törölt)
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        
+        increments = [{"user_id": u, "n": n} for u, n in deltas.items() if n > 0]
+        decrements = [{"user_id": u, "n": -n} for u, n in deltas.items() if n < 0]
+        
+        if increments:
+            # Upsert - PostgreSQL és SQLite (3.24+) is támogatja
+            db.session.execute(text("""
+                INSERT INTO notification_unread_counter (user_id, unread_count)
+                VALUES (:user_id, :n)
+                ON CONFLICT (user_id) DO UPDATE
+                SET unread_count = notification_unread_counter.unread_count + excluded.unread_count
+            """), increments)
+        
+        if decrements:
+            db.session.execute(text("""
+                UPDATE notification_unread_counter
+                SET unread_count = CASE WHEN unread_count > :n THEN unread_count - :n ELSE 0 END
+                WHERE user_id = :user_id
+            """), decrements)
+    
+    @staticmethod
+    def rebuild_unread_counters(dry_run=False):
+        """
+        Számlálók újraépítése a notifications táblából (reconciliation)
+        
+        Args:
+            dry_run (bool): csak összehasonlítás, írás nélkül
+        
+        Returns:
+            dict: user_id -> (régi érték, helyes érték) az eltérő felhasználókra
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        
+        current = dict(db.session.execute(text(
+            "SELECT user_id, unread_count FROM notification_unread_counter"
+        )).fetchall())
+        actual = dict(db.session.execute(text("""
+            SELECT user_id, COUNT(*) FROM notifications
+            WHERE is_read = 0
+            GROUP BY user_id
+        """)).fetchall())
+        
+        mismatches = {
+            user_id: (current.get(user_id, 0), actual.get(user_id, 0))
+            for user_id in set(current) | set(actual)
+            if current.get(user_id, 0) != actual.get(user_id, 0)
+        }
+        if dry_run:
+            return mismatches
+        
+        db.session.execute(text("DELETE FROM notification_unread_counter"))
+        db.session.execute(text("""
+            INSERT INTO notification_unread_counter (user_id, unread_count)
+            SELECT user_id, COUNT(*) FROM notifications
+            WHERE is_read = 0
+            GROUP BY user_id
+        """))
+        db.session.commit()
+        
+        return mismatches
+    
     @staticmethod
     def mark_as_read(notification_id, user_id):
         """Notification olvasottnak jelölése"""
         # Late import - circular import elkerülése
         from app import db
         
-        db.session.execute(text("""
+        # v8.4.11: Csak olvasatlanra - így a rowcount pontosan a számláló változása
+        result = db.session.execute(text("""
             UPDATE notifications 
             SET is_read = 1, read_at = CURRENT_TIMESTAMP
-            WHERE id = :p0 AND user_id = :p1
+            WHERE id = :p0 AND user_id = :p1 AND is_read = 0
         """), {"p0": notification_id, "p1": user_id})
+        if result.rowcount:
+            NotificationService.adjust_unread_counters({user_id: -result.rowcount})
         db.session.commit()
+        NotificationService._publish_unread_count(user_id)  # v8.4.10
     
     @staticmethod
     def mark_all_as_read(user_id):
@@ -438,12 +1232,17 @@ class NotificationService:
         # Late import - circular import elkerülése
         from app import db
         
-        db.session.execute(text("""
+        # v8.4.11: A számláló a ténylegesen olvasottá tett sorokkal csökken (nem nullázás),
+        # így a közben beszúrt értesítések nem vesznek el
+        result = db.session.execute(text("""
             UPDATE notifications 
             SET is_read = 1, read_at = CURRENT_TIMESTAMP
             WHERE user_id = :p0 AND is_read = 0
         """), {"p0": user_id})
+        if result.rowcount:
+            NotificationService.adjust_unread_counters({user_id: -result.rowcount})
         db.session.commit()
+        NotificationService._publish_unread_count(user_id)  # v8.4.10
     
     @staticmethod
     def delete_notification(notification_id, user_id):
@@ -451,11 +1250,19 @@ class NotificationService:
         # Late import - circular import elkerülése
         from app import db
         
-        db.session.execute(text("""
+        # v8.4.11: Olvasatlan törlése csökkenti a számlálót
+        was_unread = db.session.execute(text("""
+            SELECT 1 FROM notifications WHERE id = :p0 AND user_id = :p1 AND is_read = 0
+        """), {"p0": notification_id, "p1": user_id}).fetchone()
+        
+        result = db.session.execute(text("""
             DELETE FROM notifications 
             WHERE id = :p0 AND user_id = :p1
         """), {"p0": notification_id, "p1": user_id})
+        if was_unread and result.rowcount:
+            NotificationService.adjust_unread_counters({user_id: -1})
         db.session.commit()
+        NotificationService._publish_unread_count(user_id)  # v8.4.10
     
     @staticmethod
     def get_user_notifications(user_id, unread_only=False, limit=50):
@@ -499,12 +1306,250 @@ class NotificationService:
     
     @staticmethod
     def get_unread_count(user_id):
-        """Olvasatlan notificationök száma"""
+        """Olvasatlan notificationök száma (v8.4.11: számláló tábla, elsődleges kulcsos olvasás)"""
         # Late import - circular import elkerülése
         from app import db
         
         cursor = db.session.execute(text("""
-            SELECT COUNT(*) FROM notifications 
-            WHERE user_id = :p0 AND is_read = 0
+            SELECT unread_count FROM notification_unread_counter
+            WHERE user_id = :p0
         """), {"p0": user_id})
-        return cursor.fetchone()[0]
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    # ============================================
+    # v8.4.12: MEGŐRZÉS (RETENTION) ÉS ARCHIVÁLÁS
+    # ============================================
+    
+    @staticmethod
+    def retention_settings():
+        """
+        Megőrzési beállítások az app config-ból (0 = örökre megőrizzük)
+        
+        Returns:
+            dict: read_days, unread_days, archive
+        """
+        config = current_app.config
+        return {
+            'read_days': config.get('NOTIFICATION_RETENTION_READ_DAYS', 0),
+            'unread_days': config.get('NOTIFICATION_RETENTION_UNREAD_DAYS', 0),
+            'archive': config.get('NOTIFICATION_ARCHIVE_ENABLED', False)
+        }
+    
+    @staticmethod
+    def _retention_condition(read_days, unread_days, now):
+        """Lejárt értesítések WHERE feltétele + paraméterei (None, ha minden TTL ki van kapcsolva)"""
+        conditions, params = [], {}
+        if read_days:
+            conditions.append("(is_read = 1 AND COALESCE(read_at, created_at) < :read_cutoff)")
+            params['read_cutoff'] = now - timedelta(days=read_days)
+        if unread_days:
+            conditions.append("(is_read = 0 AND created_at < :unread_cutoff)")
+            params['unread_cutoff'] = now - timedelta(days=unread_days)
+        if not conditions:
+            return None, params
+        return '(' + ' OR '.join(conditions) + ')', params
+    
+    @staticmethod
+    def purge_expired_notifications(read_days=None, unread_days=None, archive=None,
+                                    batch_size=None, max_batches=None, pause_seconds=None):
+        """
+        Lejárt értesítések törlése kis kötegekben
+        
+        Minden köteg külön tranzakció (rövid zárak): DELETE ... RETURNING, a törölt
+        sorok igény szerint a notifications_archive táblába kerülnek, az olvasatlan
+        számlálók ugyanabban a tranzakcióban csökkennek. Particionált PostgreSQL
+        táblánál a teljesen lejárt havi partíciókat előbb egészben eldobjuk.
+        
+        Returns:
+            dict: deleted, archived, batches, dropped_partitions
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        
+        settings = NotificationService.retention_settings()
+        read_days = settings['read_days'] if read_days is None else read_days
+        unread_days = settings['unread_days'] if unread_days is None else unread_days
+        archive = settings['archive'] if archive is None else archive
+        batch_size = batch_size or NotificationService.RETENTION_BATCH_SIZE
+        pause_seconds = NotificationService.RETENTION_BATCH_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+        
+        stats = {'deleted': 0, 'archived': 0, 'batches': 0, 'dropped_partitions': []}
+        
+        condition, params = NotificationService._retention_condition(read_days, unread_days, datetime.utcnow())
+        if condition is None:
+            return stats
+        
+        if NotificationService.is_partitioned():
+            NotificationService.ensure_partitions()
+            dropped = NotificationService._drop_expired_partitions(condition, params, archive)
+            stats['dropped_partitions'] = [name for name, _ in dropped]
+            stats['deleted'] += sum(count for _, count in dropped)
+            if archive:
+                stats['archived'] += sum(count for _, count in dropped)
+        
+        while max_batches is None or stats['batches'] < max_batches:
+            rows = db.session.execute(text(f"""
+                DELETE FROM notifications WHERE id IN (
+                    SELECT id FROM notifications WHERE {condition} LIMIT :batch_size
+                )
+                RETURNING id, user_id, event_type_id, event_data, message, link_url,
+                          request_id, is_read, read_at, created_at
+            """), {**params, 'batch_size': batch_size}).mappings().all()
+            
+            if not rows:
+                db.session.rollback()
+                break
+            
+            # Párhuzamos futásnál csak a ténylegesen törölt sorok számítanak (RETURNING)
+            NotificationService._after_purge(rows, archive)
+            db.session.commit()
+            
+            stats['batches'] += 1
+            stats['deleted'] += len(rows)
+            if archive:
+                stats['archived'] += len(rows)
+            
+            if len(rows) < batch_size:
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds)
+        
+        return stats
+    
+    @staticmethod
+    def _after_purge(rows, archive):
+        """Törölt sorok archiválása és az olvasatlan számlálók csökkentése (hívó tranzakciójában)"""
+        # Late import - circular import elkerülése
+        from app import db
+        
+        if archive and rows:
+            archived_at = datetime.utcnow()
+            db.session.execute(text("""
+                INSERT INTO notifications_archive
+                (id, user_id, event_type_id, event_data, message, link_url, request_id,
+                 is_read, read_at, created_at, archived_at)
+                VALUES (:id, :user_id, :event_type_id, :event_data, :message, :link_url, :request_id,
+                        :is_read, :read_at, :created_at, :archived_at)
+            """), [{**row, 'archived_at': archived_at} for row in rows])
+        
+        decrements = {}
+        for row in rows:
+            if not row['is_read']:
+                decrements[row['user_id']] = decrements.get(row['user_id'], 0) - 1
+        NotificationService.adjust_unread_counters(decrements)
+    
+    # ============================================
+    # v8.4.12: POSTGRESQL HAVI PARTÍCIÓK
+    # ============================================
+    # A particionált táblát a scripts/partition_notifications.py hozza létre;
+    # partíciók: notifications_pYYYYMM (created_at szerint) + notifications_pdefault
+    
+    @staticmethod
+    def is_partitioned():
+        """A notifications tábla particionált-e (csak PostgreSQL)"""
+        # Late import - circular import elkerülése
+        from app import db
+        
+        if db.engine.dialect.name != 'postgresql':
+            return False
+        return db.session.execute(text("""
+            SELECT 1 FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = 'notifications' AND pg_table_is_visible(c.oid)
+        """)).fetchone() is not None
+    
+    @staticmethod
+    def partition_name(month_start):
+        return f"notifications_p{month_start:%Y%m}"
+    
+    @staticmethod
+    def _month_start(value, offset=0):
+        """A hónap első napja, offset hónappal eltolva"""
+        month_index = value.year * 12 + value.month - 1 + offset
+        return datetime(month_index // 12, month_index % 12 + 1, 1)
+    
+    @staticmethod
+    def ensure_partitions(months_ahead=None):
+        """Havi partíciók létrehozása a mostani hónaptól months_ahead hónapig előre"""
+        # Late import - circular import elkerülése
+        from app import db
+        
+        months_ahead = NotificationService.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        now = datetime.utcnow()
+        created = []
+        for offset in range(months_ahead + 1):
+            start = NotificationService._month_start(now, offset)
+            end = NotificationService._month_start(now, offset + 1)
+            name = NotificationService.partition_name(start)
+            exists = db.session.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar()
+            if exists:
+                continue
+            db.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF notifications "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            ))
+            created.append(name)
+        db.session.commit()
+        return created
+    
+    @staticmethod
+    def _drop_expired_partitions(condition, params, archive):
+        """
+        Azok a havi partíciók, amelyekben már csak lejárt sor van, egészben eldobhatók
+        (DETACH + DROP - nincs soronkénti DELETE és VACUUM teher)
+        
+        Returns:
+            list: [(partíció név, törölt sorok száma)]
+        """
+        # Late import - circular import elkerülése
+        from app import db
+        
+        partitions = db.session.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'notifications' AND c.relname ~ '^notifications_p[0-9]{6}$'
+            ORDER BY c.relname
+        """)).scalars().all()
+        
+        dropped = []
+        for name in NotificationService._past_partitions(partitions, datetime.utcnow()):
+            # Van-e még megőrzendő sor a partícióban?
+            keep = db.session.execute(text(
+                f"SELECT 1 FROM {name} WHERE NOT COALESCE({condition}, FALSE) LIMIT 1"
+            ), params).fetchone()
+            if keep:
+                continue
+            
+            count = db.session.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+            if archive:
+                db.session.execute(text(f"""
+                    INSERT INTO notifications_archive
+                    (id, user_id, event_type_id, event_data, message, link_url, request_id,
+                     is_read, read_at, created_at, archived_at)
+                    SELECT id, user_id, event_type_id, event_data, message, link_url, request_id,
+                           is_read, read_at, created_at, :archived_at
+                    FROM {name}
+                """), {'archived_at': datetime.utcnow()})
+            unread = db.session.execute(text(
+                f"SELECT user_id, COUNT(*) FROM {name} WHERE is_read = 0 GROUP BY user_id"
+            )).fetchall()
+            NotificationService.adjust_unread_counters({user_id: -n for user_id, n in unread})
+            
+            db.session.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+            db.session.execute(text(f"DROP TABLE {name}"))
+            db.session.commit()
+            dropped.append((name, count))
+            current_app.logger.info(f"Notification partition dropped: {name} ({count} rows)")
+        
+        return dropped
+    
+    @staticmethod
+    def _past_partitions(names, now):
+        """A havi partíciók közül a mostani hónap előttiek, időrendben (csak ezek dobhatók el)"""
+        current_month = NotificationService._month_start(now)
+        return [
+            name for name in sorted(names)
+            if datetime.strptime(name[-6:], '%Y%m') < current_month
+        ]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Notification outbox worker - v8.4.6
+====================================
+
+Külön processzben dolgozza fel a notification_outbox táblát (szabályok,
+in-app értesítések, email kiküldés), újrapróbálással és backoff-fal.
+
+Használat:
+    # Web processz csak sorba állít:
+    NOTIFICATION_DISPATCH_MODE=worker gunicorn app:app ...
+
+    # Worker (ugyanazzal a DATABASE_URL-lel):
+    python notification_worker.py          # folyamatos futás
+    python notification_worker.py --once   # egy kör (pl. cron)
+    python notification_worker.py --purge  # v8.4.12: lejárt értesítések törlése (pl. cron)
+
+A folyamatos futás óránként a lejárt értesítéseket is törli
+(NOTIFICATION_RETENTION_READ_DAYS / NOTIFICATION_RETENTION_UNREAD_DAYS, alapból 0 = nincs törlés).
+v8.4.24: ANALYTICS_REFRESH_SECONDS másodpercenként az analitika ténytáblát is frissíti.
+"""
+
+import argparse
+import signal
+import threading
+
+from app import app
+from notification_service import NotificationService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Notification outbox worker')
+    parser.add_argument('--once', action='store_true', help='Egy feldolgozási kör, majd kilépés')
+    parser.add_argument('--purge', action='store_true', help='Lejárt értesítések törlése, majd kilépés')
+    args = parser.parse_args()
+
+    if args.purge:
+        with app.app_context():
+            stats = NotificationService.purge_expired_notifications()
+        print(f"✅ {stats['deleted']} értesítés törölve ({stats['batches']} köteg, "
+              f"{stats['archived']} archiválva, {len(stats['dropped_partitions'])} partíció eldobva)")
+        return
+
+    if args.once:
+        processed = NotificationService.run_worker(app, once=True)
+        print(f"✅ {processed} outbox sor feldolgozva")
+        return
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print("\n🛑 Leállítás...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    print("📬 Notification outbox worker elindult (Ctrl+C a leállításhoz)")
+    NotificationService.run_worker(app, stop_event=stop_event)
+
+
+if __name__ == '__main__':
+    main()
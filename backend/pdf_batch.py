@@ -0,0 +1,126 @@
+"""
+Kötegelt PDF export - v8.4.18
+=============================
+
+Sok kérés átadás-átvételi jegyzőkönyve / kérés PDF-je egy válaszban:
+
+- ZIP: a dokumentumokat a render pool (pdf_service) készíti, egyszerre
+  legfeljebb `window` darab van folyamatban, a ZIP menet közben készül és
+  darabonként megy ki - egyszerre csak néhány PDF van a memóriában. A
+  pdf_cache-ben meglévő dokumentumokat nem rendereljük újra, az újakat elmentjük.
+- Egyesített PDF: egy pool processz egyetlen reportlab dokumentumba rendereli
+  (pdf_rendering.render_merged_pdf) egy ideiglenes fájlba, amit blokkonként
+  streamelünk, majd törlünk.
+
+A pool processzek csak a pdf_rendering függvényeit futtatják, adatbázist
+nem érnek el - a snapshot-okat a kérés kezelő állítja elő.
+"""
+
+import os
+import tempfile
+import zipfile
+from collections import deque
+
+import pdf_rendering
+import pdf_service
+from streaming_export import ZipStream  # v8.4.21: közös nem seekelhető ZIP cél
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def render_documents(kind, items, cache, window, timeout):
+    """
+    Dokumentumok renderelése sorrendtartóan, korlátozott számú futó feladattal
+
+    Args:
+        kind (str): 'request' vagy 'handover'
+        items (iterable): (fájlnév, snapshot, cache kulcs) hármasok
+        cache (PdfCache): találatkor nincs renderelés, új PDF-et elmentjük
+        timeout (float): dokumentumonkénti időkorlát (és ennyit várunk szabad helyre a sorban)
+
+    Yields:
+        (fájlnév, PDF bájtok)
+    """
+    render = pdf_service.RENDERERS[kind]
+    pending = deque()
+    items = iter(items)
+
+    def fill():
+        while len(pending) < window:
+            item = next(items, None)
+            if item is None:
+                return
+            name, snapshot, key = item
+            data = cache.get(key)
+            if data is None:
+                data = pdf_service.submit(render, snapshot, wait=timeout)
+            pending.append((name, key, data))
+
+    try:
+        fill()
+        while pending:
+            name, key, job = pending.popleft()
+            if isinstance(job, bytes):
+                data = job
+            else:
+                data = pdf_service.result(job, timeout)
+                cache.put(key, data)
+            fill()
+            yield name, data
+    finally:
+        # Megszakított letöltésnél a még el nem indult feladatokat eldobjuk
+        for _, _, job in pending:
+            if not isinstance(job, bytes):
+                job.cancel()
+
+
+def stream_zip(files):
+    """
+    ZIP menet közbeni előállítása
+
+    Args:
+        files (iterable): (fájlnév, bájtok) párok
+
+    Yields:
+        bytes: a ZIP következő darabja
+    """
+    stream = ZipStream()
+    # A PDF már tömörített - ZIP_STORED, felesleges CPU nélkül
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield stream.drain()
+    yield stream.drain()  # Központi könyvtár
+
+
+def _render_merged_file(kind, snapshots):
+    """Pool processzben fut: egyesített PDF ideiglenes fájlba, visszatérés: útvonal"""
+    fd, path = tempfile.mkstemp(prefix='batch_', suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            pdf_rendering.render_merged_pdf(kind, snapshots, output)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+def render_merged(kind, snapshots, timeout):
+    """Egyesített PDF renderelése a poolban; visszatérés: ideiglenes fájl útvonala"""
+    return pdf_service.run(_render_merged_file, kind, snapshots, timeout=timeout, wait=timeout)
+
+
+def stream_file(path):
+    """Fájl blokkonkénti kiküldése, a végén (megszakításkor is) törlés"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,128 @@
+"""
+Generált PDF-ek lemezes cache-e - v8.4.17
+=========================================
+
+A kulcs a renderelés teljes bemenetének hash-e (dokumentum típus, snapshot,
+a kérés updated_at-je, pdf_rendering.TEMPLATE_VERSION), így elavult PDF-et
+nem kell érvényteleníteni: változáskor egyszerűen új kulcs keletkezik.
+A kulcs egyben az ETag is (If-None-Match → 304).
+
+Fájlok: <PDF_CACHE_FOLDER>/<kulcs első 2 karaktere>/<kulcs>.pdf
+Méretkorlát: PDF_CACHE_MAX_BYTES - túllépéskor a legrégebben használt
+(mtime, találatkor frissítjük) fájlok törlődnek.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pdf_rendering
+
+
+def cache_key(kind, snapshot, updated_at=None):
+    """Tartalom alapú kulcs (sha256 hex) a renderelés bemenetéből"""
+    payload = json.dumps({
+        'kind': kind,
+        'template_version': pdf_rendering.TEMPLATE_VERSION,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'data': snapshot
+    }, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PdfCache:
+    """LRU méretkorlátos lemezes cache (processzek között is megosztható könyvtár)"""
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Becsült összméret - első használatkor könyvtár bejárással
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.pdf")
+
+    def get(self, key):
+        """Cache-elt PDF bájtjai, vagy None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # LRU: utolsó használat
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """PDF mentése (atomikus csere - párhuzamos olvasó sosem lát félkész fájlt)"""
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Legrégebben használt fájlok törlése a korlát 90%-áig (hogy ne takarítsunk minden put-nál)"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._size = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._size = 0
@@ -0,0 +1,452 @@
+"""
+PDF renderelés - v8.4.16
+========================
+
+A kérés PDF (/api/requests/<id>/pdf) és az átadás-átvételi jegyzőkönyv
+(/api/requests/<id>/handover-pdf) közös layout modulja.
+
+- A fontokat processzenként egyszer, importáláskor regisztráljuk (korábban
+  minden letöltésnél újra beolvastuk a DejaVu TTF fájlokat).
+- A bekezdés- és táblázatstílusok modul szintű konstansok.
+- A render függvények egyszerű adatot (dict snapshot) kapnak, nem ORM
+  objektumot - a snapshot-ot az app.py build_request_pdf_snapshot() állítja elő.
+"""
+
+import os
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
+
+from qr_cache import QrImageCache
+
+# v8.4.17: Layout változtatáskor növelendő - a pdf_cache kulcs része, így a régi PDF-ek nem jönnek vissza
+TEMPLATE_VERSION = 1
+
+# UTF-8 fontok a magyar ékezetekhez - az első létező pár nyer
+FONT_PATHS = [
+    # Linux paths
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    # Ubuntu/Debian alternative
+    ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
+    # FreeSans (wide Unicode support)
+    ('/usr/share/fonts/truetype/freefont/FreeSans.ttf', '/usr/share/fonts/truetype/freefont/FreeSansBold.ttf'),
+    # Liberation Sans
+    ('/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf', '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf'),
+]
+
+
+def register_fonts():
+    """
+    Fontok regisztrálása (processzenként egyszer)
+
+    Returns:
+        (alap font név, félkövér font név) - Helvetica, ha nincs UTF-8 font
+    """
+    registered = pdfmetrics.getRegisteredFontNames()
+    if 'CustomFont' in registered and 'CustomFont-Bold' in registered:
+        return 'CustomFont', 'CustomFont-Bold'
+
+    for regular_path, bold_path in FONT_PATHS:
+        try:
+            if os.path.exists(regular_path) and os.path.exists(bold_path):
+                pdfmetrics.registerFont(TTFont('CustomFont', regular_path))
+                pdfmetrics.registerFont(TTFont('CustomFont-Bold', bold_path))
+                print(f"✅ PDF font registered: {regular_path}")
+                return 'CustomFont', 'CustomFont-Bold'
+        except Exception as e:
+            print(f"⚠️ Font registration failed for {regular_path}: {e}")
+
+    print("⚠️ Using Helvetica fallback (no UTF-8 support)")
+    return 'Helvetica', 'Helvetica-Bold'
+
+
+FONT, FONT_BOLD = register_fonts()
+
+# ============================================
+# STÍLUSOK
+# ============================================
+
+_base = getSampleStyleSheet()
+
+# Kérés PDF
+REQUEST_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle', parent=_base['Heading1'], fontSize=24, textColor=colors.HexColor('#4F46E5'),
+    spaceAfter=30, alignment=TA_CENTER, fontName=FONT_BOLD
+)
+REQUEST_ID_STYLE = ParagraphStyle('IDStyle', parent=_base['Normal'], fontSize=14, spaceAfter=20, fontName=FONT)
+REQUEST_HEADING_STYLE = ParagraphStyle('Heading', parent=_base['Heading2'], fontName=FONT_BOLD)
+REQUEST_TOTAL_STYLE = ParagraphStyle('Total', parent=_base['Normal'], fontSize=14, alignment=TA_LEFT, fontName=FONT_BOLD)
+REQUEST_INSTRUCTION_STYLE = ParagraphStyle('Instruction', parent=_base['Normal'], fontName=FONT)
+
+# Eredmények (completed kérés PDF)
+RESULTS_TITLE_STYLE = ParagraphStyle(
+    'ResultsTitle', parent=_base['Heading1'], fontSize=20, textColor=colors.HexColor('#059669'),
+    spaceAfter=20, alignment=TA_CENTER, fontName=FONT_BOLD
+)
+RESULT_LINK_STYLE = ParagraphStyle(
+    'AttachmentLink', parent=_base['Normal'], fontName=FONT, fontSize=10,
+    textColor=colors.HexColor('#2563EB'), underline=True
+)
+RESULT_TEST_NAME_STYLE = ParagraphStyle(
+    'TestName', parent=_base['Heading2'], fontSize=14, textColor=colors.HexColor('#4F46E5'),
+    spaceAfter=10, fontName=FONT_BOLD
+)
+NO_RESULT_STYLE = ParagraphStyle('NoResult', parent=_base['Normal'], fontSize=12, textColor=colors.grey, fontName=FONT)
+
+# Átadás-átvételi jegyzőkönyv
+HANDOVER_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle', parent=_base['Heading1'], fontSize=18, textColor=colors.HexColor('#4F46E5'),
+    spaceAfter=15, alignment=TA_CENTER, fontName=FONT_BOLD
+)
+HANDOVER_ID_STYLE = ParagraphStyle('IDStyle', parent=_base['Normal'], fontSize=13, fontName=FONT)
+HANDOVER_INTERNAL_ID_STYLE = ParagraphStyle('IDStyle2', parent=_base['Normal'], fontSize=11, spaceAfter=12, fontName=FONT)
+HANDOVER_HEADING_STYLE = ParagraphStyle('Heading', parent=_base['Heading2'], fontSize=13, fontName=FONT_BOLD)
+HANDOVER_TOTAL_STYLE = ParagraphStyle('Total', parent=_base['Normal'], fontSize=13, alignment=TA_LEFT, fontName=FONT_BOLD)
+HANDOVER_INSTRUCTION_STYLE = ParagraphStyle('Instruction', parent=_base['Normal'], fontSize=10, fontName=FONT)
+HANDOVER_ORDER_STYLE = ParagraphStyle(
+    'Order', parent=_base['Normal'], fontSize=12, alignment=TA_CENTER, fontName=FONT_BOLD, spaceAfter=25
+)
+HANDOVER_NOTE_STYLE = ParagraphStyle(
+    'Italic', parent=_base['Normal'], fontSize=9, alignment=TA_CENTER, fontName=FONT,
+    textColor=colors.grey, leading=12
+)
+
+# Táblázatok
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F3F4F6')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), FONT_BOLD),
+    ('FONTNAME', (1, 0), (1, -1), FONT),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+
+
+def _test_table_style(header_font_size):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), FONT_BOLD),
+        ('FONTNAME', (0, 1), (-1, -1), FONT),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+    ])
+
+
+REQUEST_TEST_TABLE_STYLE = _test_table_style(11)
+HANDOVER_TEST_TABLE_STYLE = _test_table_style(10)
+
+RESULT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0FDF4')),  # Világos zöld
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # v7.0.9: Top align (link miatt)
+    ('FONTNAME', (0, 0), (0, -1), FONT_BOLD),
+    ('FONTNAME', (1, 0), (1, -1), FONT),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#D1FAE5'))  # Zöld border
+])
+
+HANDOVER_HEADER_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, 0), FONT_BOLD),
+    ('FONTNAME', (1, 0), (1, 0), FONT),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 2), 6),
+    ('FONTNAME', (0, 2), (-1, 2), FONT_BOLD),
+])
+
+# ============================================
+# LAYOUT
+# ============================================
+
+
+def _info_rows(data):
+    """Kérés alapadatai (mindkét dokumentumban azonos)"""
+    logistics_text = 'Feladó gondoskodik' if data['logistics_type'] == 'sender' else 'Szolgáltató szállít'
+    rows = [
+        ['Feladó:', data['user_name']],
+        ['Cég:', data['company_name'] or '-'],
+        ['Kategória:', data['category_name'] or '-'],
+        ['Mintavétel helye:', data['sampling_location'] or '-'],
+        ['Mintavétel időpontja:', data['sampling_time'] or '-'],
+        ['Határidő:', data['deadline'] or '-'],
+        ['Minta leírása:', data['sample_description'] or '-'],
+        ['Logisztika:', logistics_text],
+        ['Kontakt:', f"{data['contact_person'] or '-'} ({data['contact_phone'] or '-'})"],
+    ]
+    if data['logistics_type'] == 'provider' and data['shipping_address']:
+        rows.append(['Szállítási cím:', data['shipping_address']])
+    return rows
+
+
+def _test_rows(data):
+    rows = [['Vizsgálat neve', 'Szervezeti egység', 'Átfutás (nap)', 'Ár (Ft)']]
+    for tt in data['test_types']:
+        rows.append([
+            tt['name'],
+            tt.get('department_name', '-'),
+            str(tt.get('turnaround_days', '-')),
+            f"{tt['price']:,.0f}"
+        ])
+    return rows
+
+
+def _build(elements, **doc_options):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, **doc_options)
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+# v8.4.20: QR PNG cache (memória LRU + lemez) - a mappát az app állítja be
+qr_images = QrImageCache()
+
+
+def qr_png(payload, box_size=10, border=2):
+    """QR kód PNG bájtokként (cache-ből)"""
+    return qr_images.get(payload, box_size, border)
+
+
+def request_elements(data):
+    """Laborkérés flowable-jei (egy dokumentum, összefűzéshez is)"""
+    elements = [Paragraph('LABORKÉRÉS', REQUEST_TITLE_STYLE), Spacer(1, 0.5*cm)]
+
+    # v6.7: Kérés azonosító
+    elements.append(Paragraph(f'<b>Kérés azonosító:</b> {data["request_number"]}', REQUEST_ID_STYLE))
+    if data['internal_id']:
+        elements.append(Paragraph(f'<b>Céges belső azonosító:</b> {data["internal_id"]}', REQUEST_ID_STYLE))
+    elements.append(Spacer(1, 0.3*cm))
+
+    table = Table(_info_rows(data), colWidths=[5*cm, 12*cm])
+    table.setStyle(INFO_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 0.5*cm))
+
+    elements.append(Paragraph('<b>Kért vizsgálatok:</b>', REQUEST_HEADING_STYLE))
+    elements.append(Spacer(1, 0.2*cm))
+    test_table = Table(_test_rows(data), colWidths=[7*cm, 4*cm, 3*cm, 3*cm])
+    test_table.setStyle(REQUEST_TEST_TABLE_STYLE)
+    elements.append(test_table)
+    elements.append(Spacer(1, 0.3*cm))
+
+    elements.append(Paragraph(f'<b>Összköltség: {data["total_price"]:,.0f} Ft</b>', REQUEST_TOTAL_STYLE))
+
+    if data['special_instructions']:
+        elements.append(Spacer(1, 0.5*cm))
+        elements.append(Paragraph('<b>Különleges kezelési utasítások:</b>', REQUEST_HEADING_STYLE))
+        elements.append(Paragraph(data['special_instructions'], REQUEST_INSTRUCTION_STYLE))
+
+    # v7.0.7: Eredmények szekció - csak completed kéréseknél
+    if data.get('results') is not None:
+        elements.append(PageBreak())  # Új oldal az eredményeknek
+        elements.append(Paragraph('VIZSGÁLATI EREDMÉNYEK', RESULTS_TITLE_STYLE))
+        elements.append(Spacer(1, 0.5*cm))
+
+        for idx, result in enumerate(data['results'], 1):
+            elements.append(Paragraph(f'{idx}. {result["test_type_name"]}', RESULT_TEST_NAME_STYLE))
+
+            result_rows = [['Eredmény:', result['result_text'] or '-']]
+            # v7.0.10: Kattintható melléklet link token-nel
+            if result['attachment_filename']:
+                result_rows.append(['Melléklet:', Paragraph(
+                    f'<a href="{result["attachment_url"]}" color="blue"><u>{result["attachment_filename"]}</u></a>',
+                    RESULT_LINK_STYLE
+                )])
+            result_rows.append(['Kitöltötte:', f"{result['completed_by'] or '-'} • {result['completed_at'] or '-'}"])
+            if result['validated_by']:
+                result_rows.append(['Validálta:', f"{result['validated_by']} • {result['validated_at'] or '-'}"])
+
+            result_table = Table(result_rows, colWidths=[4*cm, 13*cm])
+            result_table.setStyle(RESULT_TABLE_STYLE)
+            elements.append(result_table)
+            elements.append(Spacer(1, 0.4*cm))
+
+        if not data['results']:
+            elements.append(Paragraph('Nincs rögzített eredmény.', NO_RESULT_STYLE))
+
+    return elements
+
+
+def render_request_pdf(data):
+    """
+    Laborkérés PDF (completed kérésnél az eredmények oldallal)
+
+    Args:
+        data (dict): build_request_pdf_snapshot() kimenete; 'results' csak completed kérésnél
+
+    Returns:
+        bytes: PDF
+    """
+    return _build(request_elements(data))
+
+
+def handover_elements(data, qr_image_png):
+    """Átadás-átvételi jegyzőkönyv flowable-jei (egy dokumentum, összefűzéshez is)"""
+    elements = [Paragraph('MINTA ÁTADÁS-ÁTVÉTELI JEGYZŐKÖNYV', HANDOVER_TITLE_STYLE), Spacer(1, 0.3*cm)]
+
+    # Fejléc QR kóddal
+    qr_image = Image(BytesIO(qr_image_png), width=3.5*cm, height=3.5*cm)
+    id_para = Paragraph(f'<b>Kérés azonosító:</b> {data["request_number"]}', HANDOVER_ID_STYLE)
+    header_table = Table([[id_para, qr_image]], colWidths=[13*cm, 4*cm])
+    header_table.setStyle(HANDOVER_HEADER_TABLE_STYLE)
+    elements.append(header_table)
+    elements.append(Spacer(1, 0.4*cm))
+
+    if data['internal_id']:
+        elements.append(Paragraph(f'<b>Céges belső azonosító:</b> {data["internal_id"]}', HANDOVER_INTERNAL_ID_STYLE))
+
+    table = Table(_info_rows(data), colWidths=[5*cm, 11*cm])
+    table.setStyle(INFO_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 0.4*cm))
+
+    elements.append(Paragraph('<b>Kért vizsgálatok:</b>', HANDOVER_HEADING_STYLE))
+    elements.append(Spacer(1, 0.2*cm))
+    test_table = Table(_test_rows(data), colWidths=[6*cm, 4*cm, 3*cm, 3*cm])
+    test_table.setStyle(HANDOVER_TEST_TABLE_STYLE)
+    elements.append(test_table)
+    elements.append(Spacer(1, 0.3*cm))
+
+    elements.append(Paragraph(f'<b>Összköltség: {data["total_price"]:,.0f} Ft</b>', HANDOVER_TOTAL_STYLE))
+
+    if data['special_instructions']:
+        elements.append(Spacer(1, 0.4*cm))
+        elements.append(Paragraph('<b>Különleges kezelési utasítások:</b>', HANDOVER_HEADING_STYLE))
+        elements.append(Paragraph(data['special_instructions'], HANDOVER_INSTRUCTION_STYLE))
+
+    # Megrendelés és aláírások
+    elements.append(Spacer(1, 0.8*cm))
+    elements.append(Paragraph('<b>A fentiek szerinti vizsgálatok ezúton megrendelem.</b>', HANDOVER_ORDER_STYLE))
+
+    signature_table = Table([
+        ['Jóváhagyás dátuma:', data['approval_date']],
+        ['', ''],
+        ['Cég bélyegzője:', 'Jóváhagyó aláírása:'],
+        ['', ''],
+        ['', '________________________________'],
+    ], colWidths=[8*cm, 8*cm])
+    signature_table.setStyle(SIGNATURE_TABLE_STYLE)
+    elements.append(signature_table)
+
+    elements.append(Spacer(1, 0.4*cm))
+    elements.append(Paragraph(
+        '<i>Kérem, az eredeti átadás-átvételi jegyzőkönyvet aláírni és a mintához mellékelni szíveskedjen.</i>',
+        HANDOVER_NOTE_STYLE
+    ))
+    return elements
+
+
+HANDOVER_MARGINS = {'rightMargin': 2*cm, 'leftMargin': 2*cm, 'topMargin': 2*cm, 'bottomMargin': 2*cm}
+
+
+def render_handover_pdf(data):
+    """
+    Minta átadás-átvételi jegyzőkönyv QR kóddal
+
+    Args:
+        data (dict): build_request_pdf_snapshot() kimenete 'qr_payload' és 'approval_date' mezővel
+
+    Returns:
+        bytes: PDF
+    """
+    return _build(handover_elements(data, qr_png(data['qr_payload'])), **HANDOVER_MARGINS)
+
+
+def render_merged_pdf(kind, snapshots, output):
+    """
+    v8.4.18: Több kérés dokumentuma egyetlen PDF-ben (dokumentumonként új oldalon)
+
+    Args:
+        kind (str): 'request' vagy 'handover'
+        snapshots (list): render_request_pdf / render_handover_pdf bemenetei
+        output: fájlnév vagy írható fájl objektum - a kész PDF nem kerül a memóriába bájtokként
+    """
+    elements = []
+    for data in snapshots:
+        if elements:
+            elements.append(PageBreak())
+        if kind == 'handover':
+            elements.extend(handover_elements(data, qr_png(data['qr_payload'])))
+        else:
+            elements.extend(request_elements(data))
+
+    doc_options = HANDOVER_MARGINS if kind == 'handover' else {}
+    SimpleDocTemplate(output, pagesize=A4, **doc_options).build(elements)
+
+
+# v8.4.20: A4 címkeív - 3 x 8 címke (70 x 37,1 mm, a szokásos 24-es öntapadós ív)
+LABEL_COLUMNS = 3
+LABEL_ROWS = 8
+LABEL_QR_SIZE = 3.0*cm
+
+
+def render_label_sheet(labels):
+    """
+    QR címkék A4 íveken (logisztika: /api/logistics/scan)
+
+    Args:
+        labels (list): dict-ek 'qr_payload', 'request_number', 'company_name', 'internal_id' mezőkkel
+
+    Returns:
+        bytes: PDF
+    """
+    buffer = BytesIO()
+    page_width, page_height = A4
+    label_width = page_width / LABEL_COLUMNS
+    label_height = page_height / LABEL_ROWS
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+    qr_margin = (label_height - LABEL_QR_SIZE) / 2
+    text_x = qr_margin + LABEL_QR_SIZE + 0.15*cm
+    text_width = label_width - text_x - 0.2*cm
+
+    sheet = pdf_canvas.Canvas(buffer, pagesize=A4)
+    for index, label in enumerate(labels):
+        if index and index % per_page == 0:
+            sheet.showPage()
+        column = index % LABEL_COLUMNS
+        row = (index % per_page) // LABEL_COLUMNS
+        x = column * label_width
+        y = page_height - (row + 1) * label_height
+
+        sheet.drawImage(ImageReader(BytesIO(qr_png(label['qr_payload']))),
+                        x + qr_margin, y + qr_margin, LABEL_QR_SIZE, LABEL_QR_SIZE)
+
+        lines = [(FONT_BOLD, 8, label['request_number'])]
+        if label.get('company_name'):
+            lines.append((FONT, 7, label['company_name']))
+        if label.get('internal_id'):
+            lines.append((FONT, 7, label['internal_id']))
+        text_y = y + label_height / 2 + 0.4*cm
+        for font_name, font_size, value in lines:
+            # Túl hosszú szöveg levágása a címke szélességére
+            while value and pdfmetrics.stringWidth(value, font_name, font_size) > text_width:
+                value = value[:-1]
+            sheet.setFont(font_name, font_size)
+            sheet.drawString(x + text_x, text_y, value)
+            text_y -= font_size + 3
+
+    sheet.save()
+    return buffer.getvalue()
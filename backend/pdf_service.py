@@ -0,0 +1,210 @@
+"""
+PDF renderelő szolgáltatás - v8.4.19
+====================================
+
+A reportlab layout + QR generálás CPU-igényes tiszta Python munka; a web
+worker szálban futtatva minden más API hívás vár rá. Itt egy korlátos
+ProcessPoolExecutor rendereli a PDF-eket:
+
+- A handler csak egyszerű adatot (dict snapshot) ad át, ORM objektumot nem.
+- A gyerek processzek indításkor regisztrálják a fontokat és betöltik a QR/PIL
+  kódot (_warm_up), így az első kérés sem lassabb.
+- A pool forkserver (ahol nincs: spawn) kontextust használ: a web worker a pool
+  indulásakor már sok szálat futtat, egy fork-olt gyerek az örökölt (logging,
+  SQLAlchemy pool, reportlab) zárakon holtpontra juthatna. A forkserver egy
+  tiszta, egyszálú processzből fork-ol, előre betöltött pdf_rendering modullal.
+- Egyszerre legfeljebb PDF_RENDER_MAX_PENDING feladat lehet a poolban
+  (futó + várakozó); tele sornál PdfServiceBusy, időtúllépésnél
+  PdfRenderTimeout - a handler 503-mal válaszol.
+- metrics(): sorhossz, csúcs, számlálók, átlagos renderidő (processzenként).
+
+PDF_RENDER_WORKERS=0: renderelés helyben, a hívó szálban (fejlesztés).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import pdf_rendering
+from qr_cache import make_qr_png
+
+RENDERERS = {
+    'request': pdf_rendering.render_request_pdf,
+    'handover': pdf_rendering.render_handover_pdf,
+    'labels': pdf_rendering.render_label_sheet,  # v8.4.20
+}
+
+
+class PdfServiceBusy(Exception):
+    """A render sor tele van"""
+
+
+class PdfRenderTimeout(Exception):
+    """A renderelés nem fejeződött be az időkorláton belül"""
+
+
+_settings = {'workers': 2, 'max_pending': 8, 'timeout': 30, 'qr_cache': (None, 1024)}
+_executor = None
+_slots = threading.BoundedSemaphore(_settings['max_pending'])
+_lock = threading.Lock()
+_metrics = {
+    'submitted': 0,
+    'completed': 0,
+    'failed': 0,
+    'rejected': 0,
+    'timeouts': 0,
+    'in_flight': 0,
+    'peak_in_flight': 0,
+    'render_seconds_total': 0.0,
+}
+
+
+def configure(workers, max_pending, timeout, qr_cache_folder=None, qr_cache_max_items=1024):
+    """Beállítások (app indításkor, az első renderelés előtt) - a QR cache beállítást a gyerek processzek kapják meg"""
+    global _slots
+    with _lock:
+        _settings.update({'workers': workers, 'max_pending': max(max_pending, 1), 'timeout': timeout,
+                          'qr_cache': (qr_cache_folder, qr_cache_max_items)})
+        _slots = threading.BoundedSemaphore(_settings['max_pending'])
+
+
+def _warm_up(qr_cache_folder=None, qr_cache_max_items=1024):
+    """Gyerek processz inicializálás: QR cache beállítás, fontok + QR/PIL import"""
+    if qr_cache_folder:
+        pdf_rendering.qr_images.configure(qr_cache_folder, qr_cache_max_items)
+    pdf_rendering.register_fonts()
+    make_qr_png('warm-up')
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # forkserver / spawn: a gyerek nem a (többszálú) web worker másolata; a renderer
+            # modulok (pdf_rendering, pdf_batch) importálhatók app.py nélkül
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['pdf_rendering', 'pdf_batch'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            folder, max_items = _settings['qr_cache']
+            _executor = ProcessPoolExecutor(max_workers=_settings['workers'], mp_context=context,
+                                            initializer=_warm_up,
+                                            initargs=(os.path.abspath(folder) if folder else None, max_items))
+            print(f"🖨️ PDF render pool indítva ({_settings['workers']} processz, {context.get_start_method()})")
+        return _executor
+
+
+def _finished(future, slots, started_at, executor=None):
+    global _executor
+    slots.release()
+    broken = False
+    with _lock:
+        _metrics['in_flight'] -= 1
+        _metrics['render_seconds_total'] += time.perf_counter() - started_at
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            _metrics['completed'] += 1
+        else:
+            _metrics['failed'] += 1
+            if isinstance(error, BrokenProcessPool) and executor is not None:
+                # Elhalt gyerek processz - a következő feladat új poolt kap
+                broken = True
+                if _executor is executor:
+                    _executor = None
+    if broken:
+        # A halott pool leállítása (a megmaradt processzek és sorok felszabadítása)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def submit(fn, *args, wait=0):
+    """
+    Feladat beküldése a poolba
+
+    Args:
+        fn: modul szintű (pickle-ölhető) függvény
+        wait (float): ennyi ideig várunk szabad helyre (0 = azonnal elutasít)
+
+    Returns:
+        Future
+
+    Raises:
+        PdfServiceBusy: ha nincs szabad hely a sorban
+    """
+    slots = _slots  # configure() cserélheti - ugyanazt engedjük el, amit lefoglaltunk
+    acquired = slots.acquire(timeout=wait) if wait else slots.acquire(blocking=False)
+    if not acquired:
+        with _lock:
+            _metrics['rejected'] += 1
+        raise PdfServiceBusy()
+
+    with _lock:
+        _metrics['submitted'] += 1
+        _metrics['in_flight'] += 1
+        _metrics['peak_in_flight'] = max(_metrics['peak_in_flight'], _metrics['in_flight'])
+    started_at = time.perf_counter()
+
+    try:
+        if _settings['workers'] <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            executor = None
+        else:
+            executor = _get_executor()
+            future = executor.submit(fn, *args)
+    except Exception:
+        slots.release()
+        with _lock:
+            _metrics['in_flight'] -= 1
+            _metrics['failed'] += 1
+        raise
+
+    future.add_done_callback(lambda f: _finished(f, slots, started_at, executor))
+    return future
+
+
+def result(future, timeout=None):
+    """Future eredménye időkorláttal; lejáratkor PdfRenderTimeout"""
+    try:
+        return future.result(timeout=timeout or _settings['timeout'])
+    except FutureTimeoutError:
+        # Még várakozó feladat törlődik; a már futó a háttérben befejeződik és felszabadítja a helyét
+        future.cancel()
+        with _lock:
+            _metrics['timeouts'] += 1
+        raise PdfRenderTimeout()
+
+
+def run(fn, *args, timeout=None, wait=0):
+    """Feladat futtatása a poolban és az eredmény megvárása"""
+    return result(submit(fn, *args, wait=wait), timeout)
+
+
+def render(kind, snapshot, timeout=None):
+    """Egy dokumentum PDF bájtjai ('request' vagy 'handover')"""
+    return run(RENDERERS[kind], snapshot, timeout=timeout)
+
+
+def metrics():
+    """Pool állapot (ebben a web processzben)"""
+    with _lock:
+        data = dict(_metrics)
+        finished = data['completed'] + data['failed']
+        data.update({
+            'workers': _settings['workers'],
+            'max_pending': _settings['max_pending'],
+            'timeout_seconds': _settings['timeout'],
+            'queue_depth': max(data['in_flight'] - max(_settings['workers'], 0), 0),
+            'avg_render_ms': round(data['render_seconds_total'] * 1000 / finished, 1) if finished else None,
+            'pool_started': _executor is not None,
+        })
+    data['render_seconds_total'] = round(data['render_seconds_total'], 3)
+    return data
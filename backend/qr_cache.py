@@ -0,0 +1,111 @@
+"""
+QR kód kép cache - v8.4.20
+==========================
+
+A kérés QR tartalma (logisztikai scan URL a kérésszámmal) a kérésszám
+kiosztása után nem változik, ezért a PNG-t nem kell minden átadás-átvételi
+jegyzőkönyvnél / címkénél újra generálni.
+
+- Memória: LRU (payload, box_size, border) kulccsal, processzenként
+  (a render pool processzekben is).
+- Lemez: <QR_CACHE_FOLDER>/<hash első 2 karaktere>/<hash>.png - a processzek
+  és újraindítások között is megosztva. Egy QR PNG ~1 KB, ezért nincs
+  méretkorlát.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+
+
+def make_qr_png(payload, box_size=10, border=2):
+    """QR kód PNG bájtokként (cache nélkül)"""
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class QrImageCache:
+    """Kétszintű (memória LRU + lemez) QR PNG cache"""
+
+    def __init__(self, folder=None, max_items=1024):
+        self.folder = folder
+        self.max_items = max_items
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def configure(self, folder, max_items):
+        """Beállítások (app indításkor; a render pool processzek a pdf_service inicializálójából)"""
+        with self._lock:
+            self.folder = folder
+            self.max_items = max_items
+            self._images.clear()
+
+    def _path(self, payload, box_size, border):
+        digest = hashlib.sha256(f"{box_size}|{border}|{payload}".encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, digest[:2], f"{digest}.png")
+
+    def _read_disk(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, path, data):
+        """Atomikus mentés; hiba esetén csak memóriában marad"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ QR cache írási hiba: {e}")
+
+    def get(self, payload, box_size=10, border=2):
+        """QR PNG bájtok - memória, majd lemez, végül generálás"""
+        key = (payload, box_size, border)
+        with self._lock:
+            data = self._images.get(key)
+            if data is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self._path(payload, box_size, border) if self.folder else None
+        data = self._read_disk(path) if path else None
+        from_disk = data is not None
+        if not from_disk:
+            data = make_qr_png(payload, box_size, border)
+            if path:
+                self._write_disk(path, data)
+
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._images[key] = data
+            while len(self._images) > self.max_items:
+                self._images.popitem(last=False)
+        return data
+
+    def stats(self):
+        return {
+            'memory_items': len(self._images),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+        }
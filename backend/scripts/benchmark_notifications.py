@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+In-app notification insert benchmark - v8.4.9
+
+Soronkénti INSERT (régi viselkedés) vs. egy többsoros insert eseményenként
+1, 10, 100 és 1000 címzettel. Minden mérés a végén rollback-el, így éles
+adatbázison sem marad nyoma (a DATABASE_URL szerinti adatbázist használja).
+
+Használat:
+    python scripts/benchmark_notifications.py [--repeat 5]
+"""
+
+import sys
+import os
+import time
+import json
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db, User, NotificationEventType
+from notification_service import NotificationService
+from sqlalchemy import text
+
+RECIPIENT_COUNTS = [1, 10, 100, 1000]
+
+
+def insert_per_row(user_ids, event_type_id, event_data):
+    """Régi viselkedés: egy INSERT és egy json.dumps címzettenként"""
+    for user_id in user_ids:
+        db.session.execute(text("""
+            INSERT INTO notifications
+            (user_id, event_type_id, event_data, message, link_url, request_id)
+            VALUES (:p0, :p1, :p2, :p3, :p4, :p5)
+        """), {"p0": user_id, "p1": event_type_id, "p2": json.dumps(event_data),
+               "p3": "Benchmark", "p4": None, "p5": None})
+
+
+def insert_bulk(user_ids, event_type_id, event_data):
+    NotificationService._create_in_app_notifications(
+        user_ids, event_type_id, "Benchmark", None, None, event_data
+    )
+
+
+def measure(method, user_ids, event_type_id, event_data, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        method(user_ids, event_type_id, event_data)
+        db.session.flush()
+        elapsed = time.perf_counter() - start
+        db.session.rollback()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(repeat):
+    with app.app_context():
+        user = User.query.first()
+        event_type = NotificationEventType.query.first()
+        if not user or not event_type:
+            print("❌ Legalább egy user és egy notification event type kell a méréshez")
+            return
+
+        # FK miatt létező user ID - a címzett lista ugyanazt az ID-t ismétli
+        event_data = {
+            'request_number': 'BENCH-20240101-001',
+            'company_name': 'Benchmark Kft.',
+            'old_status': 'draft',
+            'new_status': 'pending_approval',
+            'requester_name': 'Teszt Elek'
+        }
+
+        print(f"📊 In-app notification insert ({db.engine.dialect.name}, legjobb {repeat} futásból)")
+        print(f"{'címzett':>8} | {'soronként (sor/s)':>18} | {'bulk (sor/s)':>14} | {'gyorsulás':>9}")
+        print("-" * 60)
+        for count in RECIPIENT_COUNTS:
+            user_ids = [user.id] * count
+            per_row = measure(insert_per_row, user_ids, event_type.id, event_data, repeat)
+            bulk = measure(insert_bulk, user_ids, event_type.id, event_data, repeat)
+            print(f"{count:>8} | {count / per_row:>18,.0f} | {count / bulk:>14,.0f} | {per_row / bulk:>8.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-app notification insert benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.repeat)
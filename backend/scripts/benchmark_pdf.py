@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+PDF export benchmark - v8.4.16
+
+Dokumentumonkénti idő a régi (minden letöltésnél font regisztráció +
+getSampleStyleSheet + stílusok újraépítése) és az új (pdf_rendering: egyszer
+regisztrált fontok, modul szintű stílusok) módszerrel, az adatbázis első
+kérésének adataival.
+
+Használat:
+    python scripts/benchmark_pdf.py [--repeat 20] [--request-id 1]
+"""
+
+import sys
+import os
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, LabRequest, build_request_pdf_snapshot, build_handover_snapshot
+import pdf_rendering
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+
+def legacy_setup():
+    """A régi endpointok kérésenkénti előkészítése: TTF beolvasás + stílusok"""
+    for regular_path, bold_path in pdf_rendering.FONT_PATHS:
+        if os.path.exists(regular_path) and os.path.exists(bold_path):
+            pdfmetrics.registerFont(TTFont('CustomFont', regular_path))
+            pdfmetrics.registerFont(TTFont('CustomFont-Bold', bold_path))
+            break
+    styles = getSampleStyleSheet()
+    for name in ('CustomTitle', 'IDStyle', 'Heading', 'Total', 'Instruction'):
+        ParagraphStyle(name, parent=styles['Normal'], fontName=pdf_rendering.FONT)
+
+
+def measure(render, snapshot, repeat, legacy):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if legacy:
+            legacy_setup()
+        render(snapshot)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def benchmark(repeat, request_id):
+    with app.test_request_context():
+        req = LabRequest.query.get(request_id) if request_id else LabRequest.query.first()
+        if not req:
+            print("❌ Nincs kérés az adatbázisban")
+            return
+        request_snapshot = build_request_pdf_snapshot(req)
+        handover_snapshot = build_handover_snapshot(req)
+
+    print(f"📊 PDF renderelés, kérés #{req.id} (medián {repeat} futásból, font: {pdf_rendering.FONT})")
+    print(f"{'dokumentum':>12} | {'régi (ms)':>10} | {'új (ms)':>10} | {'gyorsulás':>9}")
+    print("-" * 52)
+    for name, render, snapshot in (
+        ('kérés', pdf_rendering.render_request_pdf, request_snapshot),
+        ('átadás', pdf_rendering.render_handover_pdf, handover_snapshot),
+    ):
+        old = measure(render, snapshot, repeat, legacy=True)
+        new = measure(render, snapshot, repeat, legacy=False)
+        print(f"{name:>12} | {old * 1000:>10.1f} | {new * 1000:>10.1f} | {old / new:>8.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PDF export benchmark')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--request-id', type=int, default=None)
+    args = parser.parse_args()
+    benchmark(args.repeat, args.request_id)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+notifications tábla átalakítása havi partíciókra (csak PostgreSQL) - v8.4.12
+
+A meglévő táblát created_at szerint RANGE particionált táblára cseréli
+(notifications_pYYYYMM + notifications_pdefault), egy tranzakcióban:
+átnevezés → új szülő tábla → partíciók → adatmásolás → régi tábla törlése →
+elsődleges kulcs (id, created_at), FK-k és indexek.
+
+Utána a NotificationService a lejárt partíciókat egészben eldobja, az újakat
+pedig előre létrehozza (notification_worker.py --purge / háttér feldolgozó).
+
+A futás alatt a tábla zárolva van (ACCESS EXCLUSIVE) - karbantartási
+ablakban futtasd.
+
+Használat:
+    python scripts/partition_notifications.py --dry-run   # SQL kiírása
+    python scripts/partition_notifications.py
+"""
+
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from migrations import INDEX_MIGRATIONS
+from notification_service import NotificationService
+from datetime import datetime
+from sqlalchemy import text
+
+COLUMNS = "id, user_id, event_type_id, event_data, message, link_url, request_id, is_read, read_at, created_at"
+
+
+def build_statements():
+    oldest = db.session.execute(text("SELECT MIN(created_at) FROM notifications")).scalar()
+    now = datetime.utcnow()
+    first_month = NotificationService._month_start(oldest or now)
+    last_month = NotificationService._month_start(now, NotificationService.PARTITION_MONTHS_AHEAD)
+
+    statements = [
+        "LOCK TABLE notifications IN ACCESS EXCLUSIVE MODE",
+        "ALTER TABLE notifications RENAME TO notifications_legacy",
+        "CREATE TABLE notifications (LIKE notifications_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)",
+        "ALTER TABLE notifications ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP",
+        "ALTER TABLE notifications ALTER COLUMN created_at SET NOT NULL",
+    ]
+
+    month = first_month
+    while month <= last_month:
+        next_month = NotificationService._month_start(month, 1)
+        statements.append(
+            f"CREATE TABLE {NotificationService.partition_name(month)} PARTITION OF notifications "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        )
+        month = next_month
+    statements.append("CREATE TABLE notifications_pdefault PARTITION OF notifications DEFAULT")
+
+    statements += [
+        f"INSERT INTO notifications ({COLUMNS}) "
+        f"SELECT id, user_id, event_type_id, event_data, message, link_url, request_id, is_read, read_at, "
+        f"COALESCE(created_at, CURRENT_TIMESTAMP) FROM notifications_legacy",
+        # A sorszám generátor a régi táblával együtt törlődne
+        "ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id",
+        "DROP TABLE notifications_legacy",
+        "ALTER TABLE notifications ADD PRIMARY KEY (id, created_at)",
+        'ALTER TABLE notifications ADD FOREIGN KEY (user_id) REFERENCES "user" (id)',
+        "ALTER TABLE notifications ADD FOREIGN KEY (event_type_id) REFERENCES notification_event_types (id)",
+        "ALTER TABLE notifications ADD FOREIGN KEY (request_id) REFERENCES lab_request (id)",
+    ]
+
+    for migration in INDEX_MIGRATIONS:
+        if migration['table'] == 'notifications':
+            statements.append(
+                f"CREATE INDEX {migration['name']} ON notifications ({', '.join(migration['columns'])})"
+            )
+
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description='notifications tábla havi particionálása (PostgreSQL)')
+    parser.add_argument('--dry-run', action='store_true', help='Csak az SQL utasítások kiírása')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("❌ Particionálás csak PostgreSQL adatbázison támogatott")
+            sys.exit(1)
+        if NotificationService.is_partitioned():
+            print("✅ A notifications tábla már particionált")
+            return
+
+        sequence = db.session.execute(text("SELECT pg_get_serial_sequence('notifications', 'id')")).scalar()
+        if sequence not in ('notifications_id_seq', 'public.notifications_id_seq'):
+            print(f"❌ Váratlan id sorszám generátor: {sequence}")
+            sys.exit(1)
+
+        statements = build_statements()
+        if args.dry_run:
+            db.session.rollback()
+            for statement in statements:
+                print(f"{statement};")
+            return
+
+        try:
+            for statement in statements:
+                print(f"  ▶ {statement[:100]}")
+                db.session.execute(text(statement))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Particionálás sikertelen, változtatás visszavonva: {e}")
+            sys.exit(1)
+
+        count = db.session.execute(text("SELECT COUNT(*) FROM notifications")).scalar()
+        print(f"✅ notifications particionálva ({count} sor)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Dashboard statisztika rollup ellenőrzése / újraépítése - v8.4.23
+
+A lab_request_stats táblát a stats_rollup modul a kérések írásával egy
+tranzakcióban tartja karban; ez a script a lab_request táblából újraszámolja,
+és kiírja az eltéréseket (pl. kézi SQL módosítás után).
+
+Használat:
+    python scripts/rebuild_stats_rollup.py            # ellenőrzés + javítás
+    python scripts/rebuild_stats_rollup.py --dry-run  # csak ellenőrzés
+"""
+
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+import stats_rollup
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard statisztika rollup újraépítése')
+    parser.add_argument('--dry-run', action='store_true', help='Csak ellenőrzés, módosítás nélkül')
+    args = parser.parse_args()
+
+    with app.app_context():
+        mismatches = stats_rollup.rebuild(dry_run=args.dry_run)
+        if not args.dry_run:
+            db.session.commit()
+
+    if not mismatches:
+        print("✅ Minden rollup sor egyezik")
+        return 0
+
+    print(f"⚠️  {len(mismatches)} eltérő rollup sor:")
+    for (company_id, user_id, status, category_id), (stored, actual) in sorted(mismatches.items()):
+        print(f"  cég #{company_id}, user #{user_id}, {status or '-'}, kategória #{category_id}: "
+              f"tárolt={stored[0]} db / {stored[1]:,.0f} Ft, tényleges={actual[0]} db / {actual[1]:,.0f} Ft")
+    print("ℹ️  Dry run - nem történt módosítás" if args.dry_run else "✅ Rollup újraépítve")
+    return 1 if args.dry_run else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Olvasatlan notification számlálók ellenőrzése / újraépítése - v8.4.11
+
+A notification_unread_counter táblát a NotificationService tranzakcionálisan
+tartja karban; ez a script a notifications táblából újraszámolja, és kiírja
+az eltéréseket (pl. kézi SQL törlés után).
+
+Használat:
+    python scripts/rebuild_unread_counters.py            # ellenőrzés + javítás
+    python scripts/rebuild_unread_counters.py --dry-run  # csak ellenőrzés
+"""
+
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from notification_service import NotificationService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Olvasatlan notification számlálók újraépítése')
+    parser.add_argument('--dry-run', action='store_true', help='Csak ellenőrzés, módosítás nélkül')
+    args = parser.parse_args()
+
+    with app.app_context():
+        mismatches = NotificationService.rebuild_unread_counters(dry_run=args.dry_run)
+
+    if not mismatches:
+        print("✅ Minden számláló egyezik")
+        return
+
+    print(f"⚠️  {len(mismatches)} eltérő számláló:")
+    for user_id, (stored, actual) in sorted(mismatches.items()):
+        print(f"  user #{user_id}: tárolt={stored}, tényleges={actual}")
+    print("ℹ️  Dry run - nem történt módosítás" if args.dry_run else "✅ Számlálók újraépítve")
+
+
+if __name__ == '__main__':
+    main()
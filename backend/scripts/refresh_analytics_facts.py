@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Analitika ténytábla frissítése - v8.4.24
+
+A háttér feldolgozó (thread mód vagy notification_worker.py) ANALYTICS_REFRESH_SECONDS
+másodpercenként frissít; ez a script inline módhoz (cron) és teljes újraépítésre
+való (pl. kézi SQL módosítás vagy visszaállítás után).
+
+Használat:
+    python scripts/refresh_analytics_facts.py         # módosult kérések
+    python scripts/refresh_analytics_facts.py --full  # teljes újraépítés
+"""
+
+import sys
+import os
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+import analytics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analitika ténytábla frissítése')
+    parser.add_argument('--full', action='store_true', help='Minden kérés újraszámolása')
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        stats = analytics.refresh_facts(full=args.full)
+        db.session.commit()
+
+    mode = 'Teljes újraépítés' if stats['full'] else 'Inkrementális frissítés'
+    print(f"✅ {mode}: {stats['requests']} kérés, {stats['rows']} tény sor "
+          f"({time.perf_counter() - started:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
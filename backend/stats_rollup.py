@@ -0,0 +1,218 @@
+"""
+Dashboard statisztika rollup - v8.4.23
+======================================
+
+A lab_request_stats tábla (company_id, user_id, status, category_id)
+kulcsonként tárolja a kérések számát és összértékét; a /api/stats ebből
+olvas néhány előre összesített sort a teljes lab_request tábla helyett.
+
+Karbantartás tranzakcionálisan, ugyanabban a flush-ban:
+- ORM: session before_flush / after_flush esemény - új, törölt és a kulcs
+  mezőit vagy árát módosító LabRequest objektumok (minden ORM kódút).
+- Core bulk INSERT (POST /api/requests/bulk): record_inserted_rows().
+- Nyers SQL törlés (reset-data): a rollup táblát is üríteni kell.
+
+Ellenőrzés / újraépítés: scripts/rebuild_stats_rollup.py [--dry-run]
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+
+KEY_FIELDS = ('company_id', 'user_id', 'status', 'category_id')
+TRACKED_FIELDS = KEY_FIELDS + ('total_price',)
+NO_CATEGORY = 0  # category_id NULL helyett - NULL nem ütközne az egyedi kulcsban (ON CONFLICT)
+REVENUE_TOLERANCE = 0.005  # Lebegőpontos összegek összevetésénél
+
+_models = {}
+
+
+def init(db, request_model, stats_model):
+    """Esemény figyelők regisztrálása (app.py, a modellek után, egyszer)"""
+    _models.update({'db': db, 'request': request_model, 'stats': stats_model})
+    # active_history: a régi érték akkor is betöltődik, ha az attribútum még nem volt beolvasva
+    for field in TRACKED_FIELDS:
+        event.listen(getattr(request_model, field), 'set', _noop, active_history=True)
+    event.listen(db.session, 'before_flush', _before_flush)
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+
+
+def _noop(target, value, oldvalue, initiator):
+    return value
+
+
+def _key(values):
+    return (
+        values['company_id'],
+        values['user_id'],
+        values['status'] or '',
+        values['category_id'] or NO_CATEGORY
+    )
+
+
+def _add(deltas, values, sign):
+    delta = deltas[_key(values)]
+    delta[0] += sign
+    delta[1] += sign * (values['total_price'] or 0)
+
+
+def _before_flush(session, flush_context, instances):
+    """Törölt és módosított kérések régi / új értékei (a flush előtt még betölthetők)"""
+    request_model = _models['request']
+    deltas = session.info.setdefault('stats_rollup_deltas', defaultdict(lambda: [0, 0.0]))
+
+    for obj in session.deleted:
+        if isinstance(obj, request_model) and inspect(obj).persistent:
+            _add(deltas, {field: getattr(obj, field) for field in TRACKED_FIELDS}, -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, request_model) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not state.persistent:
+            continue
+        old, new, changed = {}, {}, False
+        for field in TRACKED_FIELDS:
+            history = state.attrs[field].history
+            if history.deleted:
+                changed = True
+                old[field] = history.deleted[0]
+                new[field] = history.added[0] if history.added else None
+            else:
+                old[field] = new[field] = getattr(obj, field)
+        if changed:
+            _add(deltas, old, -1)
+            _add(deltas, new, +1)
+
+
+def _after_flush(session, flush_context):
+    """Új kérések (az INSERT után már az oszlop alapértékekkel) + a deltak kiírása ugyanabban a tranzakcióban"""
+    request_model = _models['request']
+    deltas = session.info.pop('stats_rollup_deltas', None) or defaultdict(lambda: [0, 0.0])
+    for obj in session.new:
+        if isinstance(obj, request_model):
+            _add(deltas, {field: getattr(obj, field) for field in TRACKED_FIELDS}, +1)
+    apply_deltas(session.connection(), deltas)
+
+
+def _after_rollback(session):
+    """Sikertelen flush után a be nem írt deltak eldobása"""
+    session.info.pop('stats_rollup_deltas', None)
+
+
+def record_inserted_rows(connection, rows):
+    """Core bulk INSERT-tel beszúrt kérés sorok (dict-ek) hozzáadása a rollup-hoz"""
+    deltas = defaultdict(lambda: [0, 0.0])
+    defaults = {'status': 'draft', 'category_id': None, 'total_price': 0}
+    for row in rows:
+        _add(deltas, {field: row.get(field, defaults.get(field)) for field in TRACKED_FIELDS}, +1)
+    apply_deltas(connection, deltas)
+
+
+def apply_deltas(connection, deltas):
+    """Kulcsonkénti (darab, összeg) változások upsert-je; a kiürült kulcsok törlése"""
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or abs(delta[1]) > 1e-9}
+    if not deltas:
+        return
+
+    table = _models['stats'].__table__
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(KEY_FIELDS),
+        set_={
+            'request_count': table.c.request_count + statement.excluded.request_count,
+            'total_revenue': table.c.total_revenue + statement.excluded.total_revenue,
+        }
+    )
+    connection.execute(statement, [
+        {
+            'company_id': key[0], 'user_id': key[1], 'status': key[2], 'category_id': key[3],
+            'request_count': count, 'total_revenue': revenue
+        }
+        for key, (count, revenue) in sorted(deltas.items())  # Rendezve: párhuzamos tranzakciók azonos zár sorrend
+    ])
+    connection.execute(table.delete().where(table.c.request_count <= 0))
+
+
+def _actual_rows(connection):
+    """Rollup sorok a lab_request táblából számolva: {kulcs: (darab, összeg)}"""
+    db = _models['db']
+    request_table = _models['request'].__table__
+    category = db.func.coalesce(request_table.c.category_id, NO_CATEGORY)
+    status = db.func.coalesce(request_table.c.status, '')
+    rows = connection.execute(
+        db.select(
+            request_table.c.company_id, request_table.c.user_id, status, category,
+            db.func.count(), db.func.coalesce(db.func.sum(request_table.c.total_price), 0)
+        ).group_by(request_table.c.company_id, request_table.c.user_id, status, category)
+    )
+    return {(row[0], row[1], row[2], row[3]): (row[4], float(row[5])) for row in rows}
+
+
+def _stored_rows(connection):
+    db = _models['db']
+    table = _models['stats'].__table__
+    rows = connection.execute(db.select(
+        table.c.company_id, table.c.user_id, table.c.status, table.c.category_id,
+        table.c.request_count, table.c.total_revenue
+    ))
+    return {(row[0], row[1], row[2], row[3]): (row[4], float(row[5] or 0)) for row in rows}
+
+
+def rebuild(dry_run=False):
+    """
+    Rollup ellenőrzése a nyers adatokkal, eltérés esetén újraépítés (a hívó commitol)
+
+    Returns:
+        dict: {kulcs: (tárolt (darab, összeg), tényleges (darab, összeg))} - csak az eltérők
+    """
+    db = _models['db']
+    connection = db.session.connection()
+    actual = _actual_rows(connection)
+    stored = _stored_rows(connection)
+
+    mismatches = {}
+    for key in set(actual) | set(stored):
+        stored_value = stored.get(key, (0, 0.0))
+        actual_value = actual.get(key, (0, 0.0))
+        if stored_value[0] != actual_value[0] or abs(stored_value[1] - actual_value[1]) > REVENUE_TOLERANCE:
+            mismatches[key] = (stored_value, actual_value)
+
+    if mismatches and not dry_run:
+        table = _models['stats'].__table__
+        connection.execute(table.delete())
+        if actual:
+            connection.execute(table.insert(), [
+                {
+                    'company_id': key[0], 'user_id': key[1], 'status': key[2], 'category_id': key[3],
+                    'request_count': count, 'total_revenue': revenue
+                }
+                for key, (count, revenue) in actual.items()
+            ])
+    return mismatches
+
+
+def read_stats(company_id=None, user_id=None):
+    """
+    Összesítés a rollup táblából
+
+    Returns:
+        list: (status, category_id, darab, összeg) sorok (category_id 0 = nincs kategória)
+    """
+    db = _models['db']
+    stats_model = _models['stats']
+    query = db.session.query(
+        stats_model.status, stats_model.category_id,
+        db.func.sum(stats_model.request_count), db.func.sum(stats_model.total_revenue)
+    )
+    if company_id is not None:
+        query = query.filter(stats_model.company_id == company_id)
+    if user_id is not None:
+        query = query.filter(stats_model.user_id == user_id)
+    return query.group_by(stats_model.status, stats_model.category_id).all()
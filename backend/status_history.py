@@ -0,0 +1,221 @@
+"""
+Kérés státusz előzmények - v8.4.25
+==================================
+
+Minden LabRequest státuszváltozás egy sort kap a lab_request_status_event
+táblában (honnan, hová, mikor, ki, melyik művelet). A sorok csak
+hozzáadódnak, módosítani nem lehet őket (before_update hibát dob).
+
+Írás egyetlen helyen:
+- transition(): minden státuszváltó végpont ezt hívja (a req.status
+  közvetlen átírása helyett); a legacy 'submitted' itt lesz
+  arrived_at_provider, és itt kap értéket az arrived_at is.
+- record_created() / record_inserted_rows(): létrehozás (ORM / bulk Core INSERT).
+
+Lekérdezések (indexek: (lab_request_id, changed_at), (to_status, changed_at)):
+- request_history(): egy kérés eseményei és státuszonkénti ideje.
+- entered_state(): az X státuszba az időablakban került kérések.
+- time_in_states(): státuszonkénti időtartam statisztika - a következő
+  esemény időpontját LEAD() ablakfüggvény adja, a még tartó szakasz
+  vége "most".
+"""
+
+import datetime
+
+from sqlalchemy import event
+
+from analytics import percentile
+
+LEGACY_STATUSES = {'submitted': 'arrived_at_provider'}
+
+_models = {}
+
+
+class StatusEventReadOnly(Exception):
+    """A státusz esemény sorok nem módosíthatók"""
+
+
+def init(db, request_model, event_model):
+    """Modellek átadása, módosítás tiltása (app.py, a modellek után, egyszer)"""
+    _models.update({'db': db, 'request': request_model, 'event': event_model})
+    event.listen(event_model, 'before_update', _reject_update)
+
+
+def _reject_update(mapper, connection, target):
+    raise StatusEventReadOnly(f"lab_request_status_event #{target.id} nem módosítható")
+
+
+# ============================================
+# ÍRÁS
+# ============================================
+
+def transition(req, new_status, user=None, source=None):
+    """
+    Kérés státuszának átállítása + esemény sor (a hívó commitol)
+
+    Azonos státusznál nincs esemény. A legacy 'submitted' arrived_at_provider lesz.
+
+    Args:
+        req (LabRequest): a kérés
+        new_status (str): új státusz
+        user (User): a műveletet végző felhasználó (None = rendszer)
+        source (str): a művelet neve (pl. 'logistics', 'qr_scan')
+
+    Returns:
+        str: a korábbi státusz
+    """
+    old_status = req.status
+    new_status = LEGACY_STATUSES.get(new_status, new_status)
+    if new_status == old_status:
+        return old_status
+
+    now = datetime.datetime.utcnow()
+    req.status = new_status
+    req.updated_at = now
+    if new_status == 'arrived_at_provider' and req.arrived_at is None:
+        req.arrived_at = now  # Átfutási idő kezdete (analytics) - csak az első megérkezés
+    _models['db'].session.add(_models['event'](
+        lab_request=req,
+        from_status=old_status,
+        to_status=new_status,
+        changed_at=now,
+        changed_by_user_id=user.id if user else None,
+        source=source
+    ))
+    return old_status
+
+
+def record_created(req, user=None, source='create'):
+    """Új (még nem flush-olt) kérés kezdő státusza"""
+    _models['db'].session.add(_models['event'](
+        lab_request=req,
+        from_status=None,
+        to_status=req.status or 'draft',
+        changed_at=req.created_at or datetime.datetime.utcnow(),
+        changed_by_user_id=user.id if user else None,
+        source=source
+    ))
+
+
+def record_inserted_rows(connection, request_ids, rows, user=None, source='bulk_create'):
+    """Core bulk INSERT-tel létrehozott kérések kezdő státusza (rows: a beszúrt dict-ek, request_ids sorrendjében)"""
+    if not request_ids:
+        return
+    connection.execute(_models['event'].__table__.insert(), [
+        {
+            'lab_request_id': request_id,
+            'from_status': None,
+            'to_status': row.get('status') or 'draft',
+            'changed_at': row['created_at'],
+            'changed_by_user_id': user.id if user else None,
+            'source': source
+        }
+        for request_id, row in zip(request_ids, rows)
+    ])
+
+
+# ============================================
+# LEKÉRDEZÉSEK
+# ============================================
+
+def _seconds(start, end):
+    return max((end - start).total_seconds(), 0)
+
+
+def request_history(request_id, now=None):
+    """
+    Egy kérés eseményei időrendben és az egyes státuszokban töltött idő
+
+    Returns:
+        (list, dict): események, {státusz: másodperc} (az aktuális státusz mostanáig)
+    """
+    event_model = _models['event']
+    now = now or datetime.datetime.utcnow()
+    events = event_model.query.filter_by(lab_request_id=request_id)\
+        .order_by(event_model.changed_at, event_model.id).all()
+
+    durations = {}
+    for current, following in zip(events, events[1:] + [None]):
+        end = following.changed_at if following else now
+        durations[current.to_status] = durations.get(current.to_status, 0) + _seconds(current.changed_at, end)
+    return events, durations
+
+
+def _scoped(query, company_id):
+    if company_id is not None:
+        request_model = _models['request']
+        query = query.join(request_model, request_model.id == _models['event'].lab_request_id)\
+            .filter(request_model.company_id == company_id)
+    return query
+
+
+def entered_state(status, date_from, date_to, company_id=None, limit=None):
+    """
+    Az adott státuszba az időablakban került kérések (ix_lab_request_status_event_status)
+
+    Returns:
+        list: (lab_request_id, belépés időpontja, előző státusz) sorok időrendben
+    """
+    db = _models['db']
+    event_model = _models['event']
+    query = db.session.query(event_model.lab_request_id, event_model.changed_at, event_model.from_status)\
+        .filter(event_model.to_status == status,
+                event_model.changed_at >= date_from, event_model.changed_at < date_to)
+    query = _scoped(query, company_id).order_by(event_model.changed_at, event_model.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def time_in_states(date_from, date_to, company_id=None, now=None):
+    """
+    Státuszonkénti időtartam az időablakban megkezdett szakaszokra
+
+    A szakasz vége a kérés következő eseménye (LEAD); a következő esemény az
+    ablakon túl is lehet, ezért a belső lekérdezés a date_from utáni összes
+    eseményt látja az érintett kérésekre.
+
+    Returns:
+        dict: {státusz: {'count', 'open', 'avg_hours', 'median_hours', 'p90_hours'}}
+    """
+    db = _models['db']
+    event_model = _models['event']
+    now = now or datetime.datetime.utcnow()
+
+    touched = _scoped(
+        db.session.query(event_model.lab_request_id).filter(
+            event_model.changed_at >= date_from, event_model.changed_at < date_to),
+        company_id
+    )
+    left_at = db.func.lead(event_model.changed_at, type_=db.DateTime).over(
+        partition_by=event_model.lab_request_id,
+        order_by=(event_model.changed_at, event_model.id)
+    )
+    intervals = db.session.query(
+        event_model.to_status.label('status'),
+        event_model.changed_at.label('entered_at'),
+        left_at.label('left_at')
+    ).filter(
+        event_model.changed_at >= date_from,
+        event_model.lab_request_id.in_(touched)
+    ).subquery()
+
+    durations, open_counts = {}, {}
+    rows = db.session.query(intervals.c.status, intervals.c.entered_at, intervals.c.left_at)\
+        .filter(intervals.c.entered_at < date_to)
+    for status, entered_at, left_at in rows.yield_per(5000):
+        if left_at is None:
+            open_counts[status] = open_counts.get(status, 0) + 1
+        durations.setdefault(status, []).append(_seconds(entered_at, left_at or now) / 3600)
+
+    result = {}
+    for status, values in durations.items():
+        values.sort()
+        result[status] = {
+            'count': len(values),
+            'open': open_counts.get(status, 0),
+            'avg_hours': round(sum(values) / len(values), 2),
+            'median_hours': round(percentile(values, 0.5), 2),
+            'p90_hours': round(percentile(values, 0.9), 2),
+        }
+    return result
@@ -0,0 +1,60 @@
+"""
+Pytest közös beállítások - v8.4
+
+A tesztek a backend könyvtárból importálnak (app, notification_service, ...).
+Az app importja előtt saját, ideiglenes SQLite adatbázis (a demo adatokkal).
+Futtatás: cd backend && python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_temp_dir = tempfile.mkdtemp(prefix='lab_request_test_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_temp_dir, 'test.db')
+# Generált PDF-ek és QR képek is az ideiglenes könyvtárba (nem az uploads/ alá)
+os.environ['PDF_CACHE_FOLDER'] = os.path.join(_temp_dir, 'pdf_cache')
+os.environ['QR_CACHE_FOLDER'] = os.path.join(_temp_dir, 'qr_cache')
+# Az értesítéseket a tesztek dolgozzák fel (process_outbox) - nincs háttér szál
+os.environ['NOTIFICATION_DISPATCH_MODE'] = 'worker'
+
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """Alkalmazás kontextus + adatbázis (a teszt végén a nyitott tranzakció visszagörgetve)"""
+    import app as backend
+    with backend.app.app_context():
+        yield backend.db
+        backend.db.session.rollback()
+
+
+@pytest.fixture
+def event_type_id(db):
+    """Teszt értesítés esemény típus"""
+    from app import NotificationEventType
+    event_type = NotificationEventType.query.filter_by(event_key='test_event').first()
+    if event_type is None:
+        event_type = NotificationEventType(event_key='test_event', event_name='Teszt esemény')
+        db.session.add(event_type)
+        db.session.commit()
+    return event_type.id
+
+
+@pytest.fixture
+def unread_counter_mismatches(db):
+    """Felhasználók, akiknél a notification_unread_counter eltér a COUNT(*) WHERE is_read = 0 értéktől"""
+    def mismatches():
+        rows = db.session.execute(db.text("""
+            SELECT u.id, COALESCE(c.unread_count, 0), COUNT(n.id)
+            FROM "user" u
+            LEFT JOIN notification_unread_counter c ON c.user_id = u.id
+            LEFT JOIN notifications n ON n.user_id = u.id AND n.is_read = 0
+            GROUP BY u.id, c.unread_count
+        """)).fetchall()
+        return [(user_id, counter, actual) for user_id, counter, actual in rows if counter != actual]
+    return mismatches
@@ -0,0 +1,57 @@
+"""
+Analitika tesztek - v8.4.24
+
+A /api/analytics végpont csak olvas; a ténytáblát a háttér feldolgozó
+frissíti (NotificationService.refresh_analytics_facts).
+"""
+
+import json
+
+import pytest
+
+import analytics
+import app as backend
+from notification_service import NotificationService
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def refresh_state(db):
+    db.session.expire_all()
+    state = db.session.get(backend.ConfigVersion, analytics.STATE_KEY)
+    return state.version, state.updated_at
+
+
+def fact_count(db, request_id):
+    return backend.LabRequestTestFact.query.filter_by(lab_request_id=request_id).count()
+
+
+def test_endpoint_is_read_only_and_worker_refreshes(client, db):
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    response = client.post('/api/requests', headers=login(client, 'user@mol.hu', 'mol123'), data={
+        'test_types': json.dumps([1]), 'internal_id': 'ANALYTICS', 'status': 'draft'
+    })
+    assert response.status_code == 201
+    request_id = response.get_json()['id']
+    before = refresh_state(db)
+
+    response = client.get('/api/analytics?bucket=day', headers=admin)
+
+    assert response.status_code == 200
+    assert refresh_state(db) == before
+    assert fact_count(db, request_id) == 0
+
+    stats = NotificationService.refresh_analytics_facts()
+
+    assert stats is not None and not stats['full']
+    assert refresh_state(db)[0] == before[0] + 1
+    assert fact_count(db, request_id) == 1
+    client.delete(f'/api/requests/{request_id}', headers=admin)
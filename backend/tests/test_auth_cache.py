@@ -0,0 +1,93 @@
+"""
+Principal cache tesztek - v8.4.13
+
+Jelszó, szerepkör módosítás és törlés után az 'auth_users' verzió nő: a
+régi token claim-jei és a cache-elt principal nem használhatók tovább.
+"""
+
+import jwt
+import pytest
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def principal(headers):
+    data = jwt.decode(headers['Authorization'][7:], backend.app.config['SECRET_KEY'], algorithms=['HS256'])
+    with backend.app.app_context():
+        return backend.load_authenticated_user(data)
+
+
+def auth_version():
+    with backend.app.app_context():
+        row = backend.db.session.get(backend.ConfigVersion, backend.AUTH_VERSION_KEY)
+        return row.version if row else 0
+
+
+@pytest.fixture
+def user(client):
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    response = client.post('/api/users', headers=admin, json={
+        'email': 'cache@mol.hu', 'password': 'regi123', 'name': 'Cache Teszt',
+        'role': 'company_user', 'company_id': 1
+    })
+    assert response.status_code == 201
+    user_id = response.get_json()['id']
+    yield user_id, admin
+    client.delete(f'/api/users/{user_id}', headers=admin)
+
+
+def test_role_change_replaces_cached_principal(client, user):
+    user_id, admin = user
+    headers = login(client, 'cache@mol.hu', 'regi123')
+    assert client.get('/api/users', headers=headers).status_code == 403
+    assert principal(headers).role == 'company_user'
+    version = auth_version()
+
+    response = client.put(f'/api/users/{user_id}', headers=admin, json={'role': 'company_admin'})
+
+    assert response.status_code == 200
+    assert auth_version() == version + 1
+    # A régi token 'company_user' claim-je már nem számít - a principal az adatbázisból jön
+    assert principal(headers).role == 'company_admin'
+    assert client.get('/api/users', headers=headers).status_code == 200
+
+
+def test_password_change_drops_cached_principal(client, user):
+    user_id, admin = user
+    headers = login(client, 'cache@mol.hu', 'regi123')
+    # Verzióváltás után a régi token principal-ja a worker cache-be kerül
+    client.put(f'/api/users/{user_id}', headers=admin, json={'phone': '+36 1 234 5678'})
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+    assert user_id in backend._auth_cache['users']
+    version = auth_version()
+
+    response = client.put(f'/api/users/{user_id}', headers=admin, json={'password': 'uj123'})
+
+    assert response.status_code == 200
+    assert auth_version() == version + 1
+    assert user_id not in backend._auth_cache['users']
+    assert client.post('/api/auth/login', json={'email': 'cache@mol.hu', 'password': 'regi123'}).status_code == 401
+    assert client.post('/api/auth/login', json={'email': 'cache@mol.hu', 'password': 'uj123'}).status_code == 200
+
+
+def test_deleted_user_token_is_rejected(client, user):
+    user_id, admin = user
+    headers = login(client, 'cache@mol.hu', 'regi123')
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+    version = auth_version()
+
+    assert client.delete(f'/api/users/{user_id}', headers=admin).status_code == 200
+
+    assert auth_version() == version + 1
+    assert principal(headers) is None
+    assert client.get('/api/requests', headers=headers).status_code == 401
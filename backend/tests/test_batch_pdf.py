@@ -0,0 +1,106 @@
+"""
+Kötegelt PDF export tesztek - v8.4.18
+
+ZIP (kérésenként egy PDF) és egyesített PDF; átadás-átvételi jegyzőkönyv
+csak jóváhagyott kérésekhez, a címke ív nem kötegelhető dokumentum.
+"""
+
+import io
+import json
+import re
+import zipfile
+
+import pytest
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+@pytest.fixture
+def requests(client, db):
+    """Két jóváhagyott (awaiting_shipment) és egy piszkozat kérés"""
+    headers = login(client, 'user@mol.hu', 'mol123')
+    ids = []
+    for index in range(3):
+        response = client.post('/api/requests', headers=headers, data={
+            'test_types': json.dumps([1]), 'internal_id': f'BATCH-{index}', 'status': 'draft'
+        })
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    for request_id in ids[:2]:
+        db.session.get(backend.LabRequest, request_id).status = 'awaiting_shipment'
+    db.session.commit()
+    yield ids
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    for request_id in ids:
+        client.delete(f'/api/requests/{request_id}', headers=admin)
+
+
+def page_count(data):
+    return len(re.findall(rb'/Type\s*/Page[^s]', data))
+
+
+def test_handover_zip_skips_unapproved(client, db, requests):
+    response = client.post('/api/requests/batch-pdf', headers=login(client, 'user@mol.hu', 'mol123'),
+                           json={'ids': requests})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert response.headers['X-Batch-Count'] == '2'
+    assert response.headers['X-Batch-Skipped'] == '1'
+    numbers = [db.session.get(backend.LabRequest, request_id).request_number for request_id in requests[:2]]
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert sorted(archive.namelist()) == sorted(f'atadas_atveteli_{number}.pdf' for number in numbers)
+        for name in archive.namelist():
+            assert archive.read(name).startswith(b'%PDF')
+
+
+def test_merged_request_pdf(client, requests):
+    headers = login(client, 'admin@pannon.hu', 'admin123')
+    single = client.get(f'/api/requests/{requests[0]}/pdf', headers=headers)
+
+    response = client.post('/api/requests/batch-pdf', headers=headers,
+                           json={'ids': requests, 'document': 'request', 'format': 'pdf'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['X-Batch-Count'] == '3'
+    assert response.data.startswith(b'%PDF')
+    assert page_count(response.data) >= 3 * page_count(single.data) >= 3
+
+
+@pytest.mark.parametrize('body', [
+    {'ids': [1], 'document': 'labels'},
+    {'ids': [1], 'format': 'tar'},
+    {'document': 'request'},
+])
+def test_invalid_batch_is_rejected(client, body):
+    response = client.post('/api/requests/batch-pdf', headers=login(client, 'admin@pannon.hu', 'admin123'), json=body)
+
+    assert response.status_code == 400
+
+
+def test_other_users_requests_are_not_exported(client, requests):
+    admin = login(client, 'admin@mol.hu', 'mol123')
+    response = client.post('/api/requests', headers=admin, data={
+        'test_types': json.dumps([1]), 'internal_id': 'BATCH-OTHER', 'status': 'draft'
+    })
+    other_id = response.get_json()['id']
+    requests.append(other_id)
+
+    # company_user csak a saját kéréseit exportálhatja (a kéréslista jogosultsága)
+    response = client.post('/api/requests/batch-pdf', headers=login(client, 'user@mol.hu', 'mol123'),
+                           json={'ids': requests, 'document': 'request'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Batch-Count'] == '3'
+    assert response.headers['X-Batch-Skipped'] == '1'
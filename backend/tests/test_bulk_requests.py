@@ -0,0 +1,98 @@
+"""
+Tömeges kérés létrehozás tesztek - v8.4.15
+
+Hibás sor esetén egy kérés sem jön létre (soronkénti hibalista); sikeres
+kötegnél a kérésszámok egyediek és folytonosak, a vizsgálatok bekerülnek.
+"""
+
+import io
+
+import pytest
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def request_count(db):
+    db.session.expire_all()
+    return backend.LabRequest.query.count()
+
+
+@pytest.fixture
+def created(client):
+    ids = []
+    yield ids
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    for request_id in ids:
+        client.delete(f'/api/requests/{request_id}', headers=admin)
+
+
+def test_invalid_row_rejects_whole_batch(client, db):
+    before = request_count(db)
+
+    response = client.post('/api/requests/bulk', headers=login(client, 'user@mol.hu', 'mol123'), json={
+        'defaults': {'test_types': [1]},
+        'requests': [
+            {'internal_id': 'BULK-OK'},
+            {'internal_id': 'BULK-TT', 'test_types': [1, 999999]},
+            {'internal_id': 'BULK-DATE', 'deadline': 'holnap', 'colour': 'kék'},
+        ]
+    })
+
+    assert response.status_code == 400
+    errors = {(error['row'], error['field']) for error in response.get_json()['errors']}
+    assert errors == {(2, 'test_types'), (3, 'deadline'), (3, 'colour')}
+    assert request_count(db) == before
+
+
+def test_batch_numbers_are_unique_and_contiguous(client, db, created):
+    headers = login(client, 'user@mol.hu', 'mol123')
+    before = request_count(db)
+
+    response = client.post('/api/requests/bulk', headers=headers, json={
+        'defaults': {'test_types': '1|2'},
+        'requests': [{'internal_id': f'BULK-{i}'} for i in range(5)] + [{'internal_id': 'BULK-5', 'test_types': [2, 2]}]
+    })
+
+    assert response.status_code == 201
+    items = response.get_json()['requests']
+    created.extend(item['id'] for item in items)
+    numbers = [item['request_number'] for item in items]
+    assert len(set(numbers)) == len(numbers) == 6
+    sequences = [int(number.rsplit('-', 1)[1]) for number in numbers]
+    assert sequences == list(range(sequences[0], sequences[0] + 6))
+    assert request_count(db) == before + 6
+
+    links = [link.test_type_id for link in backend.LabRequestTestType.query.filter_by(lab_request_id=items[0]['id'])
+             .order_by(backend.LabRequestTestType.position)]
+    assert links == [1, 2]
+    assert backend.LabRequestTestType.query.filter_by(lab_request_id=items[5]['id']).count() == 1
+
+    # A következő (egyedi vagy tömeges) kérés a köteg utáni számot kapja
+    response = client.post('/api/requests/bulk', headers=headers, json=[{'internal_id': 'BULK-NEXT', 'test_types': [1]}])
+    assert response.status_code == 201
+    item = response.get_json()['requests'][0]
+    created.append(item['id'])
+    assert int(item['request_number'].rsplit('-', 1)[1]) == sequences[-1] + 1
+
+
+def test_csv_batch(client, db, created):
+    content = 'internal_id;test_types;urgency\nCSV-1;1|2;normal\nCSV-2;2;\n'
+
+    response = client.post('/api/requests/bulk', headers=login(client, 'user@mol.hu', 'mol123'), data={
+        'file': (io.BytesIO(content.encode('utf-8')), 'requests.csv')
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 201
+    items = response.get_json()['requests']
+    created.extend(item['id'] for item in items)
+    assert [item['internal_id'] for item in items] == ['CSV-1', 'CSV-2']
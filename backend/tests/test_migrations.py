@@ -0,0 +1,85 @@
+"""
+Adatmigráció tesztek - v8.4.3
+
+Migrációnként külön commit: egy hibás adatmigráció nem görgeti vissza a
+korábbiak módosításait és 'once' jelölőit; a jelölt migráció egyszer fut.
+"""
+
+import pytest
+
+import migrations
+
+
+def marker_exists(db, key):
+    return db.session.execute(db.text(
+        "SELECT 1 FROM config_version WHERE config_key = :key"
+    ), {'key': key}).fetchone() is not None
+
+
+def insert_config(key):
+    def apply(db):
+        db.session.execute(db.text("""
+            INSERT INTO config_version (config_key, version, updated_at)
+            VALUES (:key, 1, CURRENT_TIMESTAMP)
+        """), {'key': key})
+        return 1
+    return apply
+
+
+def fail(db):
+    db.session.execute(db.text("UPDATE config_version SET version = version WHERE 1 = 1"))
+    raise RuntimeError('hibás migráció')
+
+
+@pytest.fixture
+def data_migrations(db, monkeypatch):
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [])
+    monkeypatch.setattr(migrations, 'INDEX_MIGRATIONS', [])
+    yield lambda items: monkeypatch.setattr(migrations, 'DATA_MIGRATIONS', items)
+    db.session.execute(db.text("DELETE FROM config_version WHERE config_key LIKE 'test_migration:%'"))
+    db.session.commit()
+
+
+def test_failing_data_migration_keeps_earlier_ones(db, data_migrations):
+    data_migrations([
+        {'table': 'config_version', 'description': 'első', 'apply': insert_config('test_migration:first_row'),
+         'once': 'test_migration:first'},
+        {'table': 'config_version', 'description': 'hibás', 'apply': fail, 'once': 'test_migration:failing'},
+        {'table': 'config_version', 'description': 'utolsó', 'apply': insert_config('test_migration:last_row')},
+    ])
+
+    success, applied, errors = migrations.apply_migrations(db)
+
+    assert not success
+    assert len(errors) == 1
+    assert [item['description'] for item in applied] == ['első (1 rows)', 'utolsó (1 rows)']
+    db.session.rollback()
+    assert marker_exists(db, 'test_migration:first')
+    assert marker_exists(db, 'test_migration:first_row')
+    assert marker_exists(db, 'test_migration:last_row')
+    assert not marker_exists(db, 'test_migration:failing')
+
+
+def test_once_migration_runs_only_once(db, data_migrations):
+    calls = []
+
+    def apply(db):
+        calls.append(1)
+        return 0
+
+    data_migrations([
+        {'table': 'config_version', 'description': 'egyszeri', 'apply': apply, 'once': 'test_migration:once'},
+    ])
+
+    assert migrations.apply_migrations(db)[0]
+    assert migrations.apply_migrations(db)[0]
+    assert calls == [1]
+
+
+def test_backfills_are_marked_once():
+    # Teljes táblás backfill-ek: induláskor nem futhatnak újra
+    names = {migration['apply'].__name__: migration.get('once') for migration in migrations.DATA_MIGRATIONS}
+    assert names['backfill_lab_request_test_types']
+    assert names['backfill_lab_request_arrived_at']
+    assert names['backfill_lab_request_test_facts']
+    assert names['backfill_lab_request_status_events']
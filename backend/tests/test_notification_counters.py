@@ -0,0 +1,78 @@
+"""
+Olvasatlan számláló tesztek - v8.4.11
+
+Minden értesítés művelet után a notification_unread_counter egyezik a
+COUNT(*) WHERE is_read = 0 értékkel (létrehozás, olvasottnak jelölés,
+mind olvasott, törlés, lejárt értesítések törlése).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as backend
+from notification_service import NotificationService
+
+
+def create(event_type_id, user_id, message):
+    return NotificationService._create_in_app_notifications(
+        [user_id], event_type_id, message, None, None, {}
+    )[user_id]
+
+
+def unread(db, user_id):
+    return db.session.execute(db.text(
+        "SELECT COUNT(*) FROM notifications WHERE user_id = :id AND is_read = 0"
+    ), {'id': user_id}).scalar()
+
+
+def backdate(db, notification_id, days):
+    db.session.execute(db.text(
+        "UPDATE notifications SET created_at = :created_at WHERE id = :id"
+    ), {'created_at': datetime.utcnow() - timedelta(days=days), 'id': notification_id})
+
+
+@pytest.fixture
+def user_id(db):
+    return backend.User.query.filter_by(email='labor@pannon.hu').first().id
+
+
+@pytest.fixture
+def consistent(db, user_id, unread_counter_mismatches):
+    def check(expected_unread):
+        db.session.commit()
+        assert unread(db, user_id) == expected_unread
+        assert NotificationService.get_unread_count(user_id) == expected_unread
+        assert unread_counter_mismatches() == []
+    return check
+
+
+def test_counter_follows_every_operation(db, event_type_id, user_id, consistent):
+    NotificationService.mark_all_as_read(user_id)
+    consistent(0)
+
+    first, second, third, fourth = (create(event_type_id, user_id, f'számláló {i}') for i in range(4))
+    consistent(4)
+
+    NotificationService.mark_as_read(first, user_id)
+    NotificationService.mark_as_read(first, user_id)  # Ismételt jelölés nem csökkent újra
+    consistent(3)
+
+    NotificationService.delete_notification(first, user_id)  # Olvasott törlése
+    NotificationService.delete_notification(second, user_id)  # Olvasatlan törlése
+    NotificationService.delete_notification(second, user_id)
+    consistent(2)
+
+    NotificationService.delete_notification(third, user_id + 1)  # Más felhasználó nem törölheti
+    consistent(2)
+
+    NotificationService.mark_all_as_read(user_id)
+    consistent(0)
+
+    create(event_type_id, user_id, 'számláló 5')
+    backdate(db, fourth, 100)  # Olvasott, lejárt
+    backdate(db, create(event_type_id, user_id, 'számláló 6'), 100)  # Olvasatlan, lejárt
+    consistent(2)
+
+    NotificationService.purge_expired_notifications(read_days=30, unread_days=60, archive=False, pause_seconds=0)
+    consistent(1)
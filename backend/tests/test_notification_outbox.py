@@ -0,0 +1,72 @@
+"""
+Értesítés outbox tesztek - v8.4.6
+
+Törölt kérés sorba állított értesítései nem hoznak létre értesítést
+(PostgreSQL-en FK hiba lenne, SQLite-on árva sor és elcsúszott számláló).
+"""
+
+import json
+
+import pytest
+
+import app as backend
+from notification_service import NotificationService
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def create_draft(client, headers):
+    response = client.post('/api/requests', headers=headers, data={
+        'test_types': json.dumps([1]), 'internal_id': 'OUTBOX', 'status': 'draft'
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def outbox_rows(db, request_id):
+    return db.session.execute(db.text(
+        "SELECT status FROM notification_outbox WHERE request_id = :id AND event_key = 'test_event'"
+    ), {'id': request_id}).scalars().all()
+
+
+def test_delete_request_removes_pending_outbox_rows(client, db, event_type_id):
+    request_id = create_draft(client, login(client, 'user@mol.hu', 'mol123'))
+    NotificationService.notify('test_event', request_id=request_id, specific_users=[1])
+    db.session.commit()
+    assert outbox_rows(db, request_id) == ['pending']
+
+    response = client.delete(f'/api/requests/{request_id}', headers=login(client, 'admin@pannon.hu', 'admin123'))
+
+    assert response.status_code == 200
+    assert outbox_rows(db, request_id) == []
+
+
+def test_entry_for_deleted_request_is_skipped(client, db, event_type_id, unread_counter_mismatches):
+    request_id = create_draft(client, login(client, 'user@mol.hu', 'mol123'))
+    NotificationService.notify('test_event', request_id=request_id, specific_users=[1])
+    db.session.commit()
+    # A feldolgozó már felvette a sort, amikor a kérés törlődik
+    db.session.execute(db.text(
+        "UPDATE notification_outbox SET status = 'processing' WHERE request_id = :id AND event_key = 'test_event'"
+    ), {'id': request_id})
+    db.session.commit()
+    client.delete(f'/api/requests/{request_id}', headers=login(client, 'admin@pannon.hu', 'admin123'))
+    outbox_id = db.session.execute(db.text(
+        "SELECT id FROM notification_outbox WHERE request_id = :id AND event_key = 'test_event'"
+    ), {'id': request_id}).scalar()
+
+    NotificationService._process_outbox_entry(outbox_id)
+
+    assert outbox_rows(db, request_id) == ['done']
+    assert db.session.execute(db.text(
+        "SELECT COUNT(*) FROM notifications WHERE request_id = :id"
+    ), {'id': request_id}).scalar() == 0
+    assert unread_counter_mismatches() == []
@@ -0,0 +1,92 @@
+"""
+Értesítés megőrzés tesztek - v8.4.12
+
+Lejárt értesítések kötegelt törlése, archiválás, olvasatlan számlálók
+és a PostgreSQL partíció eldobás hónap kiválasztása.
+"""
+
+from datetime import datetime, timedelta
+
+from notification_service import NotificationService
+
+
+def create_notifications(db, event_type_id, user_id, ages):
+    """Értesítések megadott korral: [(napok, olvasott-e)] -> id lista"""
+    now = datetime.utcnow()
+    ids = []
+    for days, is_read in ages:
+        notification_id = NotificationService._create_in_app_notifications(
+            [user_id], event_type_id, f'{days} napos', None, None, {}
+        )[user_id]
+        created_at = now - timedelta(days=days)
+        db.session.execute(db.text(
+            "UPDATE notifications SET created_at = :created_at WHERE id = :id"
+        ), {'created_at': created_at, 'id': notification_id})
+        if is_read:
+            db.session.execute(db.text(
+                "UPDATE notifications SET is_read = 1, read_at = :created_at WHERE id = :id"
+            ), {'created_at': created_at, 'id': notification_id})
+            NotificationService.adjust_unread_counters({user_id: -1})
+        ids.append(notification_id)
+    db.session.commit()
+    return ids
+
+
+def remaining(db, ids):
+    return set(db.session.execute(
+        db.text("SELECT id FROM notifications WHERE id IN :ids").bindparams(db.bindparam('ids', expanding=True)),
+        {'ids': ids}
+    ).scalars())
+
+
+def archived(db, ids):
+    return set(db.session.execute(
+        db.text("SELECT id FROM notifications_archive WHERE id IN :ids").bindparams(db.bindparam('ids', expanding=True)),
+        {'ids': ids}
+    ).scalars())
+
+
+def test_defaults_keep_everything(db, event_type_id):
+    settings = NotificationService.retention_settings()
+    assert settings['read_days'] == 0 and settings['unread_days'] == 0
+
+    ids = create_notifications(db, event_type_id, 1, [(1000, True), (1000, False)])
+    stats = NotificationService.purge_expired_notifications()
+
+    assert stats['deleted'] == 0
+    assert remaining(db, ids) == set(ids)
+
+
+def test_purge_deletes_expired_in_batches_and_archives(db, event_type_id, unread_counter_mismatches):
+    old_read, new_read, old_unread, new_unread, older_read = create_notifications(
+        db, event_type_id, 2, [(40, True), (5, True), (70, False), (50, False), (45, True)]
+    )
+
+    stats = NotificationService.purge_expired_notifications(
+        read_days=30, unread_days=60, archive=True, batch_size=2, pause_seconds=0
+    )
+
+    ids = [old_read, new_read, old_unread, new_unread, older_read]
+    assert remaining(db, ids) == {new_read, new_unread}
+    assert archived(db, ids) == {old_read, old_unread, older_read}
+    assert stats['deleted'] >= 3 and stats['batches'] >= 2
+    assert unread_counter_mismatches() == []
+
+
+def test_purge_without_archive(db, event_type_id, unread_counter_mismatches):
+    ids = create_notifications(db, event_type_id, 3, [(400, False), (400, True)])
+    archive_size = db.session.execute(db.text("SELECT COUNT(*) FROM notifications_archive")).scalar()
+
+    NotificationService.purge_expired_notifications(read_days=30, unread_days=60, archive=False, pause_seconds=0)
+
+    assert remaining(db, ids) == set()
+    assert db.session.execute(db.text("SELECT COUNT(*) FROM notifications_archive")).scalar() == archive_size
+    assert unread_counter_mismatches() == []
+
+
+def test_only_past_month_partitions_are_dropped():
+    names = ['notifications_p202610', 'notifications_p202608', 'notifications_p202611', 'notifications_p202609']
+
+    past = NotificationService._past_partitions(names, datetime(2026, 10, 17))
+
+    assert past == ['notifications_p202608', 'notifications_p202609']
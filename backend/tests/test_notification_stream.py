@@ -0,0 +1,61 @@
+"""
+SSE értesítés stream tesztek - v8.4.10
+
+A nyitott streamek száma korlátos (SSE_MAX_STREAMS): a limit feletti kliens
+503 + Retry-After választ kap, a lezárt stream felszabadítja a helyét.
+"""
+
+import threading
+
+import pytest
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+@pytest.fixture
+def stream_limit(monkeypatch):
+    monkeypatch.setattr(backend, '_sse_slots', threading.BoundedSemaphore(2))
+    return 2
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return response.get_json()['token']
+
+
+def open_stream(client, token):
+    return client.get(f'/api/notifications/stream?token={token}', buffered=False)
+
+
+def test_streams_over_limit_get_503(client, stream_limit):
+    token = login(client, 'admin@pannon.hu', 'admin123')
+    streams = [open_stream(client, token) for _ in range(stream_limit)]
+    try:
+        assert all(stream.status_code == 200 for stream in streams)
+        assert next(streams[0].response) == b'retry: 5000\n\n'
+
+        rejected = open_stream(client, token)
+        assert rejected.status_code == 503
+        assert rejected.headers['Retry-After'] == '60'
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def test_closed_stream_frees_slot(client, stream_limit):
+    token = login(client, 'admin@pannon.hu', 'admin123')
+    streams = [open_stream(client, token) for _ in range(stream_limit)]
+    streams.pop().close()  # El sem indult generátor is felszabadít
+
+    replacement = open_stream(client, token)
+    try:
+        assert replacement.status_code == 200
+    finally:
+        replacement.close()
+        for stream in streams:
+            stream.close()
@@ -0,0 +1,93 @@
+"""
+Eredmény PDF cache tesztek - v8.4.17
+
+A PDF-be írt melléklet linkek felhasználótól független link tokent
+hordoznak: a cache kulcs (ETag) minden jogosult felhasználónak azonos, a
+PDF-be nem kerül bejelentkezési token, és a link token csak a saját
+eredményére érvényes.
+"""
+
+import json
+
+import jwt
+import pytest
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+@pytest.fixture
+def completed_request(client, db, tmp_path, monkeypatch):
+    """Lezárt kérés egy melléklettel rendelkező eredménnyel"""
+    monkeypatch.setitem(backend.app.config, 'RESULT_ATTACHMENT_FOLDER', str(tmp_path))
+    (tmp_path / 'eredmeny.txt').write_text('mérési eredmény')
+    response = client.post('/api/requests', headers=login(client, 'user@mol.hu', 'mol123'), data={
+        'test_types': json.dumps([1, 2]), 'internal_id': 'PDF-CACHE', 'status': 'draft'
+    })
+    assert response.status_code == 201
+    request_id = response.get_json()['id']
+    lab_request = db.session.get(backend.LabRequest, request_id)
+    lab_request.status = 'completed'
+    results = backend.TestResult.query.filter_by(lab_request_id=request_id).order_by(backend.TestResult.id).all()
+    results[0].attachment_filename = 'eredmeny.txt'
+    results[0].result_text = 'Megfelelő'
+    db.session.commit()
+    yield request_id, [result.id for result in results]
+    client.delete(f'/api/requests/{request_id}', headers=login(client, 'admin@pannon.hu', 'admin123'))
+
+
+def test_pdf_cache_key_is_shared_and_has_no_bearer_token(client, completed_request):
+    request_id, _ = completed_request
+    responses = {}
+    for email, password in (('user@mol.hu', 'mol123'), ('admin@mol.hu', 'mol123'), ('admin@pannon.hu', 'admin123')):
+        headers = login(client, email, password)
+        response = client.get(f'/api/requests/{request_id}/pdf', headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/pdf'
+        assert headers['Authorization'][7:].encode() not in response.data
+        responses[email] = response
+
+    assert len({response.headers['ETag'] for response in responses.values()}) == 1
+    assert len({response.data for response in responses.values()}) == 1
+
+    # Ugyanaz az ETag más felhasználótól: 304 renderelés nélkül
+    etag = responses['user@mol.hu'].headers['ETag']
+    response = client.get(f'/api/requests/{request_id}/pdf', headers={
+        **login(client, 'labor@pannon.hu', 'labor123'), 'If-None-Match': etag
+    })
+    assert response.status_code == 304
+
+
+def test_snapshot_links_use_link_token(client, db, completed_request):
+    request_id, result_ids = completed_request
+    with backend.app.test_request_context('/', headers=login(client, 'admin@pannon.hu', 'admin123')):
+        results = backend.build_request_results_snapshot(db.session.get(backend.LabRequest, request_id))
+
+    url = next(result['attachment_url'] for result in results if result['attachment_url'])
+    assert url.startswith(f'http://localhost/api/test-results/{result_ids[0]}/attachment?link=')
+    data = jwt.decode(url.split('link=', 1)[1], backend.app.config['SECRET_KEY'], algorithms=['HS256'])
+    assert data['scope'] == 'result_attachment' and 'user_id' not in data
+
+
+def test_attachment_link_token(client, completed_request):
+    _, (result_id, other_result_id) = completed_request
+    with backend.app.app_context():
+        link = backend.attachment_link_token(result_id)
+
+    response = client.get(f'/api/test-results/{result_id}/attachment?link={link}')
+    assert response.status_code == 200
+    assert response.data == 'mérési eredmény'.encode('utf-8')
+
+    # Másik eredményre, hamisított vagy bejelentkezési tokenként nem érvényes
+    assert client.get(f'/api/test-results/{other_result_id}/attachment?link={link}').status_code == 401
+    assert client.get(f'/api/test-results/{result_id}/attachment?link={link[:-2]}xx').status_code == 401
+    assert client.get('/api/auth/me', headers={'Authorization': f'Bearer {link}'}).status_code == 401
@@ -0,0 +1,67 @@
+"""
+PDF render pool tesztek - v8.4.19
+
+A pool nem fork-olt (forkserver / spawn) processzekben renderel, a gyerek
+processz megkapja a QR cache beállítást, elhalt processz után a halott pool
+leáll és új pool indul.
+"""
+
+import os
+
+import pytest
+
+import pdf_rendering
+import pdf_service
+
+
+def _child_state(_):
+    """Gyerek processzben fut: PID, QR cache mappa"""
+    return os.getpid(), pdf_rendering.qr_images.folder
+
+
+def _crash(_):
+    os._exit(1)
+
+
+def _reset_executor():
+    executor = pdf_service._executor
+    if executor is not None:
+        executor.shutdown(wait=True)
+    pdf_service._executor = None
+
+
+@pytest.fixture
+def pool(tmp_path):
+    settings = dict(pdf_service._settings)
+    _reset_executor()  # Más teszt (pl. PDF végpont) által indított pool a korábbi beállításokkal
+    pdf_service.configure(1, 4, 60, str(tmp_path / 'qr'), 16)
+    yield tmp_path
+    _reset_executor()
+    pdf_service.configure(settings['workers'], settings['max_pending'], settings['timeout'], *settings['qr_cache'])
+
+
+def test_pool_does_not_fork_the_web_process(pool):
+    pid, qr_folder = pdf_service.run(_child_state, None)
+
+    assert pid != os.getpid()
+    assert pdf_service._executor._mp_context.get_start_method() in ('forkserver', 'spawn')
+    assert qr_folder == str(pool / 'qr')
+
+
+def test_broken_pool_is_shut_down_and_replaced(pool):
+    pdf_service.run(_child_state, None)
+    broken = pdf_service._executor
+
+    with pytest.raises(Exception):
+        pdf_service.run(_crash, None)
+
+    assert broken._shutdown_thread
+    assert pdf_service._executor is not broken
+    pid, _ = pdf_service.run(_child_state, None)
+    assert pid != os.getpid()
+
+
+def test_render_in_pool(pool):
+    data = pdf_service.run(pdf_rendering.render_label_sheet, [])
+
+    assert data.startswith(b'%PDF')
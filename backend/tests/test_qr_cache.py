@@ -0,0 +1,64 @@
+"""
+QR kép cache tesztek - v8.4.20
+
+Memória találat, lemez találat (új processz / törölt memória után), LRU
+kiszorítás és lemez nélküli működés.
+"""
+
+import os
+
+from qr_cache import QrImageCache, make_qr_png
+
+PAYLOAD = 'https://lab.example.com/logistics/scan?request=MOLN-20261018-001'
+
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = QrImageCache(str(tmp_path), max_items=8)
+
+    data = cache.get(PAYLOAD)
+    assert data == make_qr_png(PAYLOAD)
+    assert data.startswith(b'\x89PNG')
+    assert cache.stats() == {'memory_items': 1, 'hits': 0, 'disk_hits': 0, 'misses': 1}
+    files = [os.path.join(root, name) for root, _, names in os.walk(tmp_path) for name in names]
+    assert len(files) == 1 and files[0].endswith('.png')
+
+    assert cache.get(PAYLOAD) is data
+    assert cache.stats()['hits'] == 1
+
+    # Másik processz / újraindítás: üres memória, a lemezről olvas
+    other = QrImageCache(str(tmp_path), max_items=8)
+    assert other.get(PAYLOAD) == data
+    assert other.stats() == {'memory_items': 1, 'hits': 0, 'disk_hits': 1, 'misses': 0}
+
+
+def test_size_and_border_are_part_of_the_key(tmp_path):
+    cache = QrImageCache(str(tmp_path))
+
+    small = cache.get(PAYLOAD, box_size=4)
+    large = cache.get(PAYLOAD, box_size=10, border=4)
+
+    assert small != large
+    assert cache.stats()['misses'] == 2
+
+
+def test_memory_is_lru_bounded(tmp_path):
+    cache = QrImageCache(str(tmp_path), max_items=2)
+
+    for index in range(3):
+        cache.get(f'{PAYLOAD}{index}')
+    cache.get(f'{PAYLOAD}0')
+
+    assert cache.stats()['memory_items'] == 2
+    assert cache.stats()['disk_hits'] == 1  # A kiszorított elem a lemezről jön vissza
+
+
+def test_without_folder(tmp_path):
+    cache = QrImageCache(None)
+
+    assert cache.get(PAYLOAD) == cache.get(PAYLOAD)
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 1
+
+    cache.configure(str(tmp_path), 4)
+    assert cache.stats()['memory_items'] == 0
+    cache.get(PAYLOAD)
+    assert any(names for _, _, names in os.walk(tmp_path))
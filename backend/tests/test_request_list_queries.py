@@ -0,0 +1,109 @@
+"""
+Kéréslista lekérdezésszám tesztek - v8.4.1
+
+A GET /api/requests batch szerializációja (serialize_request_list) a lista
+méretétől függetlenül fix számú SQL lekérdezéssel fut: a tesztkérések,
+felhasználók, cégek, kategóriák egy-egy IN lekérdezéssel töltődnek.
+"""
+
+import json
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+@contextmanager
+def count_queries():
+    """SQL lekérdezések számlálása (before_cursor_execute)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with backend.app.app_context():
+        engine = backend.db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture(scope='module')
+def admin_headers(client):
+    # Eltérő tesztkérés kombinációk, hogy a lista több hivatkozott sort töltsön be
+    user_headers = login(client, 'user@mol.hu', 'mol123')
+    for i in range(12):
+        response = client.post('/api/requests', headers=user_headers, data={
+            'test_types': json.dumps([1 + i % 3, 2 + i % 4]),
+            'internal_id': f'QC-{i}',
+            'status': 'draft'
+        })
+        assert response.status_code == 201, response.get_json()
+    return login(client, 'admin@pannon.hu', 'admin123')
+
+
+def list_query_count(client, headers, limit):
+    with count_queries() as statements:
+        response = client.get(f'/api/requests?limit={limit}', headers=headers)
+    assert response.status_code == 200
+    return len(response.get_json()), len(statements)
+
+
+def test_request_list_query_count_is_constant(client, admin_headers):
+    list_query_count(client, admin_headers, 1)  # Cache-ek (konfiguráció, token) bemelegítése
+
+    small_rows, small_queries = list_query_count(client, admin_headers, 2)
+    large_rows, large_queries = list_query_count(client, admin_headers, 12)
+
+    assert small_rows == 2
+    assert large_rows == 12
+    assert small_queries == large_queries
+
+
+def test_request_list_without_limit_uses_same_query_count(client, admin_headers):
+    list_query_count(client, admin_headers, 1)
+    _, limited_queries = list_query_count(client, admin_headers, 5)
+
+    with count_queries() as statements:
+        response = client.get('/api/requests', headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) > 5
+    assert len(statements) == limited_queries
+
+
+@pytest.fixture(scope='module')
+def like_requests(client):
+    """Kérések LIKE speciális karakterekkel (%, _, \\) az azonosítóban"""
+    user_headers = login(client, 'user@mol.hu', 'mol123')
+    for internal_id in ('LIKE_1', 'LIKE%2', 'LIKEX3', 'LIKE\\4'):
+        response = client.post('/api/requests', headers=user_headers, data={
+            'test_types': json.dumps([1]), 'internal_id': internal_id, 'status': 'draft'
+        })
+        assert response.status_code == 201
+
+
+@pytest.mark.parametrize('search, expected', [
+    ('like_', {'LIKE_1'}),
+    ('like%', {'LIKE%2'}),
+    ('ke\\', {'LIKE\\4'}),
+    ('like', {'LIKE_1', 'LIKE%2', 'LIKEX3', 'LIKE\\4'}),
+])
+def test_search_matches_like_wildcards_literally(client, admin_headers, like_requests, search, expected):
+    response = client.get('/api/requests', headers=admin_headers, query_string={'search': search})
+
+    assert response.status_code == 200
+    assert {item['internal_id'] for item in response.get_json()} == expected
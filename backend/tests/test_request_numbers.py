@@ -0,0 +1,65 @@
+"""
+Kérésszám kiosztás tesztek - v8.4.14
+
+Párhuzamos szálak ugyanarra a napi számlálóra foglalnak sorszámot
+(next_request_sequence, szálanként saját session / tranzakció): nincs
+duplikált és nincs kihagyott sorszám.
+"""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import app as backend
+
+THREADS = 8
+PER_THREAD = 25
+
+
+def allocate(short, day, count=1):
+    with backend.app.app_context():
+        try:
+            value = backend.next_request_sequence(short, day, f"{short}-{day:%Y%m%d}-", count)
+            backend.db.session.commit()
+            return list(range(value - count + 1, value + 1))
+        finally:
+            backend.db.session.remove()
+
+
+def allocate_many(short, day, counts):
+    values = []
+    for count in counts:
+        values.extend(allocate(short, day, count))
+    return values
+
+
+def run_concurrently(short, day, counts):
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = pool.map(lambda _: allocate_many(short, day, counts), range(THREADS))
+        return [value for values in results for value in values]
+
+
+def test_concurrent_allocation_has_no_duplicates_or_gaps():
+    values = run_concurrently('STR', datetime.date(2026, 1, 5), [1] * PER_THREAD)
+
+    assert len(values) == THREADS * PER_THREAD
+    assert sorted(values) == list(range(1, THREADS * PER_THREAD + 1))
+
+
+def test_concurrent_block_allocation_has_no_overlap():
+    # Tömeges létrehozás: egy hívás több sorszámot foglal
+    values = run_concurrently('BLK', datetime.date(2026, 1, 5), [3, 1, 5] * 4)
+
+    assert sorted(values) == list(range(1, len(values) + 1))
+
+
+def test_sequence_continues_after_existing_request_numbers(db):
+    day = datetime.date(2026, 1, 6)
+    request = backend.LabRequest.query.first()
+    original = request.request_number
+    request.request_number = f"OLD-{day:%Y%m%d}-041"
+    db.session.commit()
+    try:
+        assert allocate('OLD', day) == [42]
+    finally:
+        request.request_number = original
+        db.session.commit()
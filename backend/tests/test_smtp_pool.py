@@ -0,0 +1,197 @@
+"""
+SMTP kapcsolat pool tesztek - v8.4.7
+
+Helyi SMTP stub szerverrel (socketserver szál): kapcsolatok száma, kapcsolat
+újrahasznosítás kötegen belül és kötegek között, újracsatlakozás szerver
+oldali bontás után, illetve a levelek tényleges kézbesítése.
+"""
+
+import socketserver
+import threading
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import notification_service
+from notification_service import EmailDeliveryError, NotificationService, SMTPConnectionPool
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimális SMTP párbeszéd (EHLO/HELO, MAIL, RCPT, DATA, NOOP, RSET, QUIT)"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        stub = self.server
+        with stub.lock:
+            stub.connections += 1
+            stub.open_sockets.append(self.connection)
+        delivered_here = 0
+        recipients = []
+
+        self.reply('220 stub ESMTP')
+        for raw in self.rfile:
+            command = raw.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stub')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip(' <>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                with stub.lock:
+                    stub.messages.extend(recipients)
+                self.reply('250 Queued')
+                delivered_here += 1
+                if stub.drop_after and delivered_here >= stub.drop_after:
+                    return  # Szerver oldali bontás (pl. üzenetszám limit)
+            elif verb == 'NOOP' or verb == 'RSET':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubSMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []  # Kézbesített címzettek, sorrendben
+        self.open_sockets = []
+        self.drop_after = None
+
+    def drop_connections(self):
+        """Minden nyitott kapcsolat bontása (pl. szerver újraindítás / idle timeout)"""
+        with self.lock:
+            sockets, self.open_sockets = self.open_sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(2)
+                sock.close()
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def smtp_server():
+    server = StubSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.drop_connections()
+    server.server_close()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = SMTPConnectionPool(timeout=5)
+    monkeypatch.setattr(notification_service, '_smtp_pool', pool)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    # _send_via_smtp a current_app loggerét használja
+    with Flask(__name__).app_context():
+        yield
+
+
+def smtp_key(server):
+    host, port = server.server_address
+    return (host, port, None, None, 0)
+
+
+def build_messages(count, start=1):
+    return [
+        (SimpleNamespace(id=user_id, email=f"user{user_id}@example.com"), f"Tárgy {user_id}", "<p>Törzs</p>")
+        for user_id in range(start, start + count)
+    ]
+
+
+def send(server, messages):
+    NotificationService._send_via_smtp(smtp_key(server), 'noreply@example.com', 'Labor', messages)
+
+
+def test_batch_uses_single_connection(smtp_server, pool):
+    send(smtp_server, build_messages(5))
+
+    assert smtp_server.connections == 1
+    assert smtp_server.messages == [f"user{i}@example.com" for i in range(1, 6)]
+
+
+def test_connection_reused_across_batches(smtp_server, pool):
+    send(smtp_server, build_messages(2))
+    send(smtp_server, build_messages(3, start=3))
+
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 5
+
+
+def test_reconnects_when_server_drops_mid_batch(smtp_server, pool):
+    smtp_server.drop_after = 2
+
+    send(smtp_server, build_messages(3))
+
+    # 2 levél után bont a szerver - új kapcsolaton megy ki a harmadik, duplikáció nélkül
+    assert smtp_server.connections == 2
+    assert smtp_server.messages == [f"user{i}@example.com" for i in range(1, 4)]
+
+
+def test_reconnects_when_idle_connection_dropped(smtp_server, pool):
+    send(smtp_server, build_messages(1))
+    smtp_server.drop_connections()
+
+    send(smtp_server, build_messages(1, start=2))
+
+    # A pool-ban álló kapcsolat NOOP ellenőrzése elbukik, új kapcsolat nyílik
+    assert smtp_server.connections == 2
+    assert smtp_server.messages == ['user1@example.com', 'user2@example.com']
+
+
+def test_unreachable_server_raises_for_retry(smtp_server, pool):
+    key = smtp_key(smtp_server)
+    smtp_server.shutdown()
+    smtp_server.server_close()
+
+    with pytest.raises(EmailDeliveryError) as error:
+        NotificationService._send_via_smtp(key, 'noreply@example.com', 'Labor', build_messages(2))
+
+    assert error.value.sent_user_ids == set()
+
+
+def test_failure_after_partial_batch_reports_sent_users(smtp_server, pool, monkeypatch):
+    smtp_server.drop_after = 1
+    connect = pool._connect
+    attempts = []
+
+    def connect_once(key):
+        # Az első bontás után a szerver elérhetetlen
+        attempts.append(key)
+        if len(attempts) > 1:
+            raise ConnectionRefusedError('stub down')
+        return connect(key)
+
+    monkeypatch.setattr(pool, '_connect', connect_once)
+
+    with pytest.raises(EmailDeliveryError) as error:
+        send(smtp_server, build_messages(3))
+
+    assert smtp_server.messages == ['user1@example.com']
+    assert error.value.sent_user_ids == {1}
@@ -0,0 +1,103 @@
+"""
+Dashboard statisztika tesztek - v8.4.23
+
+A /api/stats (lab_request_stats rollup) minden szerepkör láthatóságában
+egyezik a lab_request táblán számolt nyers összesítéssel, a 'submitted'
+státusz az 'arrived_at_provider' alá összevonva.
+"""
+
+import pytest
+
+import app as backend
+
+USERS = {
+    'super_admin': ('admin@pannon.hu', 'admin123'),
+    'labor_staff': ('labor@pannon.hu', 'labor123'),
+    'company_admin': ('admin@mol.hu', 'mol123'),
+    'company_user': ('user@mol.hu', 'mol123'),
+}
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def raw_stats(db, email):
+    """Összesítés közvetlenül a lab_request táblából (a get_stats láthatósági szabályaival)"""
+    user = backend.User.query.filter_by(email=email).first()
+    query = backend.LabRequest.query
+    if user.role == 'company_admin':
+        query = query.filter_by(company_id=user.company_id)
+    elif user.role == 'company_user':
+        query = query.filter_by(user_id=user.id)
+
+    categories = dict(db.session.query(backend.RequestCategory.id, backend.RequestCategory.name).all())
+    stats = {'total_requests': 0, 'by_status': {}, 'by_category': {}, 'total_revenue': 0, 'revenue_by_status': {}}
+    for lab_request in query:
+        status = 'arrived_at_provider' if lab_request.status == 'submitted' else lab_request.status
+        price = lab_request.total_price or 0
+        stats['total_requests'] += 1
+        stats['total_revenue'] += price
+        stats['by_status'][status] = stats['by_status'].get(status, 0) + 1
+        stats['revenue_by_status'][status] = stats['revenue_by_status'].get(status, 0) + price
+        if lab_request.category_id in categories:
+            name = categories[lab_request.category_id]
+            stats['by_category'][name] = stats['by_category'].get(name, 0) + 1
+    return stats
+
+
+@pytest.fixture
+def extra_requests(db):
+    """Legacy 'submitted' és kategória nélküli kérés, két felhasználótól (ORM - a rollup eseményekkel)"""
+    company_admin = backend.User.query.filter_by(email='admin@mol.hu').first()
+    company_user = backend.User.query.filter_by(email='user@mol.hu').first()
+    category_id = db.session.query(backend.RequestCategory.id).first()[0]
+    requests = [
+        backend.LabRequest(user_id=company_admin.id, company_id=1, sample_id='STATS-1', test_types='[]', status='submitted',
+                           category_id=category_id, total_price=1500.5),
+        backend.LabRequest(user_id=company_user.id, company_id=1, sample_id='STATS-2', test_types='[]', status='submitted',
+                           total_price=2500),
+        backend.LabRequest(user_id=company_user.id, company_id=1, sample_id='STATS-3', test_types='[]', status='completed',
+                           category_id=category_id, total_price=None),
+    ]
+    db.session.add_all(requests)
+    db.session.commit()
+    yield requests
+    for lab_request in requests:
+        db.session.delete(lab_request)
+    db.session.commit()
+
+
+@pytest.mark.parametrize('role', sorted(USERS))
+def test_rollup_matches_raw_aggregate(client, db, extra_requests, role):
+    email, password = USERS[role]
+
+    response = client.get('/api/stats', headers=login(client, email, password))
+
+    assert response.status_code == 200
+    stats = response.get_json()
+    expected = raw_stats(db, email)
+    assert 'submitted' not in stats['by_status']
+    assert stats['by_status'] == expected['by_status']
+    assert stats['by_category'] == expected['by_category']
+    assert stats['total_requests'] == expected['total_requests']
+    assert stats['total_revenue'] == pytest.approx(expected['total_revenue'])
+    assert stats['revenue_by_status'] == pytest.approx(expected['revenue_by_status'])
+
+
+def test_rollup_follows_status_change_and_delete(client, db, extra_requests):
+    headers = login(client, 'admin@pannon.hu', 'admin123')
+    extra_requests[0].status = 'in_progress'
+    extra_requests[1].total_price = 4000
+    db.session.commit()
+
+    stats = client.get('/api/stats', headers=headers).get_json()
+    expected = raw_stats(db, 'admin@pannon.hu')
+    assert stats['by_status'] == expected['by_status']
+    assert stats['total_revenue'] == pytest.approx(expected['total_revenue'])
@@ -0,0 +1,109 @@
+"""
+Streamelt export tesztek - v8.4.21
+
+CSV (BOM, képlet injekció védelem) és XLSX (openpyxl-lel visszaolvasva)
+tartalom és mimetype, kérés és eredmény szinten.
+"""
+
+import csv
+import hashlib
+import io
+import json
+
+import openpyxl
+import pytest
+
+import app as backend
+import streaming_export
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+@pytest.fixture
+def request_id(client):
+    response = client.post('/api/requests', headers=login(client, 'user@mol.hu', 'mol123'), data={
+        'test_types': json.dumps([1, 2]), 'internal_id': '=HYPERLINK("x")', 'status': 'draft'
+    })
+    assert response.status_code == 201
+    request_id = response.get_json()['id']
+    yield request_id
+    client.delete(f'/api/requests/{request_id}', headers=login(client, 'admin@pannon.hu', 'admin123'))
+
+
+def read_csv(response):
+    assert response.data.startswith('﻿'.encode('utf-8'))
+    return list(csv.reader(io.StringIO(response.data.decode('utf-8-sig'))))
+
+
+def read_xlsx(response):
+    sheet = openpyxl.load_workbook(io.BytesIO(response.data), read_only=True).active
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def test_request_export_csv(client, request_id):
+    response = client.get('/api/export/requests?format=csv', headers=login(client, 'admin@pannon.hu', 'admin123'))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'].endswith('.csv')
+    rows = read_csv(response)
+    assert rows[0] == backend.REQUEST_EXPORT_HEADER
+    row = next(row for row in rows[1:] if row[0] == str(request_id))
+    assert row[2] == '\'=HYPERLINK("x")'
+    assert row[14] == '2'
+    with backend.app.app_context():
+        assert len(rows) - 1 == backend.LabRequest.query.count()
+
+
+def test_result_export_xlsx(client, request_id):
+    response = client.get('/api/export/test-results?format=excel', headers=login(client, 'admin@pannon.hu', 'admin123'))
+
+    assert response.status_code == 200
+    assert response.mimetype == XLSX_MIMETYPE
+    assert response.headers['Content-Disposition'].endswith('.xlsx')
+    rows = read_xlsx(response)
+    assert rows[0] == backend.RESULT_EXPORT_HEADER
+    own = [row for row in rows[1:] if row[0] == request_id]
+    assert [row[6] for row in own] == [1, 2]
+    assert all(row[10] == 'pending' for row in own)
+
+
+def test_company_admin_sees_only_own_company(client, request_id):
+    response = client.get('/api/export/requests?format=xlsx', headers=login(client, 'admin@mol.hu', 'mol123'))
+
+    assert response.status_code == 200
+    with backend.app.app_context():
+        company_name = backend.db.session.get(backend.Company, 1).name
+    assert {row[6] for row in read_xlsx(response)[1:]} == {company_name}
+
+
+def test_invalid_format_and_role(client):
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    assert client.get('/api/export/requests?format=pdf', headers=admin).status_code == 400
+    assert client.get('/api/export/requests', headers=login(client, 'user@mol.hu', 'mol123')).status_code == 403
+
+
+def test_xlsx_stream_is_chunked(monkeypatch):
+    monkeypatch.setattr(streaming_export, 'FLUSH_BYTES', 1024)
+    # Rosszul tömöríthető tartalom, hogy a deflate kimenete menet közben is megjelenjen
+    rows = ([index, hashlib.sha256(str(index).encode()).hexdigest(), None, index * 1.5, True] for index in range(5000))
+
+    chunks = list(streaming_export.xlsx_stream('Munkalap', ['a', 'b', 'c', 'd', 'e'], rows))
+
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks[1:-1]) < 64 * 1024
+    sheet = openpyxl.load_workbook(io.BytesIO(b''.join(chunks)), read_only=True).active
+    values = list(sheet.iter_rows(values_only=True))
+    assert len(values) == 5001
+    assert values[-1] == (4999, hashlib.sha256(b'4999').hexdigest(), None, 7498.5, True)
@@ -0,0 +1,144 @@
+"""
+Vizsgálattípus végpont tesztek - v8.4
+
+Kérésben használt vizsgálattípus nem törölhető (409), a nem hivatkozott igen.
+v8.4.22: Import - validálás, diff, kötegelt upsert; a 0 ár 0 marad.
+"""
+
+import io
+import json
+
+import openpyxl
+import pytest
+
+import app as backend
+
+
+@pytest.fixture(scope='module')
+def client():
+    return backend.app.test_client()
+
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def create_test_type(db, name):
+    test_type = backend.TestType(name=name, price=1000)
+    db.session.add(test_type)
+    db.session.commit()
+    return test_type.id
+
+
+def test_delete_linked_test_type_is_rejected(client, db):
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    test_type_id = create_test_type(db, 'Törlés teszt - hivatkozott')
+    response = client.post('/api/requests', headers=login(client, 'user@mol.hu', 'mol123'), data={
+        'test_types': json.dumps([test_type_id]), 'internal_id': 'DELETE-TT', 'status': 'draft'
+    })
+    assert response.status_code == 201
+    request_id = response.get_json()['id']
+
+    response = client.delete(f'/api/test-types/{test_type_id}', headers=admin)
+
+    assert response.status_code == 409
+    assert backend.db.session.get(backend.TestType, test_type_id) is not None
+    client.delete(f'/api/requests/{request_id}', headers=admin)
+
+
+def test_delete_unused_test_type(client, db):
+    test_type_id = create_test_type(db, 'Törlés teszt - szabad')
+
+    response = client.delete(f'/api/test-types/{test_type_id}', headers=login(client, 'admin@pannon.hu', 'admin123'))
+
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(backend.TestType, test_type_id) is None
+
+
+def import_file(client, headers, filename, content, dry_run=False):
+    return client.post(f'/api/import/test-types?dry_run={str(dry_run).lower()}', headers=headers, data={
+        'file': (io.BytesIO(content), filename)
+    }, content_type='multipart/form-data')
+
+
+@pytest.fixture
+def imported_names(db):
+    names = []
+    yield names
+    db.session.rollback()
+    backend.TestType.query.filter(backend.TestType.name.in_(names)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def test_import_upserts_in_bulk(client, db, imported_names):
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    existing = create_test_type(db, 'Import teszt - meglévő')
+    imported_names.extend(['Import teszt - meglévő', 'Import teszt - új', 'Import teszt - ingyenes'])
+    content = (
+        'id,name,description,price,cost_price,sample_prep_required\n'
+        f'{existing},Import teszt - meglévő,Frissített leírás,1000,,igen\n'
+        ',Import teszt - új,,2500,"1200,5",nem\n'
+        ',Import teszt - ingyenes,,0,0,\n'
+        ',Import teszt - hibás,,abc,,\n'
+    ).encode('utf-8')
+
+    preview = import_file(client, admin, 'test_types.csv', content, dry_run=True)
+    assert preview.status_code == 200
+    assert (preview.get_json()['created'], preview.get_json()['updated']) == (2, 1)
+    db.session.expire_all()
+    assert backend.TestType.query.filter_by(name='Import teszt - új').count() == 0
+
+    response = import_file(client, admin, 'test_types.csv', content)
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['created'], result['updated'], result['unchanged']) == (2, 1, 0)
+    assert len(result['errors']) == 1 and 'price' in result['errors'][0]
+    db.session.expire_all()
+    updated = db.session.get(backend.TestType, existing)
+    assert updated.description == 'Frissített leírás' and updated.sample_prep_required is True
+    created = backend.TestType.query.filter_by(name='Import teszt - új').one()
+    assert (created.price, created.cost_price) == (2500, 1200.5)
+    free = backend.TestType.query.filter_by(name='Import teszt - ingyenes').one()
+    assert (free.price, free.cost_price) == (0, 0)
+
+    # Ugyanaz a fájl újra: nincs változás
+    result = import_file(client, admin, 'test_types.csv', content).get_json()
+    assert (result['created'], result['updated'], result['unchanged']) == (0, 0, 3)
+
+
+def test_export_import_round_trip_keeps_zero_prices(client, db, imported_names):
+    admin = login(client, 'admin@pannon.hu', 'admin123')
+    imported_names.append('Import teszt - nulla ár')
+    test_type_id = create_test_type(db, 'Import teszt - nulla ár')
+    db.session.get(backend.TestType, test_type_id).price = 0
+    db.session.commit()
+
+    exported = client.get('/api/export/test-types?format=json', headers=admin)
+    assert exported.status_code == 200
+    item = next(item for item in exported.get_json()['test_types'] if item['id'] == test_type_id)
+    assert item['price'] == 0
+
+    result = import_file(client, admin, 'test_types.json', exported.data).get_json()
+
+    assert result['errors'] == []
+    assert (result['created'], result['updated']) == (0, 0)
+
+
+def test_import_xlsx(client, db, imported_names):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Test Types'
+    sheet.append(['name', 'price', 'turnaround_days'])
+    sheet.append(['Import teszt - Excel', 4200, 5])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    imported_names.append('Import teszt - Excel')
+
+    response = import_file(client, login(client, 'admin@pannon.hu', 'admin123'), 'test_types.xlsx', buffer.getvalue())
+
+    assert response.status_code == 200 and response.get_json()['created'] == 1
+    db.session.expire_all()
+    assert backend.TestType.query.filter_by(name='Import teszt - Excel').one().turnaround_days == 5
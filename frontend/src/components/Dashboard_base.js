@@ -26,7 +26,7 @@ function Dashboard() {
     try {
       const [statsRes, requestsRes] = await Promise.all([
         axios.get(`${API_URL}/stats`, { headers: getAuthHeaders() }),
-        axios.get(`${API_URL}/requests`, { headers: getAuthHeaders() })
+        axios.get(`${API_URL}/requests?limit=5`, { headers: getAuthHeaders() })  // v8.4.2: Csak az 5 legújabb
       ]);
       
       setStats(statsRes.data);
@@ -122,11 +122,52 @@ function NotificationBell() {
     };
   }, [isOpen]);
 
-  // Polling (30 sec)
+  // v8.4.10: Server-Sent Events push (30 mp-es polling helyett)
   useEffect(() => {
     fetchNotifications();
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
+
+    const token = localStorage.getItem('token');
+    if (!token || typeof EventSource === 'undefined') {
+      // Fallback: régi polling, ha a böngésző nem támogatja az SSE-t
+      const interval = setInterval(fetchNotifications, 30000);
+      return () => clearInterval(interval);
+    }
+
+    const source = new EventSource(`${API_URL}/notifications/stream?token=${encodeURIComponent(token)}`);
+    let reconnecting = false;
+    let pollInterval = null;
+
+    source.addEventListener('notification', (event) => {
+      const data = JSON.parse(event.data);
+      const notification = { ...data.notification, id: data.notification_id };
+      setNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)].slice(0, 20));
+      setUnreadCount(prev => prev + 1);
+    });
+
+    source.addEventListener('unread_count', (event) => {
+      const data = JSON.parse(event.data);
+      setUnreadCount(data.unread_count);
+    });
+
+    // Újracsatlakozás után újratöltés - a kiesés alatti értesítések miatt
+    source.onerror = () => {
+      reconnecting = true;
+      // Lezárt stream (pl. 503 - túl sok nyitott stream a szerveren): vissza a pollingra
+      if (source.readyState === EventSource.CLOSED && !pollInterval) {
+        pollInterval = setInterval(fetchNotifications, 30000);
+      }
+    };
+    source.onopen = () => {
+      if (reconnecting) {
+        reconnecting = false;
+        fetchNotifications();
+      }
+    };
+
+    return () => {
+      source.close();
+      if (pollInterval) clearInterval(pollInterval);
+    };
   }, []);
 
   // Relatív idő formázás
@@ -23,13 +23,19 @@ import {
   Clipboard  // v7.0.31: Átadás-átvételi jegyzőkönyv
 } from 'lucide-react';
 
+// v8.4.2: Egy oldalon betöltött kérések száma
+const PAGE_SIZE = 50;
+
 function RequestList() {
   const { user, getAuthHeaders, API_URL } = useAuth();
   const [searchParams] = useSearchParams();
   const navigate = useNavigate();  // v7.0.6: Eredmények megtekintése navigáció
   const [requests, setRequests] = useState([]);
-  const [filteredRequests, setFilteredRequests] = useState([]);
   const [loading, setLoading] = useState(true);
+  // v8.4.2: Szerveroldali lapozás
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalCount, setTotalCount] = useState(0);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
   const [selectedRequest, setSelectedRequest] = useState(null);
@@ -50,20 +56,32 @@ function RequestList() {
     }
   }, [searchParams]);
 
+  // v8.4.2: Szűrés és keresés a szerveren - változáskor első oldal újratöltése (keresésnél kis késleltetéssel)
   useEffect(() => {
-    fetchRequests();
-  }, []);
+    const timer = setTimeout(() => fetchRequests(), searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm, statusFilter]); // v7.0.13: departmentFilter eltávolítva (csak WorkList-en van)
 
-  useEffect(() => {
-    filterRequests();
-  }, [requests, searchTerm, statusFilter]); // v7.0.13: departmentFilter eltávolítva (csak WorkList-en van)
+  const fetchRequests = async (cursor = null) => {
+    const params = { limit: PAGE_SIZE };
+    if (statusFilter !== 'all') {
+      params.status = statusFilter;
+    }
+    if (searchTerm) {
+      params.search = searchTerm;
+    }
+    if (cursor) {
+      params.cursor = cursor;
+    }
 
-  const fetchRequests = async () => {
     try {
       const response = await axios.get(`${API_URL}/requests`, {
-        headers: getAuthHeaders()
+        headers: getAuthHeaders(),
+        params
       });
-      setRequests(response.data);
+      setRequests(prev => (cursor ? [...prev, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setTotalCount(parseInt(response.headers['x-total-count'], 10) || response.data.length);
     } catch (error) {
       console.error('Error fetching requests:', error);
     } finally {
@@ -71,6 +89,12 @@ function RequestList() {
     }
   };
 
+  const loadMoreRequests = async () => {
+    setLoadingMore(true);
+    await fetchRequests(nextCursor);
+    setLoadingMore(false);
+  };
+
   const fetchRequestDetails = async (requestId) => {
     try {
       const response = await axios.get(`${API_URL}/requests/${requestId}`, {
@@ -140,30 +164,6 @@ function RequestList() {
     }
   };
 
-  const filterRequests = () => {
-    let filtered = requests;
-
-    // Keresés
-    if (searchTerm) {
-      const term = searchTerm.toLowerCase();
-      filtered = filtered.filter(req =>
-        (req.request_number && req.request_number.toLowerCase().includes(term)) ||
-        (req.internal_id && req.internal_id.toLowerCase().includes(term)) ||
-        (req.sample_id && req.sample_id.toLowerCase().includes(term)) ||
-        (req.sample_description && req.sample_description.toLowerCase().includes(term)) ||
-        (req.company_name && req.company_name.toLowerCase().includes(term)) ||
-        (req.user_name && req.user_name.toLowerCase().includes(term))
-      );
-    }
-
-    // Státusz szűrés
-    if (statusFilter !== 'all') {
-      filtered = filtered.filter(req => req.status === statusFilter);
-    }
-
-    setFilteredRequests(filtered);
-  };
-
   const updateStatus = async (requestId, newStatus) => {
     try {
       // v4.0 backend expects FormData
@@ -299,7 +299,7 @@ function RequestList() {
         <div>
           <h1 className="text-3xl font-bold text-gray-900">Laborkérések</h1>
           <p className="text-gray-600 mt-1">
-            Összesen {filteredRequests.length} kérés
+            Összesen {totalCount} kérés
           </p>
         </div>
 
@@ -353,14 +353,14 @@ function RequestList() {
 
       {/* Requests List */}
       <div className="bg-white rounded-lg shadow overflow-hidden">
-        {filteredRequests.length === 0 ? (
+        {requests.length === 0 ? (
           <div className="text-center py-12 text-gray-500">
             <FileText className="w-12 h-12 mx-auto mb-4 text-gray-400" />
             <p>Nincs megjeleníthető laborkérés</p>
           </div>
         ) : (
           <div className="divide-y divide-gray-200">
-            {filteredRequests.map((request) => {
+            {requests.map((request) => {
               // v7.0.26: Fallback ha ismeretlen status
               const statusInfo = statusConfig[request.status] || {
                 label: request.status,
@@ -573,6 +573,19 @@ function RequestList() {
             })}
           </div>
         )}
+
+        {/* v8.4.2: Következő oldal betöltése */}
+        {nextCursor && (
+          <div className="p-4 text-center border-t border-gray-200">
+            <button
+              onClick={loadMoreRequests}
+              disabled={loadingMore}
+              className="px-4 py-2 text-sm text-indigo-600 border border-indigo-200 rounded-lg hover:bg-indigo-50 disabled:opacity-50 transition-colors"
+            >
+              {loadingMore ? 'Betöltés...' : `További kérések betöltése (${requests.length} / ${totalCount})`}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Details Modal */}